@@ -0,0 +1,135 @@
+# apps/accounts/xc.py
+"""
+Xtream Codes credential checks and channel access.
+
+XC clients send their username and password with every API call and stream
+request. Verified credentials are kept in memory for a short time, so repeated
+calls don't reload the user and re-parse its custom properties; saving a user
+bumps the XC_USERS_CACHE generation, which drops the entries of every process.
+The channels a user may stream are resolved once per CHANNELS_CACHE and
+XC_USERS_CACHE generation (bumped on channel, profile membership and user
+changes), from the user's level and profiles as stored at that point, so
+authorizing a stream is a dictionary lookup.
+"""
+
+import hmac
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.shortcuts import get_object_or_404
+
+from apps.channels.models import Channel
+from core.utils import get_cache_generation, CHANNELS_CACHE, XC_USERS_CACHE
+from .models import User
+
+# How long verified credentials are trusted without reloading the user (without
+# Redis, the only bound on how long a changed password keeps working)
+XC_CREDENTIALS_TTL = 30
+# Users whose credentials / channel access are kept per process
+MAX_CACHED_USERS = 1024
+
+# username -> (expires_at, generation, xc_password, user)
+_credentials = {}
+# (generation, user id) -> {channel id: channel uuid}
+_channel_access = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_xc_password(user):
+    custom_properties = (
+        json.loads(user.custom_properties) if user.custom_properties else {}
+    )
+    return custom_properties.get("xc_password")
+
+
+def get_xc_user(username, password):
+    """
+    Return the user if the XC credentials are valid, otherwise None.
+    Raises Http404 if there is no such user.
+    """
+    generation = get_cache_generation(XC_USERS_CACHE)
+    entry = _credentials.get(username)
+    if entry is None or entry[0] < time.monotonic() or entry[1] != generation:
+        user = get_object_or_404(User, username=username)
+        entry = (time.monotonic() + XC_CREDENTIALS_TTL, generation, get_xc_password(user), user)
+        with _lock:
+            if len(_credentials) >= MAX_CACHED_USERS:
+                _credentials.clear()
+            _credentials[username] = entry
+
+    _, _, xc_password, user = entry
+    if not xc_password or not password:
+        return None
+    if not hmac.compare_digest(str(xc_password).encode(), str(password).encode()):
+        return None
+    return user
+
+
+def invalidate_xc_user(username=None):
+    """Forget cached credentials, of one user or of everybody."""
+    with _lock:
+        if username is None:
+            _credentials.clear()
+        else:
+            _credentials.pop(username, None)
+
+
+def _build_channel_access(user):
+    # The user may be a cached copy from before a downgrade: use the stored level
+    user_level = User.objects.filter(id=user.id).values_list("user_level", flat=True).first()
+    if user_level is None:
+        return {}
+
+    if user_level < 10:
+        filters = {
+            "channelprofilemembership__enabled": True,
+            "user_level__lte": user_level,
+        }
+
+        profile_ids = list(user.channel_profiles.values_list("id", flat=True))
+        if profile_ids:
+            filters["channelprofilemembership__channel_profile__in"] = profile_ids
+
+        channels = Channel.objects.filter(**filters)
+    else:
+        channels = Channel.objects.all()
+
+    return {
+        channel_id: str(channel_uuid)
+        for channel_id, channel_uuid in channels.values_list("id", "uuid").distinct()
+    }
+
+
+def get_xc_channel_access(user):
+    """
+    The channels a user may stream through XC, as {channel id: channel uuid}.
+    Without Redis (no cache generation) it is resolved every time.
+    """
+    generation = get_cache_generation(CHANNELS_CACHE, XC_USERS_CACHE)
+    if generation is None:
+        return _build_channel_access(user)
+
+    key = (generation, user.id)
+    with _lock:
+        access = _channel_access.get(key)
+        if access is not None:
+            _channel_access.move_to_end(key)
+            return access
+
+    access = _build_channel_access(user)
+    with _lock:
+        _channel_access[key] = access
+        while len(_channel_access) > MAX_CACHED_USERS:
+            _channel_access.popitem(last=False)
+    return access
+
+
+def get_xc_channel_uuid(user, channel_id):
+    """UUID of the channel if the user may stream it, otherwise None."""
+    try:
+        channel_id = int(channel_id)
+    except (TypeError, ValueError):
+        return None
+    return get_xc_channel_access(user).get(channel_id)
@@ -17,7 +17,7 @@ from apps.accounts.permissions import (
     permission_classes_by_method,
 )
 
-from core.models import UserAgent, CoreSettings
+from core.utils import bump_cache_generation, CHANNELS_CACHE
 
 from .models import (
     Stream,
@@ -44,8 +44,15 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from apps.epg.models import EPGData
 from django.db.models import Q
-from django.http import StreamingHttpResponse, FileResponse, Http404
-import mimetypes
+from django.http import FileResponse, Http404, HttpResponseNotModified, StreamingHttpResponse
+from apps.output.cache import etag_matches
+from .logo_cache import (
+    LOGO_CLIENT_MAX_AGE,
+    LOGO_VARIANT_SIZES,
+    get_local_logo,
+    get_logo_variant,
+    get_remote_logo,
+)
 
 from rest_framework.pagination import PageNumberPagination
 
@@ -484,6 +491,9 @@ class ChannelViewSet(viewsets.ModelViewSet):
                 Channel.objects.filter(id=channel_id).update(channel_number=channel_num)
                 channel_num = channel_num + 1
 
+        # queryset.update() bypasses the signals that invalidate channel caches
+        bump_cache_generation(CHANNELS_CACHE)
+
         return Response(
             {"message": "Channels have been auto-assigned!"}, status=status.HTTP_200_OK
         )
@@ -800,6 +810,9 @@ class ChannelViewSet(viewsets.ModelViewSet):
                 for channel, stream_ids in zip(created_channels, streams_map):
                     channel.streams.set(stream_ids)
 
+            # bulk_create/bulk_update bypass the signals that invalidate channel caches
+            bump_cache_generation(CHANNELS_CACHE)
+
         response_data = {"created": ChannelSerializer(created_channels, many=True).data}
         if errors:
             response_data["errors"] = errors
@@ -909,32 +922,39 @@ class ChannelViewSet(viewsets.ModelViewSet):
         programs_refreshed = 0
         unique_epg_ids = set()
 
+        epg_mapping = {}
         for assoc in associations:
-            channel_id = assoc.get("channel_id")
-            epg_data_id = assoc.get("epg_data_id")
-
-            if not channel_id:
+            try:
+                channel_id = int(assoc.get("channel_id") or 0)
+            except (TypeError, ValueError):
+                logger.error(f"Invalid channel ID {assoc.get('channel_id')!r}")
                 continue
+            if channel_id:
+                epg_mapping[channel_id] = assoc.get("epg_data_id")
 
-            try:
-                # Get the channel
-                channel = Channel.objects.get(id=channel_id)
+        # One query and one bulk update, whatever the size of the match result
+        channels = list(Channel.objects.filter(id__in=epg_mapping.keys()))
+        for channel in channels:
+            channel.epg_data_id = epg_mapping[channel.id]
 
-                # Set the EPG data
-                channel.epg_data_id = epg_data_id
-                channel.save(update_fields=["epg_data"])
-                channels_updated += 1
+            # Track unique EPG data IDs
+            if channel.epg_data_id:
+                unique_epg_ids.add(channel.epg_data_id)
 
-                # Track unique EPG data IDs
-                if epg_data_id:
-                    unique_epg_ids.add(epg_data_id)
+        missing = set(epg_mapping) - {channel.id for channel in channels}
+        for channel_id in missing:
+            logger.error(f"Channel with ID {channel_id} not found")
 
-            except Channel.DoesNotExist:
-                logger.error(f"Channel with ID {channel_id} not found")
+        if channels:
+            try:
+                Channel.objects.bulk_update(channels, ["epg_data"], batch_size=1000)
+                channels_updated = len(channels)
             except Exception as e:
-                logger.error(
-                    f"Error setting EPG data for channel {channel_id}: {str(e)}"
-                )
+                logger.error(f"Error setting EPG data for channels: {str(e)}")
+                unique_epg_ids.clear()
+
+            # bulk_update bypasses the signals that invalidate channel caches
+            bump_cache_generation(CHANNELS_CACHE)
 
         # Trigger program refresh for unique EPG data IDs
         from apps.epg.tasks import parse_programs_for_tvg_id
@@ -1274,67 +1294,20 @@ class LogoViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=["get"], permission_classes=[AllowAny])
     def cache(self, request, pk=None):
-        """Streams the logo file, whether it's local or remote."""
+        """
+        Serves the logo file, whether it's local or remote. Remote logos are
+        served from the on-disk logo cache; pass ?size=<px> for a resized WebP.
+        """
         logo = self.get_object()
         logo_url = logo.url
 
         if logo_url.startswith("/data"):  # Local file
-            if not os.path.exists(logo_url):
+            cached = get_local_logo(logo_url)
+            if cached is None:
                 raise Http404("Image not found")
-
-            # Get proper mime type (first item of the tuple)
-            content_type, _ = mimetypes.guess_type(logo_url)
-            if not content_type:
-                content_type = "image/jpeg"  # Default to a common image type
-
-            # Use context manager and set Content-Disposition to inline
-            response = StreamingHttpResponse(
-                open(logo_url, "rb"), content_type=content_type
-            )
-            response["Content-Disposition"] = 'inline; filename="{}"'.format(
-                os.path.basename(logo_url)
-            )
-            return response
-
         else:  # Remote image
             try:
-                # Get the default user agent
-                try:
-                    default_user_agent_id = CoreSettings.get_default_user_agent_id()
-                    user_agent_obj = UserAgent.objects.get(id=int(default_user_agent_id))
-                    user_agent = user_agent_obj.user_agent
-                except (CoreSettings.DoesNotExist, UserAgent.DoesNotExist, ValueError):
-                    # Fallback to hardcoded if default not found
-                    user_agent = 'Dispatcharr/1.0'
-
-                # Add proper timeouts to prevent hanging
-                remote_response = requests.get(
-                    logo_url,
-                    stream=True,
-                    timeout=(3, 5),  # (connect_timeout, read_timeout)
-                    headers={'User-Agent': user_agent}
-                )
-                if remote_response.status_code == 200:
-                    # Try to get content type from response headers first
-                    content_type = remote_response.headers.get("Content-Type")
-
-                    # If no content type in headers or it's empty, guess based on URL
-                    if not content_type:
-                        content_type, _ = mimetypes.guess_type(logo_url)
-
-                    # If still no content type, default to common image type
-                    if not content_type:
-                        content_type = "image/jpeg"
-
-                    response = StreamingHttpResponse(
-                        remote_response.iter_content(chunk_size=8192),
-                        content_type=content_type,
-                    )
-                    response["Content-Disposition"] = 'inline; filename="{}"'.format(
-                        os.path.basename(logo_url)
-                    )
-                    return response
-                raise Http404("Remote image not found")
+                cached = get_remote_logo(logo_url)
             except requests.exceptions.Timeout:
                 logger.warning(f"Timeout fetching logo from {logo_url}")
                 raise Http404("Logo request timed out")
@@ -1345,6 +1318,35 @@ class LogoViewSet(viewsets.ModelViewSet):
                 logger.warning(f"Error fetching logo from {logo_url}: {e}")
                 raise Http404("Error fetching remote image")
 
+            if cached is None:
+                raise Http404("Remote image not found")
+
+            if cached.chunks is not None:
+                # Too big to cache: passed straight through, without validators or variants
+                response = StreamingHttpResponse(cached.chunks, content_type=cached.content_type)
+                response["Content-Disposition"] = 'inline; filename="{}"'.format(
+                    os.path.basename(logo_url)
+                )
+                return response
+
+        size = request.query_params.get("size")
+        if size and size.isdigit() and int(size) in LOGO_VARIANT_SIZES:
+            cached = get_logo_variant(cached, int(size))
+
+        if etag_matches(request, cached.etag):
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(open(cached.path, "rb"), content_type=cached.content_type)
+            response["Content-Disposition"] = 'inline; filename="{}"'.format(
+                os.path.basename(logo_url)
+            )
+
+        response["ETag"] = cached.etag
+        if cached.last_modified:
+            response["Last-Modified"] = cached.last_modified
+        response["Cache-Control"] = f"public, max-age={LOGO_CLIENT_MAX_AGE}"
+        return response
+
 
 class ChannelProfileViewSet(viewsets.ModelViewSet):
     queryset = ChannelProfile.objects.all()
@@ -1439,6 +1441,7 @@ class BulkUpdateChannelMembershipAPIView(APIView):
                     membership_dict[channel_id].enabled = enabled_status
 
             ChannelProfileMembership.objects.bulk_update(memberships, ["enabled"])
+            bump_cache_generation(CHANNELS_CACHE)
 
             return Response({"status": "success"}, status=status.HTTP_200_OK)
 
@@ -0,0 +1,336 @@
+# apps/channels/epg_matcher.py
+"""
+EPG auto-matching.
+
+Runs inside the dedicated ``epg_match`` Celery worker (see CELERY_TASK_ROUTES),
+a single long-lived process, so the sentence-transformers model is loaded once
+and the embeddings of normalized EPG names stay in memory between runs. The
+embedding index is also persisted next to the model and kept up to date
+incrementally as EPG sources are refreshed.
+"""
+
+import logging
+import os
+import re
+import threading
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+MODEL_PATH = os.path.join("/app", "models", "all-MiniLM-L6-v2")
+# Embeddings of normalized EPG names, persisted between worker restarts
+EMBEDDING_CACHE_PATH = os.path.join("/app", "models", "epg_name_embeddings.npz")
+
+# Thresholds
+BEST_FUZZY_THRESHOLD = 85
+LOWER_FUZZY_THRESHOLD = 40
+EMBED_SIM_THRESHOLD = 0.65
+
+# Number of channels scored against the full EPG list at once. Keeps the
+# score matrix around 50MB even for 100k EPG entries.
+FUZZY_CHUNK_SIZE = 128
+# Score given to EPG rows that must never be picked (empty normalized name)
+EXCLUDED_SCORE = -1000
+
+DOT_REGION_RE = re.compile(r'\.([a-z]{2})')
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """Return the sentence-transformers model, loading it on first use."""
+    global _model
+    if _model is not None:
+        return _model
+
+    with _model_lock:
+        if _model is None:
+            from sentence_transformers import SentenceTransformer as st
+
+            os.makedirs(MODEL_PATH, exist_ok=True)
+
+            # If not present locally, download:
+            if not os.path.exists(os.path.join(MODEL_PATH, "config.json")):
+                logger.info(f"Local model not found in {MODEL_PATH}; downloading from {SENTENCE_MODEL_NAME}...")
+                _model = st(SENTENCE_MODEL_NAME, cache_folder=MODEL_PATH)
+            else:
+                logger.info(f"Loading local model from {MODEL_PATH}")
+                _model = st(MODEL_PATH)
+
+    return _model
+
+
+def region_bonuses(epg_data, region_code):
+    """
+    Region-based bonus/penalty for every EPG row. It only depends on the row,
+    so it is computed once instead of once per channel.
+    """
+    bonuses = np.zeros(len(epg_data), dtype=np.float32)
+    for i, row in enumerate(epg_data):
+        if not row["norm_name"]:
+            bonuses[i] = EXCLUDED_SCORE
+            continue
+        if not region_code:
+            continue
+
+        combined_text = row["tvg_id"].lower() + " " + row["name"].lower()
+        dot_regions = DOT_REGION_RE.findall(combined_text)
+        if dot_regions:
+            if region_code in dot_regions:
+                bonuses[i] = 30  # bigger bonus if .us or .ca matches
+            else:
+                bonuses[i] = -15
+        elif region_code in combined_text:
+            bonuses[i] = 15
+
+    return bonuses
+
+
+def best_fuzzy_matches(chan_names, epg_names, bonuses):
+    """
+    Score every channel name against every EPG name with rapidfuzz's batched
+    cdist and return (best row index, best score) per channel. Ties resolve to
+    the first EPG row, as the sequential scan did.
+    """
+    best_indexes = np.empty(len(chan_names), dtype=np.int64)
+    best_scores = np.empty(len(chan_names), dtype=np.float32)
+
+    for offset in range(0, len(chan_names), FUZZY_CHUNK_SIZE):
+        chunk = chan_names[offset:offset + FUZZY_CHUNK_SIZE]
+        scores = process.cdist(
+            chunk, epg_names, scorer=fuzz.ratio, dtype=np.float32, workers=-1
+        )
+        scores += bonuses
+
+        indexes = scores.argmax(axis=1)
+        best_indexes[offset:offset + len(chunk)] = indexes
+        best_scores[offset:offset + len(chunk)] = scores[np.arange(len(chunk)), indexes]
+
+    return best_indexes, best_scores
+
+
+class EmbeddingIndex:
+    """
+    Normalized EPG name -> normalized embedding, kept in memory for the life of
+    the worker and mirrored to EMBEDDING_CACHE_PATH. Only names that haven't
+    been seen before are ever encoded.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.names = []
+        self.rows = {}
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.loaded = False
+
+    def _load(self):
+        self.loaded = True
+        try:
+            with np.load(EMBEDDING_CACHE_PATH, allow_pickle=False) as data:
+                if str(data["model"]) != SENTENCE_MODEL_NAME:
+                    return
+                self.names = data["names"].tolist()
+                self.vectors = data["vectors"].astype(np.float32)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable embedding cache {EMBEDDING_CACHE_PATH}: {e}")
+            self.names = []
+            self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.rows = {name: i for i, name in enumerate(self.names)}
+
+    def _save(self):
+        tmp_path = f"{EMBEDDING_CACHE_PATH}.tmp.npz"
+        try:
+            np.savez(
+                tmp_path,
+                model=np.array(SENTENCE_MODEL_NAME),
+                names=np.array(self.names, dtype=str),
+                vectors=self.vectors,
+            )
+            os.replace(tmp_path, EMBEDDING_CACHE_PATH)
+        except OSError as e:
+            logger.warning(f"Unable to persist embedding cache: {e}")
+
+    def exists(self):
+        with self.lock:
+            if not self.loaded:
+                self._load()
+            return bool(self.names)
+
+    def sync(self, names, prune=True):
+        """
+        Make sure every name in ``names`` is embedded, encoding only new ones.
+        With prune, names no longer present are dropped so the index tracks the
+        current EPG data.
+
+        Returns the embedding matrix aligned with ``names``.
+        """
+        names = list(names)
+        with self.lock:
+            if not self.loaded:
+                self._load()
+
+            missing = [name for name in dict.fromkeys(names) if name not in self.rows]
+            if missing:
+                logger.info(f"Encoding {len(missing)} new EPG name(s), {len(self.rows)} already indexed")
+                encoded = get_model().encode(
+                    missing, convert_to_numpy=True, normalize_embeddings=True
+                ).astype(np.float32)
+                if self.names:
+                    self.vectors = np.vstack([self.vectors, encoded])
+                else:
+                    self.vectors = encoded
+                for name in missing:
+                    self.rows[name] = len(self.names)
+                    self.names.append(name)
+
+            stale = prune and len(self.rows) > len(set(names))
+            if stale:
+                keep = sorted({self.rows[name] for name in names})
+                self.names = [self.names[i] for i in keep]
+                self.vectors = self.vectors[keep]
+                self.rows = {name: i for i, name in enumerate(self.names)}
+
+            if missing or stale:
+                self._save()
+
+            return self.vectors[[self.rows[name] for name in names]]
+
+
+embedding_index = EmbeddingIndex()
+
+
+def process_data(input_data):
+    channels = input_data["channels"]
+    epg_data = input_data["epg_data"]
+    region_code = input_data.get("region_code", None)
+
+    channels_to_update = []
+    matched_channels = []
+
+    # Exact TVG ID index; the first EPG row wins for duplicated ids
+    epg_by_tvg_id = {}
+    for epg in epg_data:
+        if epg["tvg_id"]:
+            epg_by_tvg_id.setdefault(epg["tvg_id"], epg)
+
+    fuzzy_candidates = []
+    for chan in channels:
+        normalized_tvg_id = chan.get("tvg_id", "")
+        fallback_name = chan["tvg_id"].strip() if chan["tvg_id"] else chan["name"]
+
+        # Exact TVG ID match (direct match)
+        epg = epg_by_tvg_id.get(normalized_tvg_id) if normalized_tvg_id else None
+        if epg:
+            chan["epg_data_id"] = epg["id"]
+            channels_to_update.append(chan)
+
+            # Add to matched_channels list so it's counted in the total
+            matched_channels.append((chan['id'], fallback_name, epg["tvg_id"]))
+
+            logger.info(f"Channel {chan['id']} '{fallback_name}' => EPG found by tvg_id={epg['tvg_id']}")
+            continue
+
+        # Name-based fuzzy matching
+        if not chan["norm_chan"]:
+            logger.debug(f"Channel {chan['id']} '{chan['name']}' => empty after normalization, skipping")
+            continue
+
+        fuzzy_candidates.append(chan)
+
+    if not fuzzy_candidates or not any(row["norm_name"] for row in epg_data):
+        for chan in fuzzy_candidates:
+            logger.debug(f"Channel {chan['id']} '{chan['name']}' => no EPG match at all.")
+        return {
+            "channels_to_update": channels_to_update,
+            "matched_channels": matched_channels
+        }
+
+    best_indexes, best_scores = best_fuzzy_matches(
+        [chan["norm_chan"] for chan in fuzzy_candidates],
+        [row["norm_name"] for row in epg_data],
+        region_bonuses(epg_data, region_code),
+    )
+
+    embedding_candidates = []
+    for chan, best_index, best_score in zip(fuzzy_candidates, best_indexes.tolist(), best_scores.tolist()):
+        fallback_name = chan["tvg_id"].strip() if chan["tvg_id"] else chan["name"]
+
+        # If no best match was found, skip
+        if best_score <= 0:
+            logger.debug(f"Channel {chan['id']} '{fallback_name}' => no EPG match at all.")
+            continue
+
+        best_epg = epg_data[best_index]
+
+        # If best_score is above BEST_FUZZY_THRESHOLD => direct accept
+        if best_score >= BEST_FUZZY_THRESHOLD:
+            chan["epg_data_id"] = best_epg["id"]
+            channels_to_update.append(chan)
+
+            matched_channels.append((chan['id'], fallback_name, best_epg["tvg_id"]))
+            logger.info(
+                f"Channel {chan['id']} '{fallback_name}' => matched tvg_id={best_epg['tvg_id']} "
+                f"(score={best_score})"
+            )
+
+        # If best_score is in the “middle range,” do embedding check
+        elif best_score >= LOWER_FUZZY_THRESHOLD:
+            embedding_candidates.append((chan, fallback_name, best_score))
+        else:
+            # No good match found - fuzzy score is too low
+            logger.info(
+                f"Channel {chan['id']} '{fallback_name}' => best fuzzy match score={best_score} < {LOWER_FUZZY_THRESHOLD}, skipping"
+            )
+
+    if embedding_candidates:
+        st_model = get_model()
+
+        # Embed each distinct EPG name once and map rows back to the first row
+        # carrying it, which is the row the per-row argmax would have picked
+        name_rows = {}
+        for i, row in enumerate(epg_data):
+            if row["norm_name"]:
+                name_rows.setdefault(row["norm_name"], i)
+        epg_names = list(name_rows)
+        epg_embeddings = embedding_index.sync(epg_names)
+
+        chan_embeddings = st_model.encode(
+            [chan["norm_chan"] for chan, _, _ in embedding_candidates],
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        ).astype(np.float32)
+
+        for offset in range(0, len(embedding_candidates), FUZZY_CHUNK_SIZE):
+            sim_scores = chan_embeddings[offset:offset + FUZZY_CHUNK_SIZE] @ epg_embeddings.T
+            top_indexes = sim_scores.argmax(axis=1)
+
+            for i, top_index in enumerate(top_indexes.tolist()):
+                chan, fallback_name, best_score = embedding_candidates[offset + i]
+                top_value = float(sim_scores[i, top_index])
+                if top_value >= EMBED_SIM_THRESHOLD:
+                    matched_epg = epg_data[name_rows[epg_names[top_index]]]
+                    chan["epg_data_id"] = matched_epg["id"]
+                    channels_to_update.append(chan)
+
+                    matched_channels.append((chan['id'], fallback_name, matched_epg["tvg_id"]))
+                    logger.info(
+                        f"Channel {chan['id']} '{fallback_name}' => matched EPG tvg_id={matched_epg['tvg_id']} "
+                        f"(fuzzy={best_score}, cos-sim={top_value:.2f})"
+                    )
+                else:
+                    logger.info(
+                        f"Channel {chan['id']} '{fallback_name}' => fuzzy={best_score}, "
+                        f"cos-sim={top_value:.2f} < {EMBED_SIM_THRESHOLD}, skipping"
+                    )
+
+    return {
+        "channels_to_update": channels_to_update,
+        "matched_channels": matched_channels
+    }
@@ -0,0 +1,343 @@
+# apps/channels/logo_cache.py
+"""
+On-disk cache for channel logos served through the logo cache endpoint.
+
+Remote logos are downloaded once and stored content-addressed (by SHA-256)
+under MEDIA_ROOT/cached_logos/blobs, with a small metadata file per source URL
+recording the blob, content type and upstream validators. Stale entries are
+revalidated with If-None-Match / If-Modified-Since; if the upstream host is
+unreachable the stale copy keeps being served. The cache is bounded in size and
+evicts the least recently used blobs. Resized WebP variants are derived from
+the cached blob on demand. Logos over LOGO_MAX_BYTES are streamed through from
+upstream on every request instead of being cached.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import mimetypes
+import os
+import time
+import uuid
+
+import requests
+from django.conf import settings
+
+from core.models import CoreSettings, UserAgent
+
+logger = logging.getLogger(__name__)
+
+# Cached logos are revalidated upstream after this long
+LOGO_FRESH_SECONDS = 24 * 60 * 60
+# Clients may reuse a logo this long without asking again
+LOGO_CLIENT_MAX_AGE = 24 * 60 * 60
+# Total size of cached blobs and variants before least recently used ones are evicted
+LOGO_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Logos bigger than this are streamed through but not cached
+LOGO_MAX_BYTES = 5 * 1024 * 1024
+# Widths (in pixels) resized variants can be requested at
+LOGO_VARIANT_SIZES = (64, 128, 256, 512)
+# Access times are only refreshed this often, to avoid a write on every hit
+TOUCH_INTERVAL = 60 * 60
+# Minimum time between two size checks of the whole cache
+PRUNE_INTERVAL = 60
+
+REQUEST_TIMEOUT = (3, 5)  # (connect_timeout, read_timeout)
+DEFAULT_USER_AGENT = "Dispatcharr/1.0"
+
+_last_prune = 0
+
+
+class LogoTooLarge(Exception):
+    """
+    A remote logo is bigger than LOGO_MAX_BYTES. Carries the still open upstream
+    response and an uncached CachedLogo streaming the rest of it.
+    """
+
+    def __init__(self, response, logo):
+        super().__init__(response.url)
+        self.response = response
+        self.logo = logo
+
+
+def get_logo_cache_dir(*parts):
+    path = os.path.join(settings.MEDIA_ROOT, "cached_logos", *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _url_key(url):
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+
+def _meta_path(url):
+    return os.path.join(get_logo_cache_dir("meta"), f"{_url_key(url)}.json")
+
+
+def _blob_path(digest):
+    return os.path.join(get_logo_cache_dir("blobs", digest[:2]), digest)
+
+
+def _variant_path(digest, size):
+    return os.path.join(get_logo_cache_dir("variants", digest[:2]), f"{digest}-{size}.webp")
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _touch(path):
+    try:
+        if time.time() - os.stat(path).st_mtime > TOUCH_INTERVAL:
+            os.utime(path)
+    except OSError:
+        pass
+
+
+class CachedLogo:
+    """A cached logo file and the validators to serve it with."""
+
+    def __init__(self, path, content_type, etag, last_modified=None, chunks=None):
+        self.path = path
+        self.content_type = content_type
+        self.etag = etag
+        self.last_modified = last_modified
+        # Uncached logos (see LogoTooLarge) have no file, only their content streamed from upstream
+        self.chunks = chunks
+
+
+def get_default_user_agent():
+    try:
+        default_user_agent_id = CoreSettings.get_default_user_agent_id()
+        return UserAgent.objects.get(id=int(default_user_agent_id)).user_agent
+    except (CoreSettings.DoesNotExist, UserAgent.DoesNotExist, ValueError):
+        # Fallback to hardcoded if default not found
+        return DEFAULT_USER_AGENT
+
+
+def _load_meta(url):
+    try:
+        with open(_meta_path(url), "r") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    # The blob may have been evicted since
+    if meta.get("url") != url or not os.path.exists(_blob_path(meta["blob"])):
+        return None
+    return meta
+
+
+def _store(url, content, content_type, etag, last_modified):
+    digest = hashlib.sha256(content).hexdigest()
+    blob_path = _blob_path(digest)
+    if not os.path.exists(blob_path):
+        _write_atomic(blob_path, content)
+        _maybe_prune()
+
+    meta = {
+        "url": url,
+        "blob": digest,
+        "content_type": content_type,
+        "etag": etag,
+        "last_modified": last_modified,
+        "fetched_at": time.time(),
+    }
+    _write_atomic(_meta_path(url), json.dumps(meta).encode("utf-8"))
+    return meta
+
+
+def _fetch(url, meta=None, user_agent=None):
+    """
+    Download (or revalidate) a remote logo.
+
+    Returns the metadata of the cached copy, or None if the logo couldn't be
+    fetched. Raises requests.RequestException on network errors and
+    LogoTooLarge if the logo is too big to cache.
+    """
+    headers = {"User-Agent": user_agent or get_default_user_agent()}
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    response = requests.get(url, stream=True, timeout=REQUEST_TIMEOUT, headers=headers)
+    handed_over = False
+    try:
+        if response.status_code == 304 and meta:
+            meta["fetched_at"] = time.time()
+            _write_atomic(_meta_path(url), json.dumps(meta).encode("utf-8"))
+            return meta
+
+        if response.status_code != 200:
+            return None
+
+        # Try to get content type from response headers first, then guess from the URL
+        content_type = response.headers.get("Content-Type") or mimetypes.guess_type(url)[0] or "image/jpeg"
+
+        content = bytearray()
+        chunks = response.iter_content(chunk_size=65536)
+        for chunk in chunks:
+            content.extend(chunk)
+            if len(content) > LOGO_MAX_BYTES:
+                logger.warning(f"Logo {url} exceeds {LOGO_MAX_BYTES} bytes, not caching it")
+                # Hand the open response over so the logo can be streamed through without a second download
+                handed_over = True
+                raise LogoTooLarge(response, CachedLogo(
+                    None, content_type, None, chunks=_pass_through(response, bytes(content), chunks)
+                ))
+
+        return _store(
+            url,
+            bytes(content),
+            content_type,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+        )
+    finally:
+        if not handed_over:
+            response.close()
+
+
+def _pass_through(response, head, chunks):
+    with response:
+        yield head
+        yield from chunks
+
+
+def get_remote_logo(url):
+    """
+    Return the CachedLogo for a remote logo URL, downloading or revalidating it
+    as needed. Logos too big to cache come back with chunks to stream instead of
+    a path. Returns None if the logo isn't available.
+    """
+    meta = _load_meta(url)
+
+    if meta is None or time.time() - meta["fetched_at"] > LOGO_FRESH_SECONDS:
+        try:
+            meta = _fetch(url, meta) or meta
+        except LogoTooLarge as e:
+            return e.logo
+        except requests.RequestException as e:
+            if meta is None:
+                raise
+            # Keep serving what we have while the upstream host is unreachable
+            logger.debug(f"Revalidating logo {url} failed, serving cached copy: {e}")
+
+    if meta is None:
+        return None
+
+    blob_path = _blob_path(meta["blob"])
+    _touch(blob_path)
+    return CachedLogo(blob_path, meta["content_type"], f'"{meta["blob"]}"', meta.get("last_modified"))
+
+
+def get_local_logo(path):
+    """Return the CachedLogo for an uploaded / mapped logo file, or None if it's missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    # Get proper mime type (first item of the tuple)
+    content_type = mimetypes.guess_type(path)[0] or "image/jpeg"
+    etag = hashlib.sha1(f"{path}:{stat.st_mtime_ns}:{stat.st_size}".encode("utf-8")).hexdigest()
+    return CachedLogo(path, content_type, f'"{etag}"')
+
+
+def get_logo_variant(logo, size):
+    """
+    Return a CachedLogo for ``logo`` resized to ``size`` pixels wide as WebP,
+    creating it on first use. Returns the original if it can't be resized
+    (e.g. SVG).
+    """
+    digest = logo.etag.strip('"')
+    variant_path = _variant_path(digest, size)
+
+    if not os.path.exists(variant_path):
+        try:
+            from PIL import Image
+
+            with Image.open(logo.path) as image:
+                if image.width > size:
+                    height = max(1, round(image.height * size / image.width))
+                    image = image.resize((size, height), Image.LANCZOS)
+                if image.mode not in ("RGB", "RGBA"):
+                    image = image.convert("RGBA")
+
+                output = io.BytesIO()
+                image.save(output, format="WEBP", quality=85)
+            _write_atomic(variant_path, output.getvalue())
+            _maybe_prune()
+        except Exception as e:
+            logger.debug(f"Unable to create {size}px variant of {logo.path}: {e}")
+            return logo
+
+    _touch(variant_path)
+    return CachedLogo(variant_path, "image/webp", f'"{digest}-{size}"', logo.last_modified)
+
+
+def prefetch_logos(urls, workers=8):
+    """Download remote logos that aren't cached yet. Returns the number fetched."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    user_agent = get_default_user_agent()
+    missing = [url for url in urls if _load_meta(url) is None]
+
+    def fetch(url):
+        try:
+            return _fetch(url, user_agent=user_agent) is not None
+        except LogoTooLarge as e:
+            e.response.close()
+            return False
+        except requests.RequestException as e:
+            logger.debug(f"Unable to prefetch logo {url}: {e}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        fetched = sum(executor.map(fetch, missing))
+
+    prune_logo_cache()
+    return fetched
+
+
+def _maybe_prune():
+    global _last_prune
+    now = time.time()
+    if now - _last_prune > PRUNE_INTERVAL:
+        _last_prune = now
+        prune_logo_cache()
+
+
+def prune_logo_cache(max_bytes=LOGO_CACHE_MAX_BYTES):
+    """Evict the least recently used blobs and variants until the cache fits in max_bytes."""
+    entries = []
+    total = 0
+    for kind in ("blobs", "variants"):
+        for root, _, files in os.walk(get_logo_cache_dir(kind)):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+    if total <= max_bytes:
+        return
+
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
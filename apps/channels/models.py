@@ -17,6 +17,227 @@ logger = logging.getLogger(__name__)
 from apps.m3u.models import M3UAccount
 
 
+# Stream slot bookkeeping is done in Lua so that checking a profile's connection
+# count and claiming a slot happen atomically, in a single round-trip.
+#
+# Keys (built in the script, Redis isn't clustered):
+#   channel_stream:{channel_id}       -> stream id the channel is playing
+#   stream_profile:{stream_id}        -> M3U profile id the stream is using
+#   profile_connections:{profile_id}  -> slots in use for profiles with a limit
+
+# KEYS[1]: channel_stream key. ARGV: (stream_id, profile_id, max_streams)
+# triples in order of preference. Returns {stream_id, profile_id, maxed_out};
+# ids are 0 when no slot was available.
+ALLOCATE_STREAM_SCRIPT = """
+local existing = redis.call('GET', KEYS[1])
+if existing then
+    local profile_id = redis.call('GET', 'stream_profile:' .. existing)
+    if profile_id then
+        return {tonumber(existing), tonumber(profile_id), 0}
+    end
+end
+
+local maxed_out = 0
+for i = 1, #ARGV, 3 do
+    local stream_id = ARGV[i]
+    local profile_id = ARGV[i + 1]
+    local max_streams = tonumber(ARGV[i + 2])
+    local connections_key = 'profile_connections:' .. profile_id
+    local current = tonumber(redis.call('GET', connections_key) or '0')
+
+    if max_streams == 0 or current < max_streams then
+        redis.call('SET', KEYS[1], stream_id)
+        redis.call('SET', 'stream_profile:' .. stream_id, profile_id)
+        if max_streams > 0 then
+            redis.call('INCR', connections_key)
+        end
+        return {tonumber(stream_id), tonumber(profile_id), 0}
+    end
+    maxed_out = 1
+end
+
+return {0, 0, maxed_out}
+"""
+
+# KEYS[1]: channel_stream key, or '' to release ARGV[1] (a stream id) directly.
+# Returns the released profile id, or 0 if nothing was held.
+RELEASE_STREAM_SCRIPT = """
+local stream_id = ARGV[1]
+if KEYS[1] ~= '' then
+    stream_id = redis.call('GET', KEYS[1])
+    if not stream_id then
+        return 0
+    end
+    redis.call('DEL', KEYS[1])
+end
+
+local profile_key = 'stream_profile:' .. stream_id
+local profile_id = redis.call('GET', profile_key)
+if not profile_id then
+    return 0
+end
+redis.call('DEL', profile_key)
+
+local connections_key = 'profile_connections:' .. profile_id
+if tonumber(redis.call('GET', connections_key) or '0') > 0 then
+    redis.call('DECR', connections_key)
+end
+return tonumber(profile_id)
+"""
+
+# KEYS[1]: channel_stream key. ARGV[1]: new profile id.
+# Returns {stream_id, old_profile_id}; 0s if the channel has no active stream.
+SWITCH_STREAM_PROFILE_SCRIPT = """
+local stream_id = redis.call('GET', KEYS[1])
+if not stream_id then
+    return {0, 0}
+end
+
+local profile_key = 'stream_profile:' .. stream_id
+local old_profile_id = redis.call('GET', profile_key)
+if not old_profile_id then
+    return {tonumber(stream_id), 0}
+end
+if old_profile_id == ARGV[1] then
+    return {tonumber(stream_id), tonumber(old_profile_id)}
+end
+
+local old_key = 'profile_connections:' .. old_profile_id
+if tonumber(redis.call('GET', old_key) or '0') > 0 then
+    redis.call('DECR', old_key)
+end
+redis.call('SET', profile_key, ARGV[1])
+redis.call('INCR', 'profile_connections:' .. ARGV[1])
+return {tonumber(stream_id), tonumber(old_profile_id)}
+"""
+
+# KEYS[1]: profile_connections key. ARGV[1]: max_streams (> 0).
+# Claims a slot without assigning it to a channel (e.g. a standby connection).
+# Returns 1 if a slot was claimed, 0 if the profile is full.
+RESERVE_PROFILE_SLOT_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[1]) or '0') >= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('INCR', KEYS[1])
+return 1
+"""
+
+# KEYS[1]: profile_connections key.
+# Gives back a slot claimed with RESERVE_PROFILE_SLOT_SCRIPT, never going below 0.
+# Returns 1 if a slot was released, 0 if none was held.
+RELEASE_PROFILE_SLOT_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[1]) or '0') <= 0 then
+    return 0
+end
+redis.call('DECR', KEYS[1])
+return 1
+"""
+
+_stream_slot_scripts = {}
+
+
+def run_stream_slot_script(redis_client, script, keys, args):
+    """Run one of the slot scripts, loading it by SHA on first use (EVALSHA with EVAL fallback)."""
+    registered = _stream_slot_scripts.get(script)
+    if registered is None:
+        registered = _stream_slot_scripts[script] = redis_client.register_script(script)
+    return registered(keys=keys, args=args, client=redis_client)
+
+
+def allocate_channel_stream(channel_id, candidates):
+    """
+    Reuse the channel's active stream or claim a slot on the first candidate with room.
+
+    Args:
+        channel_id: Channel primary key
+        candidates: (stream_id, profile_id, max_streams) triples, in order of preference
+
+    Returns:
+        Tuple[int, int, bool]: (stream_id, profile_id, maxed_out); the ids are 0 if nothing was allocated
+    """
+    args = []
+    for candidate in candidates:
+        args.extend(candidate)
+
+    return run_stream_slot_script(
+        RedisClient.get_client(), ALLOCATE_STREAM_SCRIPT, [f"channel_stream:{channel_id}"], args
+    )
+
+
+def reserve_profile_slot(profile_id, max_streams):
+    """
+    Claim a connection slot on an M3U profile without assigning it to a channel.
+    Profiles without a limit need no slot. Returns False if the profile is full.
+    """
+    if not max_streams:
+        return True
+    return bool(run_stream_slot_script(
+        RedisClient.get_client(), RESERVE_PROFILE_SLOT_SCRIPT, [f"profile_connections:{profile_id}"], [max_streams]
+    ))
+
+
+def release_profile_slot(profile_id):
+    """Give back a slot claimed with reserve_profile_slot."""
+    run_stream_slot_script(
+        RedisClient.get_client(), RELEASE_PROFILE_SLOT_SCRIPT, [f"profile_connections:{profile_id}"], []
+    )
+
+
+def allocation_error_reason(has_candidates, maxed_out):
+    """Why allocate_channel_stream couldn't find a stream for a channel that has streams assigned."""
+    if maxed_out:
+        return "All M3U profiles have reached maximum connection limits"
+    if has_candidates:
+        return "No compatible profile found for any assigned stream"
+    return "No active profiles found for any assigned stream"
+
+
+def release_channel_stream(channel_id):
+    """Release the stream held by a channel. Returns the freed profile id, or 0 if none was held."""
+    return run_stream_slot_script(
+        RedisClient.get_client(), RELEASE_STREAM_SCRIPT, [f"channel_stream:{channel_id}"], []
+    )
+
+
+def get_stream_candidates(streams):
+    """
+    (stream, M3U profile) pairs for the given streams, keeping their order and
+    listing the default profile of each stream's account first. Inactive
+    profiles are skipped. Streams should come with m3u_account selected and
+    its profiles prefetched.
+    """
+    candidates = []
+    for stream in streams:
+        # Retrieve the M3U account associated with the stream.
+        m3u_account = stream.m3u_account
+        if not m3u_account:
+            logger.debug(f"Stream {stream.id} has no M3U account")
+            continue
+
+        m3u_profiles = m3u_account.profiles.all()
+        default_profile = next(
+            (obj for obj in m3u_profiles if obj.is_default), None
+        )
+
+        if not default_profile:
+            logger.debug(f"M3U account {m3u_account.id} has no default profile")
+            continue
+
+        profiles = [default_profile] + [
+            obj for obj in m3u_profiles if not obj.is_default
+        ]
+
+        for profile in profiles:
+            # Skip inactive profiles
+            if not profile.is_active:
+                logger.debug(f"Skipping inactive profile {profile.id}")
+                continue
+
+            candidates.append((stream, profile))
+
+    return candidates
+
+
 # Add fallback functions if Redis isn't available
 def get_total_viewers(channel_id):
     """Get viewer count from Redis or return 0 if Redis isn't available"""
@@ -201,27 +422,15 @@ class Stream(models.Model):
         """
         redis_client = RedisClient.get_client()
 
-        stream_id = self.id
-        # Get the matched profile for cleanup
-        profile_id = redis_client.get(f"stream_profile:{stream_id}")
+        profile_id = run_stream_slot_script(redis_client, RELEASE_STREAM_SCRIPT, [""], [self.id])
         if not profile_id:
             logger.debug("Invalid profile ID pulled from stream index")
             return
 
-        redis_client.delete(f"stream_profile:{stream_id}")  # Remove profile association
-
-        profile_id = int(profile_id)
         logger.debug(
-            f"Found profile ID {profile_id} associated with stream {stream_id}"
+            f"Released profile ID {profile_id} associated with stream {self.id}"
         )
 
-        profile_connections_key = f"profile_connections:{profile_id}"
-
-        # Only decrement if the profile had a max_connections limit
-        current_count = int(redis_client.get(profile_connections_key) or 0)
-        if current_count > 0:
-            redis_client.decr(profile_connections_key)
-
 
 class ChannelManager(models.Manager):
     def active(self):
@@ -321,150 +530,60 @@ class Channel(models.Model):
 
         return stream_profile
 
+    def get_stream_candidates(self):
+        """
+        (stream, M3U profile) pairs this channel can play, in order of preference:
+        streams in channel order, and for each the default profile first.
+        Inactive profiles are skipped.
+        """
+        streams = (
+            self.streams.all()
+            .order_by("channelstream__order")
+            .select_related("m3u_account")
+            .prefetch_related("m3u_account__profiles")
+        )
+
+        return get_stream_candidates(streams)
+
     def get_stream(self):
         """
         Finds an available stream for the requested channel and returns the selected stream and profile.
 
+        The active stream (if any) is reused; otherwise the first candidate whose
+        profile has a free slot is claimed. Both happen atomically in Redis, so
+        concurrent tunes can't exceed a profile's max_streams.
+
         Returns:
             Tuple[Optional[int], Optional[int], Optional[str]]: (stream_id, profile_id, error_reason)
         """
-        redis_client = RedisClient.get_client()
-        error_reason = None
-
-        # Check if this channel has any streams
-        if not self.streams.exists():
-            error_reason = "No streams assigned to channel"
-            return None, None, error_reason
-
-        # Check if a stream is already active for this channel
-        stream_id_bytes = redis_client.get(f"channel_stream:{self.id}")
-        if stream_id_bytes:
-            try:
-                stream_id = int(stream_id_bytes)
-                profile_id_bytes = redis_client.get(f"stream_profile:{stream_id}")
-                if profile_id_bytes:
-                    try:
-                        profile_id = int(profile_id_bytes)
-                        return stream_id, profile_id, None
-                    except (ValueError, TypeError):
-                        logger.debug(
-                            f"Invalid profile ID retrieved from Redis: {profile_id_bytes}"
-                        )
-            except (ValueError, TypeError):
-                logger.debug(
-                    f"Invalid stream ID retrieved from Redis: {stream_id_bytes}"
-                )
-
-        # No existing active stream, attempt to assign a new one
-        has_streams_but_maxed_out = False
-        has_active_profiles = False
-
-        # Iterate through channel streams and their profiles
-        for stream in self.streams.all().order_by("channelstream__order"):
-            # Retrieve the M3U account associated with the stream.
-            m3u_account = stream.m3u_account
-            if not m3u_account:
-                logger.debug(f"Stream {stream.id} has no M3U account")
-                continue
+        candidates = self.get_stream_candidates()
+        if not candidates and not self.streams.exists():
+            return None, None, "No streams assigned to channel"
 
-            m3u_profiles = m3u_account.profiles.all()
-            default_profile = next(
-                (obj for obj in m3u_profiles if obj.is_default), None
-            )
-
-            if not default_profile:
-                logger.debug(f"M3U account {m3u_account.id} has no default profile")
-                continue
+        stream_id, profile_id, maxed_out = allocate_channel_stream(
+            self.id,
+            [(stream.id, profile.id, profile.max_streams) for stream, profile in candidates],
+        )
 
-            profiles = [default_profile] + [
-                obj for obj in m3u_profiles if not obj.is_default
-            ]
-
-            for profile in profiles:
-                # Skip inactive profiles
-                if not profile.is_active:
-                    logger.debug(f"Skipping inactive profile {profile.id}")
-                    continue
-
-                has_active_profiles = True
-
-                profile_connections_key = f"profile_connections:{profile.id}"
-                current_connections = int(
-                    redis_client.get(profile_connections_key) or 0
-                )
-
-                # Check if profile has available slots (or unlimited connections)
-                if (
-                    profile.max_streams == 0
-                    or current_connections < profile.max_streams
-                ):
-                    # Start a new stream
-                    redis_client.set(f"channel_stream:{self.id}", stream.id)
-                    redis_client.set(f"stream_profile:{stream.id}", profile.id)
-
-                    # Increment connection count for profiles with limits
-                    if profile.max_streams > 0:
-                        redis_client.incr(profile_connections_key)
-
-                    return (
-                        stream.id,
-                        profile.id,
-                        None,
-                    )  # Return newly assigned stream and matched profile
-                else:
-                    # This profile is at max connections
-                    has_streams_but_maxed_out = True
-                    logger.debug(
-                        f"Profile {profile.id} at max connections: {current_connections}/{profile.max_streams}"
-                    )
+        if stream_id:
+            # Return the active or newly assigned stream and matched profile
+            return stream_id, profile_id, None
 
         # No available streams - determine specific reason
-        if has_streams_but_maxed_out:
-            error_reason = "All M3U profiles have reached maximum connection limits"
-        elif has_active_profiles:
-            error_reason = "No compatible profile found for any assigned stream"
-        else:
-            error_reason = "No active profiles found for any assigned stream"
-
-        return None, None, error_reason
+        if maxed_out:
+            logger.debug(f"All profiles at max connections for channel {self.id}")
+        return None, None, allocation_error_reason(bool(candidates), maxed_out)
 
     def release_stream(self):
         """
         Called when a stream is finished to release the lock.
         """
-        redis_client = RedisClient.get_client()
-
-        stream_id = redis_client.get(f"channel_stream:{self.id}")
-        if not stream_id:
-            logger.debug("Invalid stream ID pulled from channel index")
-            return
-
-        redis_client.delete(f"channel_stream:{self.id}")  # Remove active stream
-
-        stream_id = int(stream_id)
-        logger.debug(
-            f"Found stream ID {stream_id} associated with channel stream {self.id}"
-        )
-
-        # Get the matched profile for cleanup
-        profile_id = redis_client.get(f"stream_profile:{stream_id}")
+        profile_id = release_channel_stream(self.id)
         if not profile_id:
-            logger.debug("Invalid profile ID pulled from stream index")
+            logger.debug(f"No active stream to release for channel {self.id}")
             return
 
-        redis_client.delete(f"stream_profile:{stream_id}")  # Remove profile association
-
-        profile_id = int(profile_id)
-        logger.debug(
-            f"Found profile ID {profile_id} associated with stream {stream_id}"
-        )
-
-        profile_connections_key = f"profile_connections:{profile_id}"
-
-        # Only decrement if the profile had a max_connections limit
-        current_count = int(redis_client.get(profile_connections_key) or 0)
-        if current_count > 0:
-            redis_client.decr(profile_connections_key)
+        logger.debug(f"Released profile ID {profile_id} held by channel {self.id}")
 
     def update_stream_profile(self, new_profile_id):
         """
@@ -478,41 +597,24 @@ class Channel(models.Model):
         """
         redis_client = RedisClient.get_client()
 
-        # Get current stream ID
-        stream_id_bytes = redis_client.get(f"channel_stream:{self.id}")
-        if not stream_id_bytes:
+        stream_id, current_profile_id = run_stream_slot_script(
+            redis_client,
+            SWITCH_STREAM_PROFILE_SCRIPT,
+            [f"channel_stream:{self.id}"],
+            [new_profile_id],
+        )
+
+        if not stream_id:
             logger.debug("No active stream found for channel")
             return False
-
-        stream_id = int(stream_id_bytes)
-
-        # Get current profile ID
-        current_profile_id_bytes = redis_client.get(f"stream_profile:{stream_id}")
-        if not current_profile_id_bytes:
+        if not current_profile_id:
             logger.debug("No profile found for current stream")
             return False
 
-        current_profile_id = int(current_profile_id_bytes)
-
-        # Don't do anything if the profile is already set to the requested one
-        if current_profile_id == new_profile_id:
-            return True
-
-        # Decrement connection count for old profile
-        old_profile_connections_key = f"profile_connections:{current_profile_id}"
-        old_count = int(redis_client.get(old_profile_connections_key) or 0)
-        if old_count > 0:
-            redis_client.decr(old_profile_connections_key)
-
-        # Update the profile mapping
-        redis_client.set(f"stream_profile:{stream_id}", new_profile_id)
-
-        # Increment connection count for new profile
-        new_profile_connections_key = f"profile_connections:{new_profile_id}"
-        redis_client.incr(new_profile_connections_key)
-        logger.info(
-            f"Updated stream {stream_id} profile from {current_profile_id} to {new_profile_id}"
-        )
+        if current_profile_id != int(new_profile_id):
+            logger.info(
+                f"Updated stream {stream_id} profile from {current_profile_id} to {new_profile_id}"
+            )
         return True
 
 
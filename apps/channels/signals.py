@@ -4,9 +4,12 @@ from django.db.models.signals import m2m_changed, pre_save, post_save, post_dele
 from django.dispatch import receiver
 from django.utils.timezone import now
 from celery.result import AsyncResult
-from .models import Channel, Stream, ChannelProfile, ChannelProfileMembership, Recording
+from django.db import transaction
+from .models import Channel, Stream, ChannelProfile, ChannelProfileMembership, Recording, Logo, ChannelGroup
 from apps.m3u.models import M3UAccount
+from apps.accounts.models import User
 from apps.epg.tasks import parse_programs_for_tvg_id
+from core.utils import bump_cache_generation, CHANNELS_CACHE, XC_USERS_CACHE
 import logging, requests, time
 from .tasks import run_recording
 from django.utils.timezone import now, is_aware, make_aware
@@ -80,6 +83,52 @@ def create_profile_memberships(sender, instance, created, **kwargs):
             for channel in channels
         ])
 
+@receiver(post_save, sender=Channel)
+@receiver(post_delete, sender=Channel)
+@receiver(m2m_changed, sender=Channel.streams.through)
+@receiver(post_save, sender=Stream)
+@receiver(post_delete, sender=Stream)
+@receiver(post_save, sender=Logo)
+@receiver(post_delete, sender=Logo)
+@receiver(post_save, sender=ChannelGroup)
+@receiver(post_delete, sender=ChannelGroup)
+@receiver(post_save, sender=ChannelProfile)
+@receiver(post_delete, sender=ChannelProfile)
+@receiver(post_save, sender=ChannelProfileMembership)
+@receiver(post_delete, sender=ChannelProfileMembership)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(m2m_changed, sender=User.channel_profiles.through)
+def invalidate_channel_caches(sender, **kwargs):
+    """
+    Channel lineups (and which users can see them) feed the cached M3U/XMLTV
+    documents; invalidate them once the change is committed so a concurrent
+    rebuild can't cache the old state.
+    """
+    if sender is User and is_login_only_save(kwargs):
+        return
+    transaction.on_commit(lambda: bump_cache_generation(CHANNELS_CACHE))
+
+def is_login_only_save(kwargs):
+    """Whether a User save only recorded a login, which doesn't change any output."""
+    update_fields = kwargs.get("update_fields")
+    return update_fields is not None and set(update_fields) <= {"last_login"}
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_xc_credentials(sender, **kwargs):
+    from apps.accounts.xc import invalidate_xc_user
+
+    if is_login_only_save(kwargs):
+        return
+
+    # Usernames can change too, so forget everybody's credentials, in every process
+    def invalidate():
+        invalidate_xc_user()
+        bump_cache_generation(XC_USERS_CACHE)
+
+    transaction.on_commit(invalidate)
+
 def schedule_recording_task(instance):
     eta = instance.start_time
     task = run_recording.apply_async(
@@ -1,28 +1,24 @@
 # apps/channels/tasks.py
 import logging
-import os
-import select
 import re
 import requests
 import time
-import json
-import subprocess
 from datetime import datetime
 import gc
 
 from celery import shared_task
 from django.utils.text import slugify
 
-from apps.channels.models import Channel
+from apps.channels.models import Channel, Logo
 from apps.epg.models import EPGData
 from core.models import CoreSettings
+from core.utils import bump_cache_generation, CHANNELS_CACHE
 
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
-import tempfile
 
 logger = logging.getLogger(__name__)
 
@@ -79,41 +75,49 @@ def match_epg_channels():
         channels_to_update = []
 
         # Get channels that don't have EPG data assigned
-        channels_without_epg = Channel.objects.filter(epg_data__isnull=True)
-        logger.info(f"Found {channels_without_epg.count()} channels without EPG data")
+        channels_without_epg = Channel.objects.filter(epg_data__isnull=True).values_list("id", "name", "tvg_id")
 
         channels_json = []
-        for channel in channels_without_epg:
+        for channel_id, name, tvg_id in channels_without_epg.iterator(chunk_size=2000):
             # Normalize TVG ID - strip whitespace and convert to lowercase
-            normalized_tvg_id = channel.tvg_id.strip().lower() if channel.tvg_id else ""
+            normalized_tvg_id = tvg_id.strip().lower() if tvg_id else ""
             if normalized_tvg_id:
-                logger.info(f"Processing channel {channel.id} '{channel.name}' with TVG ID='{normalized_tvg_id}'")
+                logger.debug(f"Processing channel {channel_id} '{name}' with TVG ID='{normalized_tvg_id}'")
 
             channels_json.append({
-                "id": channel.id,
-                "name": channel.name,
+                "id": channel_id,
+                "name": name,
                 "tvg_id": normalized_tvg_id,  # Use normalized TVG ID
-                "original_tvg_id": channel.tvg_id,  # Keep original for reference
-                "fallback_name": normalized_tvg_id if normalized_tvg_id else channel.name,
-                "norm_chan": normalize_name(normalized_tvg_id if normalized_tvg_id else channel.name)
+                "original_tvg_id": tvg_id,  # Keep original for reference
+                "fallback_name": normalized_tvg_id if normalized_tvg_id else name,
+                "norm_chan": normalize_name(normalized_tvg_id if normalized_tvg_id else name)
             })
+        logger.info(f"Found {len(channels_json)} channels without EPG data")
 
-        # Similarly normalize EPG data TVG IDs
+        # Similarly normalize EPG data TVG IDs. Normalized names repeat a lot
+        # across sources, so each distinct name is only normalized once.
+        epg_rows = EPGData.objects.values_list("id", "tvg_id", "name", "epg_source_id")
+        norm_names = {}
         epg_json = []
-        for epg in EPGData.objects.all():
-            normalized_tvg_id = epg.tvg_id.strip().lower() if epg.tvg_id else ""
+        for epg_id, tvg_id, name, epg_source_id in epg_rows.iterator(chunk_size=5000):
+            normalized_tvg_id = tvg_id.strip().lower() if tvg_id else ""
+            norm_name = norm_names.get(name)
+            if norm_name is None:
+                norm_name = norm_names[name] = normalize_name(name)
             epg_json.append({
-                'id': epg.id,
+                'id': epg_id,
                 'tvg_id': normalized_tvg_id,  # Use normalized TVG ID
-                'original_tvg_id': epg.tvg_id,  # Keep original for reference
-                'name': epg.name,
-                'norm_name': normalize_name(epg.name),
-                'epg_source_id': epg.epg_source.id if epg.epg_source else None,
+                'original_tvg_id': tvg_id,  # Keep original for reference
+                'name': name,
+                'norm_name': norm_name,
+                'epg_source_id': epg_source_id,
             })
+        del norm_names
 
         # Log available EPG data TVG IDs for debugging
         unique_epg_tvg_ids = set(e['tvg_id'] for e in epg_json if e['tvg_id'])
-        logger.info(f"Available EPG TVG IDs: {', '.join(sorted(unique_epg_tvg_ids))}")
+        logger.info(f"Matching against {len(epg_json)} EPG entries ({len(unique_epg_tvg_ids)} distinct TVG IDs)")
+        logger.debug(f"Available EPG TVG IDs: {', '.join(sorted(unique_epg_tvg_ids))}")
 
         payload = {
             "channels": channels_json,
@@ -121,61 +125,17 @@ def match_epg_channels():
             "region_code": region_code,
         }
 
-        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-            temp_file.write(json.dumps(payload).encode('utf-8'))
-            temp_file_path = temp_file.name
+        # Runs in the warm matcher worker: the model and the EPG name
+        # embeddings are already loaded from previous runs
+        from .epg_matcher import process_data
 
-        # After writing to the file but before subprocess
-        # Explicitly delete the large data structures
+        result = process_data(payload)
         del payload
-        gc.collect()
-
-        process = subprocess.Popen(
-            ['python', '/app/scripts/epg_match.py', temp_file_path],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-
-        stdout = ''
-        block_size = 1024
-
-        while True:
-            # Monitor stdout and stderr for readability
-            readable, _, _ = select.select([process.stdout, process.stderr], [], [], 1) # timeout of 1 second
-
-            if not readable: # timeout expired
-                if process.poll() is not None: # check if process finished
-                    break
-                else: # process still running, continue
-                    continue
 
-            for stream in readable:
-                if stream == process.stdout:
-                    stdout += stream.read(block_size)
-                elif stream == process.stderr:
-                    error = stream.readline()
-                    if error:
-                        logger.info(error.strip())
-
-            if process.poll() is not None:
-                break
-
-        process.wait()
-        os.remove(temp_file_path)
-
-        if process.returncode != 0:
-            return f"Failed to process EPG matching"
-
-        result = json.loads(stdout)
         # This returns lists of dicts, not model objects
         channels_to_update_dicts = result["channels_to_update"]
         matched_channels = result["matched_channels"]
 
-        # Explicitly clean up large objects
-        del stdout, result
-        gc.collect()
-
         # Convert your dict-based 'channels_to_update' into real Channel objects
         if channels_to_update_dicts:
             # Extract IDs of the channels that need updates
@@ -198,6 +158,7 @@ def match_epg_channels():
 
             # Now we have real model objects, so bulk_update will work
             Channel.objects.bulk_update(channels_list, ["epg_data"])
+            bump_cache_generation(CHANNELS_CACHE)
 
         total_matched = len(matched_channels)
         if total_matched:
@@ -240,6 +201,43 @@ def match_epg_channels():
         cleanup_memory(log_usage=True, force_collection=True)
 
 
+@shared_task
+def update_epg_embeddings():
+    """
+    Bring the matcher's embedding index up to date with the current EPG names,
+    so the next match only has to score. Does nothing until matching has been
+    used once, to avoid loading the model for users who never auto-match.
+    """
+    from .epg_matcher import embedding_index
+
+    if not embedding_index.exists():
+        return "Embedding index not built yet, skipping"
+
+    names = set()
+    for name in EPGData.objects.values_list("name", flat=True).distinct().iterator(chunk_size=5000):
+        norm_name = normalize_name(name)
+        if norm_name:
+            names.add(norm_name)
+
+    embedding_index.sync(names)
+    return f"Embedding index holds {len(names)} EPG name(s)"
+
+
+@shared_task
+def prefetch_channel_logos():
+    """Download the remote logos used by channels into the logo cache ahead of the first guide request."""
+    from .logo_cache import prefetch_logos
+
+    urls = list(
+        Logo.objects.filter(channels__isnull=False)
+        .exclude(url__startswith="/data")
+        .values_list("url", flat=True)
+        .distinct()
+    )
+    fetched = prefetch_logos(urls)
+    return f"Prefetched {fetched} of {len(urls)} channel logo(s)"
+
+
 @shared_task
 def run_recording(channel_id, start_time_str, end_time_str):
     channel = Channel.objects.get(id=channel_id)
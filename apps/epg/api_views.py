@@ -1,4 +1,4 @@
-import logging, os
+import logging, os, json
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -6,7 +6,9 @@ from rest_framework.decorators import action
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.dateparse import parse_datetime
+from django.core.cache import cache
+from django.http import HttpResponse
 from .models import EPGSource, ProgramData, EPGData  # Added ProgramData
 from .serializers import (
     ProgramDataSerializer,
@@ -14,6 +16,15 @@ from .serializers import (
     EPGDataSerializer,
 )  # Updated serializer
 from .tasks import refresh_epg_data
+from .dummy import get_dummy_grid_programs
+from .grid import (
+    BUCKET_SECONDS,
+    DEFAULT_WINDOW_HOURS,
+    default_window_start,
+    floor_to_bucket,
+    get_grid_programs,
+)
+from core.utils import get_cache_generation, CHANNELS_CACHE, EPG_CACHE
 from apps.accounts.permissions import (
     Authenticated,
     permission_classes_by_action,
@@ -123,145 +134,106 @@ class EPGGridAPIView(APIView):
             return [Authenticated()]
 
     @swagger_auto_schema(
-        operation_description="Retrieve programs from the previous hour, currently running and upcoming for the next 24 hours",
+        operation_description=(
+            "Retrieve programs from the previous hour, currently running and upcoming for the next 24 hours. "
+            "Optional query parameters: start (ISO datetime, window start, rounded down to the hour), "
+            "hours (window length, max 168), channel_offset / channel_limit (page through channels "
+            "ordered by channel number; only their programs are returned)."
+        ),
         responses={200: ProgramDataSerializer(many=True)},
     )
     def get(self, request, format=None):
-        # Use current time instead of midnight
-        now = timezone.now()
-        one_hour_ago = now - timedelta(hours=1)
-        twenty_four_hours_later = now + timedelta(hours=24)
-        logger.debug(
-            f"EPGGridAPIView: Querying programs between {one_hour_ago} and {twenty_four_hours_later}."
-        )
+        try:
+            window_start, window_hours, channel_offset, channel_limit = self._parse_window(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        window_end = window_start + window_hours * BUCKET_SECONDS
+
+        # The window is hour-aligned, so the whole response is stable until the next
+        # hour or until channels / EPG data change
+        generation = get_cache_generation(CHANNELS_CACHE, EPG_CACHE)
+        cache_key = None
+        if generation is not None:
+            cache_key = f"epg_grid_response:{generation}:{window_start}:{window_hours}:{channel_offset}:{channel_limit}"
+            body = cache.get(cache_key)
+            if body is not None:
+                return HttpResponse(body, content_type="application/json")
 
-        # Use select_related to prefetch EPGData and include programs from the last hour
-        programs = ProgramData.objects.select_related("epg").filter(
-            # Programs that end after one hour ago (includes recently ended programs)
-            end_time__gt=one_hour_ago,
-            # AND start before the end time window
-            start_time__lt=twenty_four_hours_later,
-        )
-        count = programs.count()
         logger.debug(
-            f"EPGGridAPIView: Found {count} program(s), including recently ended, currently running, and upcoming shows."
+            f"EPGGridAPIView: Building grid for {window_hours}h window starting {window_start}."
         )
 
-        # Generate dummy programs for channels that have no EPG data
         from apps.channels.models import Channel
-        from django.db.models import Q
 
-        # Get channels with no EPG data
-        channels_without_epg = Channel.objects.filter(Q(epg_data__isnull=True))
-        channels_count = channels_without_epg.count()
+        channels = Channel.objects.order_by("channel_number").values(
+            "id", "uuid", "name", "epg_data_id", "epg_data__tvg_id"
+        )
+        if channel_limit is not None:
+            channels = channels[channel_offset:channel_offset + channel_limit]
+        elif channel_offset:
+            channels = channels[channel_offset:]
+        channels = list(channels)
 
-        # Log more detailed information about channels missing EPG data
-        if channels_count > 0:
-            channel_names = [f"{ch.name} (ID: {ch.id})" for ch in channels_without_epg]
-            logger.warning(
-                f"EPGGridAPIView: Missing EPG data for these channels: {', '.join(channel_names)}"
-            )
+        # Without channel pagination every program in the window is returned
+        tvg_ids = None
+        if channel_limit is not None or channel_offset:
+            tvg_ids = {ch["epg_data__tvg_id"] for ch in channels if ch["epg_data__tvg_id"]}
 
-        logger.debug(
-            f"EPGGridAPIView: Found {channels_count} channels with no EPG data."
-        )
+        programs = get_grid_programs(window_start, window_end, tvg_ids)
+
+        # Generate dummy programs for channels that have no EPG data
+        channels_without_epg = [ch for ch in channels if not ch["epg_data_id"]]
+        if channels_without_epg:
+            logger.debug(
+                f"EPGGridAPIView: {len(channels_without_epg)} channel(s) have no EPG data, generating dummy programs."
+            )
 
-        # Serialize the regular programs
-        serialized_programs = ProgramDataSerializer(programs, many=True).data
-
-        # Humorous program descriptions based on time of day - same as in output/views.py
-        time_descriptions = {
-            (0, 4): [
-                "Late Night with {channel} - Where insomniacs unite!",
-                "The 'Why Am I Still Awake?' Show on {channel}",
-                "Counting Sheep - A {channel} production for the sleepless",
-            ],
-            (4, 8): [
-                "Dawn Patrol - Rise and shine with {channel}!",
-                "Early Bird Special - Coffee not included",
-                "Morning Zombies - Before coffee viewing on {channel}",
-            ],
-            (8, 12): [
-                "Mid-Morning Meetings - Pretend you're paying attention while watching {channel}",
-                "The 'I Should Be Working' Hour on {channel}",
-                "Productivity Killer - {channel}'s daytime programming",
-            ],
-            (12, 16): [
-                "Lunchtime Laziness with {channel}",
-                "The Afternoon Slump - Brought to you by {channel}",
-                "Post-Lunch Food Coma Theater on {channel}",
-            ],
-            (16, 20): [
-                "Rush Hour - {channel}'s alternative to traffic",
-                "The 'What's For Dinner?' Debate on {channel}",
-                "Evening Escapism - {channel}'s remedy for reality",
-            ],
-            (20, 24): [
-                "Prime Time Placeholder - {channel}'s finest not-programming",
-                "The 'Netflix Was Too Complicated' Show on {channel}",
-                "Family Argument Avoider - Courtesy of {channel}",
-            ],
-        }
-
-        # Generate and append dummy programs
         dummy_programs = []
-        for channel in channels_without_epg:
-            # Use the channel UUID as tvg_id for dummy programs to match in the guide
-            dummy_tvg_id = str(channel.uuid)
-
-            try:
-                # Create programs every 4 hours for the next 24 hours
-                for hour_offset in range(0, 24, 4):
-                    # Use timedelta for time arithmetic instead of replace() to avoid hour overflow
-                    start_time = now + timedelta(hours=hour_offset)
-                    # Set minutes/seconds to zero for clean time blocks
-                    start_time = start_time.replace(minute=0, second=0, microsecond=0)
-                    end_time = start_time + timedelta(hours=4)
-
-                    # Get the hour for selecting a description
-                    hour = start_time.hour
-                    day = 0  # Use 0 as we're only doing 1 day
-
-                    # Find the appropriate time slot for description
-                    for time_range, descriptions in time_descriptions.items():
-                        start_range, end_range = time_range
-                        if start_range <= hour < end_range:
-                            # Pick a description using the sum of the hour and day as seed
-                            # This makes it somewhat random but consistent for the same timeslot
-                            description = descriptions[
-                                (hour + day) % len(descriptions)
-                            ].format(channel=channel.name)
-                            break
-                    else:
-                        # Fallback description if somehow no range matches
-                        description = f"Placeholder program for {channel.name} - EPG data went on vacation"
-
-                    # Create a dummy program in the same format as regular programs
-                    dummy_program = {
-                        "id": f"dummy-{channel.id}-{hour_offset}",  # Create a unique ID
-                        "epg": {"tvg_id": dummy_tvg_id, "name": channel.name},
-                        "start_time": start_time.isoformat(),
-                        "end_time": end_time.isoformat(),
-                        "title": f"{channel.name}",
-                        "description": description,
-                        "tvg_id": dummy_tvg_id,
-                        "sub_title": None,
-                        "custom_properties": None,
-                    }
-                    dummy_programs.append(dummy_program)
-
-            except Exception as e:
-                logger.error(
-                    f"Error creating dummy programs for channel {channel.name} (ID: {channel.id}): {str(e)}"
-                )
-
-        # Combine regular and dummy programs
-        all_programs = list(serialized_programs) + dummy_programs
+        for ch in channels_without_epg:
+            dummy_programs.extend(
+                get_dummy_grid_programs(ch["id"], ch["uuid"], ch["name"], window_start, window_end)
+            )
+
         logger.debug(
-            f"EPGGridAPIView: Returning {len(all_programs)} total programs (including {len(dummy_programs)} dummy programs)."
+            f"EPGGridAPIView: Returning {len(programs) + len(dummy_programs)} total programs (including {len(dummy_programs)} dummy programs)."
         )
 
-        return Response({"data": all_programs}, status=status.HTTP_200_OK)
+        payload = {"data": programs + dummy_programs}
+        if channel_limit is not None:
+            payload["channel_offset"] = channel_offset
+            payload["channel_limit"] = channel_limit
+            payload["next_channel_offset"] = (
+                channel_offset + channel_limit if len(channels) == channel_limit else None
+            )
+
+        body = json.dumps(payload, separators=(",", ":"))
+        if cache_key is not None:
+            cache.set(cache_key, body, BUCKET_SECONDS)
+
+        return HttpResponse(body, content_type="application/json")
+
+    def _parse_window(self, request):
+        start_param = request.query_params.get("start")
+        if start_param:
+            start = parse_datetime(start_param)
+            if start is None:
+                raise ValueError("Invalid 'start' datetime")
+            if timezone.is_naive(start):
+                start = timezone.make_aware(start)
+            window_start = floor_to_bucket(start.timestamp())
+        else:
+            window_start = default_window_start()
+
+        window_hours = int(request.query_params.get("hours", DEFAULT_WINDOW_HOURS))
+        window_hours = max(1, min(window_hours, 168))
+
+        channel_offset = max(0, int(request.query_params.get("channel_offset", 0)))
+        channel_limit = request.query_params.get("channel_limit")
+        if channel_limit is not None:
+            channel_limit = max(1, int(channel_limit))
+
+        return window_start, window_hours, channel_offset, channel_limit
 
 
 # ─────────────────────────────
@@ -0,0 +1,215 @@
+# apps/epg/dummy.py
+"""
+Placeholder schedules for channels without EPG data.
+
+A channel's dummy schedule only depends on its name, the day and the block
+length: each UTC day is split into fixed-length blocks starting at midnight,
+and each block gets a description picked deterministically from its time of
+day. Schedules are built once per (channel name, day, block length) and kept in
+memory with their XMLTV, grid and Xtream Codes forms rendered on first use, so
+the XMLTV output, the EPG grid and the XC EPG actions all share them.
+"""
+
+import threading
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+from .grid import format_datetime
+from .listings import UPCOMING_HORIZON, serialize_listing
+from .xmltv import CHANNEL_PLACEHOLDER, render_programme
+
+DUMMY_PROGRAM_HOURS = 4
+
+# Humorous program descriptions based on time of day
+TIME_DESCRIPTIONS = (
+    ((0, 4), (
+        "Late Night with {channel} - Where insomniacs unite!",
+        "The 'Why Am I Still Awake?' Show on {channel}",
+        "Counting Sheep - A {channel} production for the sleepless",
+    )),
+    ((4, 8), (
+        "Dawn Patrol - Rise and shine with {channel}!",
+        "Early Bird Special - Coffee not included",
+        "Morning Zombies - Before coffee viewing on {channel}",
+    )),
+    ((8, 12), (
+        "Mid-Morning Meetings - Pretend you're paying attention while watching {channel}",
+        "The 'I Should Be Working' Hour on {channel}",
+        "Productivity Killer - {channel}'s daytime programming",
+    )),
+    ((12, 16), (
+        "Lunchtime Laziness with {channel}",
+        "The Afternoon Slump - Brought to you by {channel}",
+        "Post-Lunch Food Coma Theater on {channel}",
+    )),
+    ((16, 20), (
+        "Rush Hour - {channel}'s alternative to traffic",
+        "The 'What's For Dinner?' Debate on {channel}",
+        "Evening Escapism - {channel}'s remedy for reality",
+    )),
+    ((20, 24), (
+        "Prime Time Placeholder - {channel}'s finest not-programming",
+        "The 'Netflix Was Too Complicated' Show on {channel}",
+        "Family Argument Avoider - Courtesy of {channel}",
+    )),
+)
+
+# day -> {(channel name, block length): DummyDay}
+_days = {}
+_days_lock = threading.Lock()
+
+
+def describe(channel_name, start_time):
+    hour = start_time.hour
+    for (start_range, end_range), descriptions in TIME_DESCRIPTIONS:
+        if start_range <= hour < end_range:
+            # Consistent for the same timeslot, but varies from day to day
+            description = descriptions[(hour + start_time.toordinal()) % len(descriptions)]
+            return description.format(channel=channel_name)
+
+    # Fallback description if somehow no range matches
+    return f"Placeholder program for {channel_name} - EPG data went on vacation"
+
+
+class DummyDay:
+    """One channel's dummy programmes for one UTC day, with memoized output forms."""
+
+    def __init__(self, channel_name, day, program_length_hours):
+        day_start = datetime.combine(day, dt_time.min, tzinfo=dt_timezone.utc)
+        self.programs = []
+        for hour_offset in range(0, 24, program_length_hours):
+            start_time = day_start + timedelta(hours=hour_offset)
+            self.programs.append({
+                "start_time": start_time,
+                "end_time": start_time + timedelta(hours=program_length_hours),
+                "title": channel_name,
+                "description": describe(channel_name, start_time),
+            })
+
+        self._xml = None
+        self._listings = None
+        self._grid_rows = None
+
+    def xml(self):
+        """The day's <programme> elements, with CHANNEL_PLACEHOLDER as channel."""
+        if self._xml is None:
+            self._xml = "".join(render_programme(program) for program in self.programs)
+        return self._xml
+
+    def listings(self):
+        """The day's programmes as XC listings (see apps.epg.listings)."""
+        if self._listings is None:
+            self._listings = [
+                serialize_listing(program["title"], program["description"], program["start_time"], program["end_time"])
+                for program in self.programs
+            ]
+        return self._listings
+
+    def grid_rows(self):
+        """The channel-independent fields of the day's EPG grid rows."""
+        if self._grid_rows is None:
+            self._grid_rows = [
+                {
+                    "start_time": format_datetime(program["start_time"]),
+                    "end_time": format_datetime(program["end_time"]),
+                    "start_timestamp": int(program["start_time"].timestamp()),
+                    "stop_timestamp": int(program["end_time"].timestamp()),
+                    "title": program["title"],
+                    "description": program["description"],
+                }
+                for program in self.programs
+            ]
+        return self._grid_rows
+
+
+def get_dummy_day(channel_name, day, program_length_hours=DUMMY_PROGRAM_HOURS):
+    key = (channel_name, program_length_hours)
+    schedules = _days.get(day)
+    if schedules is None:
+        with _days_lock:
+            schedules = _days.setdefault(day, {})
+            # Only today's neighbours are ever asked for again
+            yesterday = timezone.now().date() - timedelta(days=1)
+            for old_day in [d for d in _days if d < yesterday]:
+                del _days[old_day]
+
+    dummy_day = schedules.get(key)
+    if dummy_day is None:
+        dummy_day = schedules.setdefault(key, DummyDay(channel_name, day, program_length_hours))
+    return dummy_day
+
+
+def get_dummy_days(channel_name, start, end, program_length_hours=DUMMY_PROGRAM_HOURS):
+    """The DummyDays covering [start, end), both aware datetimes."""
+    day = start.astimezone(dt_timezone.utc).date()
+    last_day = (end - timedelta(microseconds=1)).astimezone(dt_timezone.utc).date()
+    days = []
+    while day <= last_day:
+        days.append(get_dummy_day(channel_name, day, program_length_hours))
+        day += timedelta(days=1)
+    return days
+
+
+def render_dummy_xmltv(channel_id, channel_name, num_days):
+    """
+    XMLTV programmes for a channel without EPG data, from the start of today
+    through the next num_days days.
+
+    Args:
+        channel_id: Already-escaped channel id
+    """
+    now = timezone.now()
+    days = get_dummy_days(channel_name, now, now + timedelta(days=num_days))
+    return "".join(day.xml() for day in days).replace(CHANNEL_PLACEHOLDER, channel_id)
+
+
+def get_dummy_listings(channel_name, count=None):
+    """
+    XC listings of a channel without EPG data that are airing or upcoming.
+    Without a count, the programmes within the next UPCOMING_HORIZON are returned.
+    """
+    now = timezone.now()
+    now_ts = int(now.timestamp())
+    horizon = UPCOMING_HORIZON if count is None else timedelta(hours=count * DUMMY_PROGRAM_HOURS)
+    horizon_ts = int((now + horizon).timestamp())
+
+    listings = [
+        listing
+        for day in get_dummy_days(channel_name, now, now + horizon)
+        for listing in day.listings()
+        if listing["stop_timestamp"] > now_ts and listing["start_timestamp"] < horizon_ts
+    ]
+    return listings if count is None else listings[:count]
+
+
+def get_dummy_grid_programs(channel_id, channel_uuid, channel_name, window_start, window_end):
+    """
+    EPG grid rows of a channel without EPG data overlapping [window_start, window_end).
+
+    Args:
+        window_start, window_end: UNIX timestamps
+    """
+    # Use the channel UUID as tvg_id for dummy programs to match in the guide
+    dummy_tvg_id = str(channel_uuid)
+    start = datetime.fromtimestamp(window_start, tz=dt_timezone.utc)
+    end = datetime.fromtimestamp(window_end, tz=dt_timezone.utc)
+
+    programs = []
+    for day in get_dummy_days(channel_name, start, end):
+        for row in day.grid_rows():
+            if row["stop_timestamp"] <= window_start or row["start_timestamp"] >= window_end:
+                continue
+            # Create a dummy program in the same format as regular programs
+            programs.append({
+                "id": f"dummy-{channel_id}-{row['start_timestamp']}",
+                "epg": {"tvg_id": dummy_tvg_id, "name": channel_name},
+                "start_time": row["start_time"],
+                "end_time": row["end_time"],
+                "title": row["title"],
+                "description": row["description"],
+                "tvg_id": dummy_tvg_id,
+                "sub_title": None,
+                "custom_properties": None,
+            })
+    return programs
@@ -0,0 +1,162 @@
+# apps/epg/grid.py
+"""
+Hour-bucketed programme cache backing the EPG grid endpoint.
+
+Each bucket holds the serialized programmes overlapping one hour. Buckets are
+stored in Redis under the current EPG cache generation, so they are shared by
+every worker, precomputed right after an EPG import, and only the hours that
+roll into the guide window ever have to be read from the database.
+"""
+
+import json
+import logging
+from datetime import datetime, timezone as dt_timezone
+
+from django.utils import timezone
+
+from core.utils import RedisClient, get_cache_generation, EPG_CACHE
+from .models import ProgramData
+
+logger = logging.getLogger(__name__)
+
+BUCKET_SECONDS = 60 * 60
+# Buckets are only ever needed while they fall inside the guide window
+BUCKET_TTL = 26 * 60 * 60
+
+# Default guide window: the previous hour through the next 24 hours
+DEFAULT_WINDOW_BEFORE = 1 * BUCKET_SECONDS
+DEFAULT_WINDOW_HOURS = 25
+
+GRID_FIELDS = ("id", "start_time", "end_time", "title", "sub_title", "description", "tvg_id")
+
+
+def format_datetime(value):
+    """Format a datetime the way DRF's DateTimeField does."""
+    value = value.isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+def floor_to_bucket(timestamp):
+    return int(timestamp) - int(timestamp) % BUCKET_SECONDS
+
+
+def default_window_start():
+    return floor_to_bucket(timezone.now().timestamp()) - DEFAULT_WINDOW_BEFORE
+
+
+def _bucket_key(generation, bucket_start):
+    return f"epg_grid:{generation}:{bucket_start}"
+
+
+def build_buckets(window_start, window_end):
+    """
+    Read the programmes overlapping [window_start, window_end) from the database
+    in one query and group them into hour buckets.
+
+    Args:
+        window_start, window_end: Bucket-aligned UNIX timestamps
+
+    Returns:
+        Dict of bucket start timestamp -> list of serialized programmes
+    """
+    buckets = {start: [] for start in range(window_start, window_end, BUCKET_SECONDS)}
+
+    programs = ProgramData.objects.filter(
+        end_time__gt=datetime.fromtimestamp(window_start, tz=dt_timezone.utc),
+        start_time__lt=datetime.fromtimestamp(window_end, tz=dt_timezone.utc),
+    ).values(*GRID_FIELDS)
+
+    for program in programs.iterator(chunk_size=5000):
+        row = {
+            "id": program["id"],
+            "start_time": format_datetime(program["start_time"]),
+            "end_time": format_datetime(program["end_time"]),
+            "title": program["title"],
+            "sub_title": program["sub_title"],
+            "description": program["description"],
+            "tvg_id": program["tvg_id"],
+        }
+
+        program_end = program["end_time"].timestamp()
+        bucket = max(floor_to_bucket(program["start_time"].timestamp()), window_start)
+        while bucket < window_end and bucket < program_end:
+            buckets[bucket].append(row)
+            bucket += BUCKET_SECONDS
+
+    return buckets
+
+
+def get_grid_programs(window_start, window_end, tvg_ids=None):
+    """
+    Return the serialized programmes overlapping [window_start, window_end),
+    reading whole hour buckets from the cache and only querying for missing ones.
+
+    Args:
+        window_start, window_end: Bucket-aligned UNIX timestamps
+        tvg_ids: Optional set of tvg_ids to restrict the result to
+    """
+    bucket_starts = list(range(window_start, window_end, BUCKET_SECONDS))
+    generation = get_cache_generation(EPG_CACHE)
+    redis_client = RedisClient.get_client()
+
+    buckets = {}
+    if generation is not None and redis_client is not None:
+        keys = [_bucket_key(generation, start) for start in bucket_starts]
+        try:
+            for start, value in zip(bucket_starts, redis_client.mget(keys)):
+                if value is not None:
+                    buckets[start] = json.loads(value)
+        except Exception as e:
+            logger.warning(f"Unable to read EPG grid buckets: {e}")
+
+    missing = [start for start in bucket_starts if start not in buckets]
+    if missing:
+        built = build_buckets(missing[0], missing[-1] + BUCKET_SECONDS)
+        for start in missing:
+            buckets[start] = built[start]
+
+        if generation is not None and redis_client is not None:
+            _store_buckets(redis_client, generation, {start: built[start] for start in missing})
+
+    # Programmes spanning several hours appear in each of their buckets
+    seen = set()
+    programs = []
+    for start in bucket_starts:
+        for row in buckets[start]:
+            if row["id"] in seen:
+                continue
+            if tvg_ids is not None and row["tvg_id"] not in tvg_ids:
+                continue
+            seen.add(row["id"])
+            programs.append(row)
+
+    return programs
+
+
+def _store_buckets(redis_client, generation, buckets):
+    try:
+        pipe = redis_client.pipeline()
+        for start, rows in buckets.items():
+            pipe.set(
+                _bucket_key(generation, start),
+                json.dumps(rows, separators=(",", ":")),
+                ex=BUCKET_TTL,
+            )
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Unable to store EPG grid buckets: {e}")
+
+
+def warm_grid_cache():
+    """Precompute the buckets of the default guide window, e.g. after an EPG import."""
+    generation = get_cache_generation(EPG_CACHE)
+    redis_client = RedisClient.get_client()
+    if generation is None or redis_client is None:
+        return
+
+    window_start = default_window_start()
+    window_end = window_start + DEFAULT_WINDOW_HOURS * BUCKET_SECONDS
+    _store_buckets(redis_client, generation, build_buckets(window_start, window_end))
+    logger.debug("Precomputed EPG grid buckets for the default guide window")
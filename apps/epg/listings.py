@@ -0,0 +1,146 @@
+# apps/epg/listings.py
+"""
+Rolling per-EPG cache of the current and upcoming programmes, backing the
+Xtream Codes get_short_epg / get_simple_data_table actions.
+
+Each entry holds the channel-independent part of an XC listing, including the
+base64-encoded title and description, so a request only has to drop the
+programmes that have finished and add the channel fields. Entries are stored in
+Redis under the current EPG cache generation and precomputed after an import
+for every EPG that is assigned to a channel.
+"""
+
+import base64
+import json
+import logging
+from datetime import timedelta
+
+from django.utils import timezone
+
+from core.utils import RedisClient, get_cache_generation, EPG_CACHE
+from .models import EPGData, ProgramData
+
+logger = logging.getLogger(__name__)
+
+# Programmes kept per EPG: enough for now/next and most of a day of listings
+UPCOMING_PROGRAMS = 48
+# Cached lists cover programmes starting within this window
+UPCOMING_HORIZON = timedelta(hours=24)
+# Cached lists are rebuilt at least this often, so they keep rolling forward
+UPCOMING_TTL = 60 * 60
+# Upper bound for explicitly requested listings that bypass the cache
+MAX_LISTINGS = 500
+
+
+def _cache_key(generation, epg_id):
+    return f"epg_upcoming:{generation}:{epg_id}"
+
+
+def serialize_listing(title, description, start, end):
+    return {
+        "title": base64.b64encode((title or "").encode()).decode(),
+        "description": base64.b64encode((description or "").encode()).decode(),
+        "start": start.strftime("%Y%m%d%H%M%S"),
+        "end": end.strftime("%Y%m%d%H%M%S"),
+        "start_timestamp": int(start.timestamp()),
+        "stop_timestamp": int(end.timestamp()),
+    }
+
+
+def _upcoming_queryset(now):
+    # Served by the (epg, start_time) index
+    return ProgramData.objects.filter(end_time__gt=now).order_by("start_time")
+
+
+def _read_window(epg_id, now):
+    programs = _upcoming_queryset(now).filter(
+        epg_id=epg_id, start_time__lt=now + UPCOMING_HORIZON
+    ).values_list("title", "description", "start_time", "end_time")[:UPCOMING_PROGRAMS]
+    return [serialize_listing(*program) for program in programs]
+
+
+def get_upcoming_listings(epg_id, count=None):
+    """
+    Return the serialized programmes of an EPG that are currently airing or
+    upcoming, in start order.
+
+    Args:
+        epg_id: EPGData id
+        count: Number of programmes wanted. Without it, the programmes of the
+            cached window (the next UPCOMING_HORIZON, at most UPCOMING_PROGRAMS)
+            are returned.
+    """
+    now = timezone.now()
+    now_ts = int(now.timestamp())
+    generation = get_cache_generation(EPG_CACHE)
+    redis_client = RedisClient.get_client()
+    caching = generation is not None and redis_client is not None
+
+    window = None
+    if caching:
+        try:
+            cached = redis_client.get(_cache_key(generation, epg_id))
+            if cached is not None:
+                window = json.loads(cached)
+        except Exception as e:
+            logger.warning(f"Unable to read upcoming programmes for EPG {epg_id}: {e}")
+
+    if window is None:
+        window = _read_window(epg_id, now)
+        if caching:
+            _store(redis_client, generation, {epg_id: window})
+
+    # The cached window keeps rolling: finished programmes are skipped until it is rebuilt
+    listings = [listing for listing in window if listing["stop_timestamp"] > now_ts]
+    if count is None:
+        return listings
+    if len(listings) >= count:
+        return listings[:count]
+
+    # More programmes asked for than the window holds; read them directly
+    programs = _upcoming_queryset(now).filter(epg_id=epg_id).values_list(
+        "title", "description", "start_time", "end_time"
+    )[:min(count, MAX_LISTINGS)]
+    return [serialize_listing(*program) for program in programs]
+
+
+def _store(redis_client, generation, listings_by_epg):
+    try:
+        pipe = redis_client.pipeline()
+        for epg_id, listings in listings_by_epg.items():
+            pipe.set(
+                _cache_key(generation, epg_id),
+                json.dumps(listings, separators=(",", ":")),
+                ex=UPCOMING_TTL,
+            )
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Unable to store upcoming programmes: {e}")
+
+
+def warm_upcoming_cache():
+    """Precompute the upcoming programmes of every EPG assigned to a channel, e.g. after an import."""
+    generation = get_cache_generation(EPG_CACHE)
+    redis_client = RedisClient.get_client()
+    if generation is None or redis_client is None:
+        return
+
+    now = timezone.now()
+    programs = (
+        _upcoming_queryset(now)
+        .filter(
+            epg__in=EPGData.objects.filter(channels__isnull=False),
+            start_time__lt=now + UPCOMING_HORIZON,
+        )
+        .order_by("epg_id", "start_time")
+        .values_list("epg_id", "title", "description", "start_time", "end_time")
+    )
+
+    listings_by_epg = {}
+    for epg_id, title, description, start, end in programs.iterator(chunk_size=5000):
+        listings = listings_by_epg.setdefault(epg_id, [])
+        if len(listings) < UPCOMING_PROGRAMS:
+            listings.append(serialize_listing(title, description, start, end))
+
+    _store(redis_client, generation, listings_by_epg)
+    logger.debug(f"Precomputed upcoming programmes for {len(listings_by_epg)} EPG(s)")
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.6 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('epg', '0014_epgsource_extracted_file_path'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='programdata',
+            index=models.Index(fields=['start_time', 'end_time'], name='epg_program_start_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='programdata',
+            index=models.Index(fields=['epg', 'start_time'], name='epg_program_epg_start_idx'),
+        ),
+    ]
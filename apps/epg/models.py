@@ -152,5 +152,13 @@ class ProgramData(models.Model):
     tvg_id = models.CharField(max_length=255, null=True, blank=True)
     custom_properties = models.TextField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Guide window queries (programmes overlapping a time range)
+            models.Index(fields=["start_time", "end_time"], name="epg_program_start_end_idx"),
+            # Per-channel schedules (now/next, upcoming listings)
+            models.Index(fields=["epg", "start_time"], name="epg_program_epg_start_idx"),
+        ]
+
     def __str__(self):
         return f"{self.title} ({self.start_time} - {self.end_time})"
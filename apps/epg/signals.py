@@ -1,7 +1,8 @@
 from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
-from .models import EPGSource
+from .models import EPGSource, EPGData
 from .tasks import refresh_epg_data, delete_epg_refresh_task_by_id
+from .xmltv import delete_epg_fragment
 from django_celery_beat.models import PeriodicTask, IntervalSchedule
 from core.utils import is_protected_path
 import json
@@ -125,3 +126,8 @@ def delete_cached_files(sender, instance, **kwargs):
                 logger.info(f"Deleted extracted file: {instance.extracted_file_path}")
             except OSError as e:
                 logger.error(f"Error deleting extracted file {instance.extracted_file_path}: {e}")
+
+@receiver(post_delete, sender=EPGData)
+def delete_xmltv_fragment(sender, instance, **kwargs):
+    """Remove the pre-rendered programmes of a deleted EPGData record."""
+    delete_epg_fragment(instance.id)
@@ -24,7 +24,10 @@ from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 
 from .models import EPGSource, EPGData, ProgramData
-from core.utils import acquire_task_lock, release_task_lock, send_websocket_update, cleanup_memory
+from core.utils import acquire_task_lock, release_task_lock, send_websocket_update, cleanup_memory, bump_cache_generation, EPG_CACHE
+from .xmltv import store_epg_fragment
+from .grid import warm_grid_cache
+from .listings import warm_upcoming_cache
 
 logger = logging.getLogger(__name__)
 
@@ -1009,6 +1012,10 @@ def parse_channels_only(source):
 
         send_websocket_update('updates', 'update', {"success": True, "type": "epg_channels"})
 
+        # Let the matcher worker embed any new EPG names ahead of the next match
+        from apps.channels.tasks import update_epg_embeddings
+        update_epg_embeddings.delay()
+
         logger.info(f"Finished parsing channel info. Found {processed_channels} channels.")
 
         return True
@@ -1071,7 +1078,7 @@ def parse_channels_only(source):
 
 
 @shared_task
-def parse_programs_for_tvg_id(epg_id):
+def parse_programs_for_tvg_id(epg_id, invalidate_cache=True):
     if not acquire_task_lock('parse_epg_programs', epg_id):
         logger.info(f"Program parse for {epg_id} already in progress, skipping duplicate task")
         return "Task already running"
@@ -1300,6 +1307,14 @@ def parse_programs_for_tvg_id(epg_id):
             custom_properties_json = None
 
 
+        # Pre-render the XMLTV output for these programmes once, here, rather than
+        # on every guide request
+        store_epg_fragment(epg.id)
+        if invalidate_cache:
+            bump_cache_generation(EPG_CACHE)
+            warm_grid_cache()
+            warm_upcoming_cache()
+
         logger.info(f"Completed program parsing for tvg_id={epg.tvg_id}.")
     finally:
         # Reset internal caches and pools that lxml might be keeping
@@ -1397,7 +1412,8 @@ def parse_programs_for_source(epg_source, tvg_id=None):
             for epg in batch_entries:
                 if epg.tvg_id:
                     try:
-                        result = parse_programs_for_tvg_id(epg.id)
+                        # Invalidate cached guides once at the end rather than per entry
+                        result = parse_programs_for_tvg_id(epg.id, invalidate_cache=False)
                         if result == "Task already running":
                             logger.info(f"Program parse for {epg.id} already in progress, skipping")
 
@@ -1412,6 +1428,10 @@ def parse_programs_for_source(epg_source, tvg_id=None):
             batch_entries = None  # Remove reference to help garbage collection
             gc.collect()
 
+        bump_cache_generation(EPG_CACHE)
+        warm_grid_cache()
+        warm_upcoming_cache()
+
         # If there were failures, include them in the message but continue
         if failed_entries:
             epg_source.status = EPGSource.STATUS_SUCCESS  # Still mark as success if some processed
@@ -1541,6 +1561,15 @@ def fetch_schedules_direct(source):
                     logger.info(f"Created ProgramData '{title}' for tvg_id '{tvg_id}'.")
                 else:
                     logger.info(f"Updated ProgramData '{title}' for tvg_id '{tvg_id}'.")
+
+            store_epg_fragment(epg_data.id)
+
+        bump_cache_generation(EPG_CACHE)
+        warm_grid_cache()
+        warm_upcoming_cache()
+
+        from apps.channels.tasks import update_epg_embeddings
+        update_epg_embeddings.delay()
     except Exception as e:
         logger.error(f"Error fetching Schedules Direct data from {source.name}: {e}", exc_info=True)
 
@@ -0,0 +1,346 @@
+# apps/epg/xmltv.py
+"""
+Pre-rendered XMLTV programme fragments.
+
+Each EPGData record's programmes are rendered to XMLTV once, when they are
+imported, and stored on disk. Output endpoints then only have to substitute the
+channel id and concatenate fragments instead of re-escaping every field of every
+programme on every request.
+"""
+
+import html
+import json
+import logging
+import os
+import uuid
+
+from django.conf import settings
+
+from .models import ProgramData
+
+logger = logging.getLogger(__name__)
+
+# Stand-in for the channel attribute of <programme>. The channel id depends on the
+# output options (tvg_id_source, channel number), so it's filled in at output time.
+# NUL can never appear in XML, so it can't collide with real content.
+CHANNEL_PLACEHOLDER = "\x00channel\x00"
+
+XMLTV_TIME_FORMAT = "%Y%m%d%H%M%S %z"
+
+PROGRAM_FIELDS = (
+    "start_time",
+    "end_time",
+    "title",
+    "sub_title",
+    "description",
+    "custom_properties",
+)
+
+
+def get_fragment_dir():
+    fragment_dir = os.path.join(settings.MEDIA_ROOT, "cached_epg", "fragments")
+    os.makedirs(fragment_dir, exist_ok=True)
+    return fragment_dir
+
+
+def get_fragment_path(epg_id):
+    return os.path.join(get_fragment_dir(), f"{epg_id}.json")
+
+
+def render_custom_properties(custom_data):
+    """Render the optional XMLTV elements stored in ProgramData.custom_properties."""
+    escape = html.escape
+    program_xml = []
+
+    # Add categories if available
+    if "categories" in custom_data and custom_data["categories"]:
+        for category in custom_data["categories"]:
+            program_xml.append(f"    <category>{escape(category)}</category>")
+
+    # Add keywords if available
+    if "keywords" in custom_data and custom_data["keywords"]:
+        for keyword in custom_data["keywords"]:
+            program_xml.append(f"    <keyword>{escape(keyword)}</keyword>")
+
+    # Handle episode numbering - multiple formats supported
+    # Prioritize onscreen_episode over standalone episode for onscreen system
+    if "onscreen_episode" in custom_data:
+        program_xml.append(f'    <episode-num system="onscreen">{escape(custom_data["onscreen_episode"])}</episode-num>')
+    elif "episode" in custom_data:
+        program_xml.append(f'    <episode-num system="onscreen">E{custom_data["episode"]}</episode-num>')
+
+    # Handle dd_progid format
+    if 'dd_progid' in custom_data:
+        program_xml.append(f'    <episode-num system="dd_progid">{escape(custom_data["dd_progid"])}</episode-num>')
+
+    # Handle external database IDs
+    for system in ['thetvdb.com', 'themoviedb.org', 'imdb.com']:
+        if f'{system}_id' in custom_data:
+            program_xml.append(f'    <episode-num system="{system}">{escape(custom_data[f"{system}_id"])}</episode-num>')
+
+    # Add season and episode numbers in xmltv_ns format if available
+    if "season" in custom_data and "episode" in custom_data:
+        season = (
+            int(custom_data["season"]) - 1
+            if str(custom_data["season"]).isdigit()
+            else 0
+        )
+        episode = (
+            int(custom_data["episode"]) - 1
+            if str(custom_data["episode"]).isdigit()
+            else 0
+        )
+        program_xml.append(f'    <episode-num system="xmltv_ns">{season}.{episode}.</episode-num>')
+
+    # Add language information
+    if "language" in custom_data:
+        program_xml.append(f'    <language>{escape(custom_data["language"])}</language>')
+
+    if "original_language" in custom_data:
+        program_xml.append(f'    <orig-language>{escape(custom_data["original_language"])}</orig-language>')
+
+    # Add length information
+    if "length" in custom_data and isinstance(custom_data["length"], dict):
+        length_value = custom_data["length"].get("value", "")
+        length_units = custom_data["length"].get("units", "minutes")
+        program_xml.append(f'    <length units="{escape(length_units)}">{escape(str(length_value))}</length>')
+
+    # Add video information
+    if "video" in custom_data and isinstance(custom_data["video"], dict):
+        program_xml.append("    <video>")
+        for attr in ['present', 'colour', 'aspect', 'quality']:
+            if attr in custom_data["video"]:
+                program_xml.append(f"      <{attr}>{escape(custom_data['video'][attr])}</{attr}>")
+        program_xml.append("    </video>")
+
+    # Add audio information
+    if "audio" in custom_data and isinstance(custom_data["audio"], dict):
+        program_xml.append("    <audio>")
+        for attr in ['present', 'stereo']:
+            if attr in custom_data["audio"]:
+                program_xml.append(f"      <{attr}>{escape(custom_data['audio'][attr])}</{attr}>")
+        program_xml.append("    </audio>")
+
+    # Add subtitles information
+    if "subtitles" in custom_data and isinstance(custom_data["subtitles"], list):
+        for subtitle in custom_data["subtitles"]:
+            if isinstance(subtitle, dict):
+                subtitle_type = subtitle.get("type", "")
+                type_attr = f' type="{escape(subtitle_type)}"' if subtitle_type else ""
+                program_xml.append(f"    <subtitles{type_attr}>")
+                if "language" in subtitle:
+                    program_xml.append(f"      <language>{escape(subtitle['language'])}</language>")
+                program_xml.append("    </subtitles>")
+
+    # Add rating if available
+    if "rating" in custom_data:
+        rating_system = custom_data.get("rating_system", "TV Parental Guidelines")
+        program_xml.append(f'    <rating system="{escape(rating_system)}">')
+        program_xml.append(f'      <value>{escape(custom_data["rating"])}</value>')
+        program_xml.append("    </rating>")
+
+    # Add star ratings
+    if "star_ratings" in custom_data and isinstance(custom_data["star_ratings"], list):
+        for star_rating in custom_data["star_ratings"]:
+            if isinstance(star_rating, dict) and "value" in star_rating:
+                system_attr = f' system="{escape(star_rating["system"])}"' if "system" in star_rating else ""
+                program_xml.append(f"    <star-rating{system_attr}>")
+                program_xml.append(f"      <value>{escape(star_rating['value'])}</value>")
+                program_xml.append("    </star-rating>")
+
+    # Add reviews
+    if "reviews" in custom_data and isinstance(custom_data["reviews"], list):
+        for review in custom_data["reviews"]:
+            if isinstance(review, dict) and "content" in review:
+                review_type = review.get("type", "text")
+                attrs = [f'type="{escape(review_type)}"']
+                if "source" in review:
+                    attrs.append(f'source="{escape(review["source"])}"')
+                if "reviewer" in review:
+                    attrs.append(f'reviewer="{escape(review["reviewer"])}"')
+                attr_str = " ".join(attrs)
+                program_xml.append(f'    <review {attr_str}>{escape(review["content"])}</review>')
+
+    # Add images
+    if "images" in custom_data and isinstance(custom_data["images"], list):
+        for image in custom_data["images"]:
+            if isinstance(image, dict) and "url" in image:
+                attrs = []
+                for attr in ['type', 'size', 'orient', 'system']:
+                    if attr in image:
+                        attrs.append(f'{attr}="{escape(image[attr])}"')
+                attr_str = " " + " ".join(attrs) if attrs else ""
+                program_xml.append(f'    <image{attr_str}>{escape(image["url"])}</image>')
+
+    # Add enhanced credits handling
+    if "credits" in custom_data:
+        program_xml.append("    <credits>")
+        credits = custom_data["credits"]
+
+        # Handle different credit types
+        for role in ['director', 'writer', 'adapter', 'producer', 'composer', 'editor', 'presenter', 'commentator', 'guest']:
+            if role in credits:
+                people = credits[role]
+                if isinstance(people, list):
+                    for person in people:
+                        program_xml.append(f"      <{role}>{escape(person)}</{role}>")
+                else:
+                    program_xml.append(f"      <{role}>{escape(people)}</{role}>")
+
+        # Handle actors separately to include role and guest attributes
+        if "actor" in credits:
+            actors = credits["actor"]
+            if isinstance(actors, list):
+                for actor in actors:
+                    if isinstance(actor, dict):
+                        name = actor.get("name", "")
+                        role_attr = f' role="{escape(actor["role"])}"' if "role" in actor else ""
+                        guest_attr = ' guest="yes"' if actor.get("guest") else ""
+                        program_xml.append(f"      <actor{role_attr}{guest_attr}>{escape(name)}</actor>")
+                    else:
+                        program_xml.append(f"      <actor>{escape(actor)}</actor>")
+            else:
+                program_xml.append(f"      <actor>{escape(actors)}</actor>")
+
+        program_xml.append("    </credits>")
+
+    # Add program date if available (full date, not just year)
+    if "date" in custom_data:
+        program_xml.append(f'    <date>{escape(custom_data["date"])}</date>')
+
+    # Add country if available
+    if "country" in custom_data:
+        program_xml.append(f'    <country>{escape(custom_data["country"])}</country>')
+
+    # Add icon if available
+    if "icon" in custom_data:
+        program_xml.append(f'    <icon src="{escape(custom_data["icon"])}" />')
+
+    # Add special flags as proper tags with enhanced handling
+    if custom_data.get("previously_shown", False):
+        prev_shown_details = custom_data.get("previously_shown_details", {})
+        attrs = []
+        if "start" in prev_shown_details:
+            attrs.append(f'start="{escape(prev_shown_details["start"])}"')
+        if "channel" in prev_shown_details:
+            attrs.append(f'channel="{escape(prev_shown_details["channel"])}"')
+        attr_str = " " + " ".join(attrs) if attrs else ""
+        program_xml.append(f"    <previously-shown{attr_str} />")
+
+    if custom_data.get("premiere", False):
+        premiere_text = custom_data.get("premiere_text", "")
+        if premiere_text:
+            program_xml.append(f"    <premiere>{escape(premiere_text)}</premiere>")
+        else:
+            program_xml.append("    <premiere />")
+
+    if custom_data.get("last_chance", False):
+        last_chance_text = custom_data.get("last_chance_text", "")
+        if last_chance_text:
+            program_xml.append(f"    <last-chance>{escape(last_chance_text)}</last-chance>")
+        else:
+            program_xml.append("    <last-chance />")
+
+    if custom_data.get("new", False):
+        program_xml.append("    <new />")
+
+    if custom_data.get('live', False):
+        program_xml.append('    <live />')
+
+    return program_xml
+
+
+def render_programme(program, channel_id=CHANNEL_PLACEHOLDER):
+    """
+    Render a single programme to XMLTV.
+
+    Args:
+        program: dict with the keys in PROGRAM_FIELDS (as returned by .values())
+        channel_id: Already-escaped channel id; defaults to CHANNEL_PLACEHOLDER
+
+    Returns:
+        The <programme> element as a newline-terminated string
+    """
+    start_str = program["start_time"].strftime(XMLTV_TIME_FORMAT)
+    stop_str = program["end_time"].strftime(XMLTV_TIME_FORMAT)
+
+    program_xml = [f'  <programme start="{start_str}" stop="{stop_str}" channel="{channel_id}">']
+    program_xml.append(f'    <title>{html.escape(program["title"])}</title>')
+
+    # Add subtitle if available
+    if program.get("sub_title"):
+        program_xml.append(f'    <sub-title>{html.escape(program["sub_title"])}</sub-title>')
+
+    # Add description if available
+    if program.get("description"):
+        program_xml.append(f'    <desc>{html.escape(program["description"])}</desc>')
+
+    # Process custom properties if available
+    if program.get("custom_properties"):
+        try:
+            program_xml.extend(render_custom_properties(json.loads(program["custom_properties"])))
+        except Exception as e:
+            program_xml.append(f"    <!-- Error parsing custom properties: {html.escape(str(e))} -->")
+
+    program_xml.append("  </programme>")
+    return "\n".join(program_xml) + "\n"
+
+
+def build_epg_fragment(epg_id):
+    """
+    Render every programme of an EPGData record.
+
+    Returns:
+        List of [start_timestamp, xml] pairs ordered by start time
+    """
+    programs = (
+        ProgramData.objects.filter(epg_id=epg_id)
+        .order_by("start_time")
+        .values(*PROGRAM_FIELDS)
+    )
+    return [
+        [int(program["start_time"].timestamp()), render_programme(program)]
+        for program in programs.iterator(chunk_size=2000)
+    ]
+
+
+def store_epg_fragment(epg_id):
+    """Render an EPGData record's programmes and persist them for output endpoints."""
+    fragment = build_epg_fragment(epg_id)
+    path = get_fragment_path(epg_id)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(fragment, f, separators=(",", ":"))
+        # Atomic replace so concurrent readers never see a partial file
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.error(f"Failed to store XMLTV fragment for EPG {epg_id}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return fragment
+
+
+def load_epg_fragment(epg_id):
+    """
+    Load the pre-rendered programmes for an EPGData record, rendering and storing
+    them first if they haven't been yet (e.g. data imported before fragments existed).
+    """
+    try:
+        with open(get_fragment_path(epg_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logger.warning(f"Discarding unreadable XMLTV fragment for EPG {epg_id}: {e}")
+
+    return store_epg_fragment(epg_id)
+
+
+def delete_epg_fragment(epg_id):
+    try:
+        os.remove(get_fragment_path(epg_id))
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Failed to delete XMLTV fragment for EPG {epg_id}: {e}")
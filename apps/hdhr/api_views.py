@@ -18,10 +18,21 @@ from django.utils.decorators import method_decorator
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
 from apps.m3u.models import M3UAccountProfile
+from apps.output.cache import etag_matches, get_document_key, make_etag, not_modified_response
+from core.utils import CHANNELS_CACHE, STREAM_PLANS_CACHE, HDHR_CACHE
+from collections import OrderedDict
+import json
+import threading
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
+# Encoded discovery / lineup responses kept per process
+MAX_CACHED_RESPONSES = 64
+
+_responses = OrderedDict()
+_responses_lock = threading.Lock()
+
 
 @login_required
 def hdhr_dashboard_view(request):
@@ -44,6 +55,78 @@ class HDHRDeviceViewSet(viewsets.ModelViewSet):
             return [Authenticated()]
 
 
+def cached_json_response(request, kind, namespaces, parts, build):
+    """
+    Serve a JSON document built by ``build()``, encoded once per process and
+    reused until the generation of one of ``namespaces`` is bumped. Clients
+    sending the current ETag get a 304 without the document being touched.
+    """
+    key = get_document_key(kind, namespaces, *parts)
+    if key is None:
+        return JsonResponse(build(), safe=False)
+
+    etag = make_etag(key)
+    if etag_matches(request, etag):
+        return not_modified_response(etag)
+
+    with _responses_lock:
+        content = _responses.get(key)
+        if content is not None:
+            _responses.move_to_end(key)
+
+    if content is None:
+        content = json.dumps(build()).encode("utf-8")
+        with _responses_lock:
+            _responses[key] = content
+            while len(_responses) > MAX_CACHED_RESPONSES:
+                _responses.popitem(last=False)
+
+    response = HttpResponse(content, content_type="application/json")
+    response["ETag"] = etag
+    return response
+
+
+def get_tuner_count():
+    # Calculate tuner count from active profiles from active M3U accounts (excluding default "custom Default" profile)
+    profiles = M3UAccountProfile.objects.filter(
+        is_active=True,
+        m3u_account__is_active=True,  # Only include profiles from enabled M3U accounts
+    ).exclude(id=1)
+
+    # 1. Check if any profile has unlimited streams (max_streams=0)
+    has_unlimited = profiles.filter(max_streams=0).exists()
+
+    # 2. Calculate tuner count from limited profiles
+    limited_tuners = 0
+    if not has_unlimited:
+        limited_tuners = (
+            profiles.filter(max_streams__gt=0)
+            .aggregate(total=models.Sum("max_streams"))
+            .get("total", 0)
+            or 0
+        )
+
+    # 3. Add custom stream count to tuner count
+    custom_stream_count = Stream.objects.filter(is_custom=True).count()
+    logger.debug(f"Found {custom_stream_count} custom streams")
+
+    # 4. Calculate final tuner count
+    if has_unlimited:
+        # If there are unlimited profiles, start with 10 plus custom streams
+        tuner_count = 10 + custom_stream_count
+    else:
+        # Otherwise use the limited profile sum plus custom streams
+        tuner_count = limited_tuners + custom_stream_count
+
+    # 5. Ensure minimum of 1 tuners
+    tuner_count = max(1, tuner_count)
+
+    logger.debug(
+        f"Calculated tuner count: {tuner_count} (limited profiles: {limited_tuners}, custom streams: {custom_stream_count}, unlimited: {has_unlimited})"
+    )
+    return tuner_count
+
+
 # 🔹 2) Discover API
 class DiscoverAPIView(APIView):
     """Returns device discovery information"""
@@ -58,54 +141,22 @@ class DiscoverAPIView(APIView):
             uri_parts.append(profile)
 
         base_url = request.build_absolute_uri(f'/{"/".join(uri_parts)}/').rstrip("/")
-        device = HDHRDevice.objects.first()
-
-        # Calculate tuner count from active profiles from active M3U accounts (excluding default "custom Default" profile)
-        profiles = M3UAccountProfile.objects.filter(
-            is_active=True,
-            m3u_account__is_active=True,  # Only include profiles from enabled M3U accounts
-        ).exclude(id=1)
-
-        # 1. Check if any profile has unlimited streams (max_streams=0)
-        has_unlimited = profiles.filter(max_streams=0).exists()
-
-        # 2. Calculate tuner count from limited profiles
-        limited_tuners = 0
-        if not has_unlimited:
-            limited_tuners = (
-                profiles.filter(max_streams__gt=0)
-                .aggregate(total=models.Sum("max_streams"))
-                .get("total", 0)
-                or 0
-            )
-
-        # 3. Add custom stream count to tuner count
-        custom_stream_count = Stream.objects.filter(is_custom=True).count()
-        logger.debug(f"Found {custom_stream_count} custom streams")
-
-        # 4. Calculate final tuner count
-        if has_unlimited:
-            # If there are unlimited profiles, start with 10 plus custom streams
-            tuner_count = 10 + custom_stream_count
-        else:
-            # Otherwise use the limited profile sum plus custom streams
-            tuner_count = limited_tuners + custom_stream_count
-
-        # 5. Ensure minimum of 1 tuners
-        tuner_count = max(1, tuner_count)
-
-        logger.debug(
-            f"Calculated tuner count: {tuner_count} (limited profiles: {limited_tuners}, custom streams: {custom_stream_count}, unlimited: {has_unlimited})"
-        )
 
-        # Create a unique DeviceID for the HDHomeRun device based on profile ID or a default value
-        device_ID = "12345678"  # Default DeviceID
-        friendly_name = "Dispatcharr HDHomeRun"
-        if profile is not None:
-            device_ID = f"dispatcharr-hdhr-{profile}"
-            friendly_name = f"Dispatcharr HDHomeRun - {profile}"
-        if not device:
-            data = {
+        def build():
+            device = HDHRDevice.objects.first()
+            tuner_count = get_tuner_count()
+
+            # Create a unique DeviceID for the HDHomeRun device based on profile ID or a default value
+            device_ID = "12345678"  # Default DeviceID
+            friendly_name = "Dispatcharr HDHomeRun"
+            if profile is not None:
+                device_ID = f"dispatcharr-hdhr-{profile}"
+                friendly_name = f"Dispatcharr HDHomeRun - {profile}"
+            if device:
+                device_ID = device.device_id
+                friendly_name = device.friendly_name
+
+            return {
                 "FriendlyName": friendly_name,
                 "ModelNumber": "HDTC-2US",
                 "FirmwareName": "hdhomerun3_atsc",
@@ -116,19 +167,15 @@ class DiscoverAPIView(APIView):
                 "LineupURL": f"{base_url}/lineup.json",
                 "TunerCount": tuner_count,
             }
-        else:
-            data = {
-                "FriendlyName": device.friendly_name,
-                "ModelNumber": "HDTC-2US",
-                "FirmwareName": "hdhomerun3_atsc",
-                "FirmwareVersion": "20200101",
-                "DeviceID": device.device_id,
-                "DeviceAuth": "test_auth_token",
-                "BaseURL": base_url,
-                "LineupURL": f"{base_url}/lineup.json",
-                "TunerCount": tuner_count,
-            }
-        return JsonResponse(data)
+
+        # The tuner count derives from M3U profiles and custom streams
+        return cached_json_response(
+            request,
+            "hdhr_discover",
+            (CHANNELS_CACHE, STREAM_PLANS_CACHE, HDHR_CACHE),
+            (profile, base_url),
+            build,
+        )
 
 
 # 🔹 3) Lineup API
@@ -140,36 +187,43 @@ class LineupAPIView(APIView):
         responses={200: openapi.Response("Channel Lineup JSON")},
     )
     def get(self, request, profile=None):
-        if profile is not None:
-            channel_profile = ChannelProfile.objects.get(name=profile)
-            channels = Channel.objects.filter(
-                channelprofilemembership__channel_profile=channel_profile,
-                channelprofilemembership__enabled=True,
-            ).order_by("channel_number")
-        else:
-            channels = Channel.objects.all().order_by("channel_number")
-
-        lineup = []
-        for ch in channels:
-            # Format channel number as integer if it has no decimal component
-            if ch.channel_number is not None:
-                if ch.channel_number == int(ch.channel_number):
-                    formatted_channel_number = str(int(ch.channel_number))
-                else:
-                    formatted_channel_number = str(ch.channel_number)
+        stream_base_url = request.build_absolute_uri("/proxy/ts/stream/")
+
+        def build():
+            if profile is not None:
+                channel_profile = ChannelProfile.objects.get(name=profile)
+                channels = Channel.objects.filter(
+                    channelprofilemembership__channel_profile=channel_profile,
+                    channelprofilemembership__enabled=True,
+                ).order_by("channel_number")
             else:
-                formatted_channel_number = ""
-
-            lineup.append(
-                {
-                    "GuideNumber": formatted_channel_number,
-                    "GuideName": ch.name,
-                    "URL": request.build_absolute_uri(f"/proxy/ts/stream/{ch.uuid}"),
-                    "Guide_ID": formatted_channel_number,
-                    "Station": formatted_channel_number,
-                }
-            )
-        return JsonResponse(lineup, safe=False)
+                channels = Channel.objects.all().order_by("channel_number")
+
+            lineup = []
+            for channel_number, name, uuid in channels.values_list("channel_number", "name", "uuid"):
+                # Format channel number as integer if it has no decimal component
+                if channel_number is not None:
+                    if channel_number == int(channel_number):
+                        formatted_channel_number = str(int(channel_number))
+                    else:
+                        formatted_channel_number = str(channel_number)
+                else:
+                    formatted_channel_number = ""
+
+                lineup.append(
+                    {
+                        "GuideNumber": formatted_channel_number,
+                        "GuideName": name,
+                        "URL": f"{stream_base_url}{uuid}",
+                        "Guide_ID": formatted_channel_number,
+                        "Station": formatted_channel_number,
+                    }
+                )
+            return lineup
+
+        return cached_json_response(
+            request, "hdhr_lineup", (CHANNELS_CACHE,), (profile, stream_base_url), build
+        )
 
 
 # 🔹 4) Lineup Status API
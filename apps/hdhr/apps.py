@@ -6,5 +6,7 @@ class HdhrConfig(AppConfig):
     name = 'apps.hdhr'
     verbose_name = "HDHomeRun Emulation"
     def ready(self):
+        import apps.hdhr.signals  # ensures HDHR signals get registered
+
         # Start SSDP services when the app is ready
         ssdp.start_ssdp()
@@ -0,0 +1,13 @@
+# apps/hdhr/signals.py
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core.utils import bump_cache_generation, HDHR_CACHE
+from .models import HDHRDevice
+
+
+@receiver(post_save, sender=HDHRDevice)
+@receiver(post_delete, sender=HDHRDevice)
+def invalidate_hdhr_responses(sender, **kwargs):
+    # Discovery responses embed the device name and ID
+    transaction.on_commit(lambda: bump_cache_generation(HDHR_CACHE))
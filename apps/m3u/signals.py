@@ -1,9 +1,11 @@
 # apps/m3u/signals.py
 from django.db.models.signals import post_save, post_delete, pre_save
+from django.db import transaction
 from django.dispatch import receiver
-from .models import M3UAccount
+from .models import M3UAccount, M3UAccountProfile
 from .tasks import refresh_single_m3u_account, refresh_m3u_groups, delete_m3u_refresh_task_by_id
 from django_celery_beat.models import PeriodicTask, IntervalSchedule
+from core.utils import bump_cache_generation, STREAM_PLANS_CACHE
 import json
 import logging
 
@@ -108,3 +110,23 @@ def update_status_on_active_change(sender, instance, **kwargs):
         except M3UAccount.DoesNotExist:
             # New record, will use default status
             pass
+
+# Saves that only report refresh progress don't affect how streams are played
+STATUS_FIELDS = {"status", "last_message", "updated_at"}
+
+@receiver(post_save, sender=M3UAccount)
+@receiver(post_delete, sender=M3UAccount)
+@receiver(post_save, sender=M3UAccountProfile)
+@receiver(post_delete, sender=M3UAccountProfile)
+def invalidate_stream_plans(sender, update_fields=None, **kwargs):
+    """Proxy stream plans embed profile URL patterns, connection limits and account user agents."""
+    if update_fields and set(update_fields) <= STATUS_FIELDS:
+        return
+    transaction.on_commit(lambda: bump_cache_generation(STREAM_PLANS_CACHE))
+
+@receiver(post_save, sender=M3UAccountProfile)
+@receiver(post_delete, sender=M3UAccountProfile)
+def invalidate_url_rewriters(sender, instance, **kwargs):
+    from apps.proxy.ts_proxy.url_utils import invalidate_url_rewriters
+
+    invalidate_url_rewriters(instance.id)
@@ -18,7 +18,7 @@ from channels.layers import get_channel_layer
 from django.utils import timezone
 import time
 import json
-from core.utils import RedisClient, acquire_task_lock, release_task_lock
+from core.utils import RedisClient, acquire_task_lock, release_task_lock, bump_cache_generation, CHANNELS_CACHE
 from core.models import CoreSettings, UserAgent
 from asgiref.sync import async_to_sync
 from core.xtream_codes import Client as XCClient
@@ -1377,6 +1377,13 @@ def refresh_single_m3u_account(account_id):
         except Exception as e:
             logger.error(f"Error running auto channel sync for account {account_id}: {str(e)}")
 
+        # Streams were written in bulk (no signals); refresh playlists that embed them
+        bump_cache_generation(CHANNELS_CACHE)
+
+        # Channel logos may have changed with the refresh; warm the logo cache
+        from apps.channels.tasks import prefetch_channel_logos
+        prefetch_channel_logos.delay()
+
         # Calculate elapsed time
         elapsed_time = time.time() - start_time
 
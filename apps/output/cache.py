@@ -0,0 +1,187 @@
+# apps/output/cache.py
+"""
+Materialized output documents (XMLTV, M3U).
+
+Rendered documents are written to disk the first time they are requested, along
+with a gzip copy, and served from there until the generation of one of the cache namespaces it
+derives from is bumped (see core.utils.bump_cache_generation). The document key doubles as the
+ETag, so clients that already have the current version get a 304 before any work
+is done.
+"""
+
+import gzip
+import hashlib
+import logging
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+from core.utils import get_cache_generation
+
+logger = logging.getLogger(__name__)
+
+# Documents older than this are removed when a new document is written
+MAX_DOCUMENT_AGE = 6 * 60 * 60
+
+
+def get_output_cache_dir():
+    cache_dir = os.path.join(settings.MEDIA_ROOT, "cached_output")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def get_document_key(kind, namespaces, *parts):
+    """
+    Build the key for a rendered document, tied to the generation of the cache
+    namespaces (e.g. CHANNELS_CACHE, EPG_CACHE) its content derives from.
+
+    Returns None if caching is unavailable (no Redis), in which case the document
+    should be rendered without caching.
+    """
+    generation = get_cache_generation(*namespaces)
+    if generation is None:
+        return None
+
+    raw_key = "|".join([kind, generation] + [str(part) for part in parts])
+    return hashlib.sha1(raw_key.encode("utf-8")).hexdigest()
+
+
+def get_document_path(kind, key):
+    return os.path.join(get_output_cache_dir(), f"{kind}-{key}")
+
+
+def make_etag(key):
+    # Weak, because the plain and gzip representations share it
+    return f'W/"{key}"'
+
+
+def etag_matches(request, etag):
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if not if_none_match:
+        return False
+
+    def strip_weak(tag):
+        return tag[2:] if tag.startswith("W/") else tag
+
+    target = strip_weak(etag)
+    return any(tag == "*" or strip_weak(tag) == target for tag in parse_etags(if_none_match))
+
+
+def not_modified_response(etag):
+    response = HttpResponseNotModified()
+    response["ETag"] = etag
+    return response
+
+
+def client_accepts_gzip(request):
+    return "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", "").lower()
+
+
+def cached_document_response(request, kind, key, content_type):
+    """
+    Serve a previously rendered document, preferring the precompressed copy.
+
+    Returns None if the document hasn't been rendered yet.
+    """
+    path = get_document_path(kind, key)
+    candidates = [(f"{path}.gz", True), (path, False)] if client_accepts_gzip(request) else [(path, False)]
+
+    for candidate, compressed in candidates:
+        try:
+            f = open(candidate, "rb")
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            logger.warning(f"Unable to open cached {kind} document {candidate}: {e}")
+            continue
+
+        response = FileResponse(f, content_type=content_type)
+        if compressed:
+            response["Content-Encoding"] = "gzip"
+        response["Vary"] = "Accept-Encoding"
+        return response
+
+    return None
+
+
+def stream_and_cache(kind, key, chunks):
+    """
+    Pass rendered chunks through to the client while writing them (and a gzip copy)
+    to the document cache. The document only becomes visible once it has been
+    rendered completely; a client disconnecting mid-way leaves nothing behind.
+    """
+    path = get_document_path(kind, key)
+    token = uuid.uuid4().hex
+    tmp_path = f"{path}.{token}.tmp"
+    tmp_gz_path = f"{path}.gz.{token}.tmp"
+
+    raw_file = gz_file = None
+    try:
+        raw_file = open(tmp_path, "wb")
+        gz_file = gzip.open(tmp_gz_path, "wb", compresslevel=6)
+    except OSError as e:
+        logger.warning(f"Unable to cache {kind} document, serving uncached: {e}")
+        _close_and_remove((raw_file, tmp_path), (gz_file, tmp_gz_path))
+        raw_file = gz_file = None
+
+    completed = False
+    try:
+        for chunk in chunks:
+            data = chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+            if raw_file is not None:
+                try:
+                    raw_file.write(data)
+                    gz_file.write(data)
+                except OSError as e:
+                    logger.warning(f"Error writing cached {kind} document, serving uncached: {e}")
+                    _close_and_remove((raw_file, tmp_path), (gz_file, tmp_gz_path))
+                    raw_file = gz_file = None
+            yield data
+        completed = True
+    finally:
+        if raw_file is not None:
+            if completed:
+                try:
+                    raw_file.close()
+                    gz_file.close()
+                    # gzip copy first, so the plain document never exists without it
+                    os.replace(tmp_gz_path, f"{path}.gz")
+                    os.replace(tmp_path, path)
+                    prune_output_cache()
+                except OSError as e:
+                    logger.warning(f"Unable to finalize cached {kind} document: {e}")
+                    _close_and_remove((raw_file, tmp_path), (gz_file, tmp_gz_path))
+            else:
+                _close_and_remove((raw_file, tmp_path), (gz_file, tmp_gz_path))
+
+
+def _close_and_remove(*files):
+    for handle, path in files:
+        try:
+            if handle is not None:
+                handle.close()
+        except OSError:
+            pass
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def prune_output_cache(max_age=MAX_DOCUMENT_AGE):
+    """Remove documents that haven't been rewritten within max_age seconds."""
+    cutoff = time.time() - max_age
+    try:
+        with os.scandir(get_output_cache_dir()) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
+    except OSError as e:
+        logger.debug(f"Unable to prune output cache: {e}")
@@ -0,0 +1,198 @@
+# apps/output/catalog.py
+"""
+Materialized Xtream Codes live catalog.
+
+The live streams and categories a user can see only depend on their user level
+and the channel profiles assigned to them, so the catalog is built once per
+(user level, profile set) and shared by every user in that class. Each entry is
+JSON-encoded once when the snapshot is built; responses are assembled by
+joining the pre-encoded entries. Snapshots are keyed on the CHANNELS_CACHE
+generation, so any channel change invalidates them.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from apps.channels.models import Channel
+from core.utils import CHANNELS_CACHE
+from .cache import get_document_key
+
+# Snapshots kept per process; each holds the whole catalog for one user class
+MAX_SNAPSHOTS = 16
+
+_snapshots = OrderedDict()
+_snapshots_lock = threading.Lock()
+
+
+def dumps(value):
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def get_catalog_channels(user, profile_ids):
+    """Channels visible to an XC user, in channel number order."""
+    if user.user_level == 0:
+        filters = {
+            "channelprofilemembership__enabled": True,
+            "user_level__lte": user.user_level,
+        }
+
+        if profile_ids:
+            # Only get data from active profile
+            filters["channelprofilemembership__channel_profile__in"] = profile_ids
+
+        channels = Channel.objects.filter(**filters)
+    else:
+        channels = Channel.objects.filter(user_level__lte=user.user_level)
+
+    return channels.select_related("logo", "channel_group").order_by("channel_number", "id")
+
+
+def get_profile_ids(user):
+    return sorted(user.channel_profiles.values_list("id", flat=True))
+
+
+class CatalogSnapshot:
+    """The live catalog of one user class, with memoized encoded responses."""
+
+    def __init__(self, key, streams, categories):
+        self.key = key
+        # (stream_id, category_id, encoded entry), in channel number order
+        self.streams = streams
+        self.categories = categories
+        self.category_ids = {category["category_id"] for category in categories}
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    def _memoize(self, name, build):
+        value = self._encoded.get(name)
+        if value is None:
+            value = build()
+            with self._lock:
+                self._encoded[name] = value
+        return value
+
+    def _filtered(self, category_id):
+        if not category_id:
+            return self.streams
+        return [stream for stream in self.streams if stream[1] == category_id]
+
+    def categories_json(self):
+        return self._memoize("categories", lambda: dumps(self.categories))
+
+    def streams_json(self, category_id=None):
+        if category_id and category_id not in self.category_ids:
+            return b"[]"
+        return self._memoize(
+            ("streams", category_id or None),
+            lambda: b"[" + b",".join(entry for _, _, entry in self._filtered(category_id)) + b"]",
+        )
+
+    def available_channels_json(self, category_id=None):
+        """Streams as the `available_channels` object of panel_api, keyed by stream id."""
+        if category_id and category_id not in self.category_ids:
+            return b"{}"
+        return self._memoize(
+            ("available_channels", category_id or None),
+            lambda: b"{" + b",".join(
+                b'"%d":%s' % (stream_id, entry)
+                for stream_id, _, entry in self._filtered(category_id)
+            ) + b"}",
+        )
+
+    def etag_key(self, *parts):
+        raw_key = "|".join([self.key] + [str(part) for part in parts if part])
+        return hashlib.sha1(raw_key.encode("utf-8")).hexdigest()
+
+
+def build_snapshot(user, profile_ids, key, logo_url):
+    added = int(time.time())
+    streams = []
+    groups = {}
+    seen = set()
+
+    for channel in get_catalog_channels(user, profile_ids):
+        # Channels in several of the user's profiles are joined once per profile
+        if channel.id in seen:
+            continue
+        seen.add(channel.id)
+
+        group = channel.channel_group
+        category_id = str(group.id) if group else None
+        if group and category_id not in groups:
+            groups[category_id] = group
+
+        channel_number = channel.channel_number
+        if channel_number is not None and channel_number.is_integer():
+            channel_number = int(channel_number)
+
+        entry = {
+            "num": channel_number,
+            "name": channel.name,
+            "stream_type": "live",
+            "stream_id": channel.id,
+            "stream_icon": logo_url(channel.logo) if channel.logo else None,
+            "epg_channel_id": str(channel_number),
+            "added": added,  # @TODO: make this the actual created date
+            "is_adult": 0,
+            "category_id": category_id,
+            "category_ids": [group.id] if group else [],
+            "custom_sid": None,
+            "tv_archive": 0,
+            "direct_source": "",
+            "tv_archive_duration": 0,
+        }
+        streams.append((channel.id, category_id, dumps(entry)))
+
+    categories = [
+        {
+            "category_id": str(group.id),
+            "category_name": group.name,
+            "parent_id": 0,
+        }
+        for group in sorted(groups.values(), key=lambda group: group.id)
+    ]
+
+    return CatalogSnapshot(key, streams, categories)
+
+
+def get_catalog(request, user):
+    """
+    Return the catalog snapshot for the user's class, building it on first use.
+    Without Redis (no cache generation) a fresh snapshot is built every time.
+    """
+    # Imported here: views imports this module
+    from .views import get_logo_url_builder
+
+    if user.user_level == 0:
+        profile_ids = get_profile_ids(user)
+        user_class = ("profiles", tuple(profile_ids))
+    else:
+        profile_ids = None
+        user_class = ("level", user.user_level)
+
+    key = get_document_key(
+        "xc_catalog",
+        (CHANNELS_CACHE,),
+        user_class,
+        request.build_absolute_uri("/"),
+    )
+
+    if key is not None:
+        with _snapshots_lock:
+            snapshot = _snapshots.get(key)
+            if snapshot is not None:
+                _snapshots.move_to_end(key)
+                return snapshot
+
+    snapshot = build_snapshot(user, profile_ids, key or "", get_logo_url_builder(request))
+
+    if key is not None:
+        with _snapshots_lock:
+            _snapshots[key] = snapshot
+            while len(_snapshots) > MAX_SNAPSHOTS:
+                _snapshots.popitem(last=False)
+
+    return snapshot
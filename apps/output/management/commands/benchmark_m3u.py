@@ -0,0 +1,92 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from apps.channels.models import Channel, ChannelGroup, ChannelProfile, ChannelProfileMembership, Logo
+from apps.output.views import generate_m3u
+from core.utils import bump_cache_generation, CHANNELS_CACHE
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark M3U playlist generation against a temporary set of channels (rolled back afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--channels",
+            type=int,
+            default=10000,
+            help="Number of temporary channels to create (default: 10000)",
+        )
+        parser.add_argument(
+            "--direct",
+            action="store_true",
+            help="Benchmark direct stream URLs instead of proxy URLs",
+        )
+
+    def handle(self, *args, **options):
+        count = options["channels"]
+        query_string = "direct=true" if options["direct"] else ""
+        factory = RequestFactory()
+
+        try:
+            with transaction.atomic():
+                self._create_channels(count)
+
+                for label in ("uncached", "cached"):
+                    if label == "uncached":
+                        bump_cache_generation(CHANNELS_CACHE)
+
+                    request = factory.get(f"/output/m3u?{query_string}")
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        response = generate_m3u(request)
+                        content = b"".join(
+                            chunk if isinstance(chunk, bytes) else chunk.encode()
+                            for chunk in response.streaming_content
+                        )
+                        elapsed = time.perf_counter() - start
+
+                    self.stdout.write(
+                        f"{label}: {count} channels, {len(content) / 1024:.0f} KB "
+                        f"in {elapsed * 1000:.1f} ms, {len(queries)} queries"
+                    )
+
+                raise Rollback()
+        except Rollback:
+            pass
+        finally:
+            # The temporary channels were never committed, so their signals never
+            # invalidated anything; drop the playlists rendered from them
+            bump_cache_generation(CHANNELS_CACHE)
+
+    def _create_channels(self, count):
+        group, _ = ChannelGroup.objects.get_or_create(name="Benchmark")
+        logos = Logo.objects.bulk_create(
+            [Logo(name=f"Benchmark {i}", url=f"https://example.com/benchmark/{i}.png") for i in range(count)]
+        )
+        channels = Channel.objects.bulk_create(
+            [
+                Channel(
+                    channel_number=100000 + i,
+                    name=f"Benchmark Channel {i}",
+                    channel_group=group,
+                    logo=logos[i],
+                    tvg_id=f"benchmark.{i}",
+                )
+                for i in range(count)
+            ]
+        )
+        ChannelProfileMembership.objects.bulk_create(
+            [
+                ChannelProfileMembership(channel_profile=profile, channel=channel)
+                for profile in ChannelProfile.objects.all()
+                for channel in channels
+            ]
+        )
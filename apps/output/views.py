@@ -2,22 +2,73 @@ import ipaddress
 from django.http import HttpResponse, JsonResponse, Http404, HttpResponseForbidden, StreamingHttpResponse
 from rest_framework.response import Response
 from django.urls import reverse
-from apps.channels.models import Channel, ChannelProfile, ChannelGroup
+from django.db.models import Prefetch
+from apps.channels.models import Channel, ChannelProfile, ChannelStream
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from apps.epg.models import ProgramData
-from apps.accounts.models import User
+from apps.accounts.xc import get_xc_user, get_xc_channel_uuid
 from core.models import CoreSettings, NETWORK_ACCESS
 from dispatcharr.utils import network_access_allowed
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
-from datetime import datetime, timedelta
+from datetime import datetime
 import html  # Add this import for XML escaping
 import json  # Add this import for JSON parsing
 import time  # Add this import for keep-alive delays
 from tzlocal import get_localzone
 from urllib.parse import urlparse
-import base64
+from collections import Counter
+from apps.epg.xmltv import CHANNEL_PLACEHOLDER, load_epg_fragment
+from apps.epg.dummy import get_dummy_listings, render_dummy_xmltv
+from apps.epg.listings import get_upcoming_listings
+from apps.m3u.models import M3UAccountProfile
+from apps.proxy.ts_proxy.url_utils import transform_urls
+from core.utils import CHANNELS_CACHE, EPG_CACHE, STREAM_PLANS_CACHE
+from .catalog import get_catalog
+from .cache import (
+    cached_document_response,
+    etag_matches,
+    get_document_key,
+    make_etag,
+    not_modified_response,
+    stream_and_cache,
+)
+
+def get_direct_stream_urls(channels):
+    """
+    Primary stream URL of each channel (by channel id), rewritten with the
+    default profile of the stream's M3U account the way the proxy would fetch
+    it. The URLs of each profile are rewritten in one pass.
+    """
+    default_profiles = {
+        profile.m3u_account_id: profile
+        for profile in M3UAccountProfile.objects.filter(is_default=True)
+    }
+
+    direct_urls = {}
+    urls_by_profile = {}
+    for channel in channels:
+        channel_streams = channel.channelstream_set.all()
+        if not channel_streams or not channel_streams[0].stream.url:
+            continue
+
+        stream = channel_streams[0].stream
+        profile = default_profiles.get(stream.m3u_account_id)
+        if profile is None:
+            direct_urls[channel.id] = stream.url
+        else:
+            urls_by_profile.setdefault(profile.id, (profile, [], []))
+            urls_by_profile[profile.id][1].append(channel.id)
+            urls_by_profile[profile.id][2].append(stream.url)
+
+    for profile, channel_ids, urls in urls_by_profile.values():
+        direct_urls.update(zip(
+            channel_ids,
+            transform_urls(urls, profile.search_pattern, profile.replace_pattern, profile.id),
+        ))
+
+    return direct_urls
 
 def m3u_endpoint(request, profile_name=None, user=None):
     if not network_access_allowed(request, "M3U_EPG"):
@@ -38,47 +89,14 @@ def generate_m3u(request, profile_name=None, user=None):
     Dynamically generate an M3U file from channels.
     The stream URL now points to the new stream_view that uses StreamProfile.
     Supports both GET and POST methods for compatibility with IPTVSmarters.
+
+    The playlist is rendered in a single prefetched pass and cached on disk
+    until channels change (see apps.output.cache).
     """
     # Check if this is a POST request with data (which we don't want to allow)
     if request.method == "POST" and request.body:
         return HttpResponseForbidden("POST requests with content are not allowed")
 
-    if user is not None:
-        if user.user_level == 0:
-            filters = {
-                "channelprofilemembership__enabled": True,
-                "user_level__lte": user.user_level,
-            }
-
-            if user.channel_profiles.count() != 0:
-                channel_profiles = user.channel_profiles.all()
-                filters["channelprofilemembership__channel_profile__in"] = (
-                    channel_profiles
-                )
-
-            channels = Channel.objects.filter(**filters).order_by("channel_number")
-        else:
-            channels = Channel.objects.filter(user_level__lte=user.user_level).order_by(
-                "channel_number"
-            )
-
-
-    if profile_name is not None:
-        channel_profile = ChannelProfile.objects.get(name=profile_name)
-        channels = Channel.objects.filter(
-            channelprofilemembership__channel_profile=channel_profile,
-            channelprofilemembership__enabled=True
-        ).order_by('channel_number')
-    else:
-        if profile_name is not None:
-            channel_profile = ChannelProfile.objects.get(name=profile_name)
-            channels = Channel.objects.filter(
-                channelprofilemembership__channel_profile=channel_profile,
-                channelprofilemembership__enabled=True,
-            ).order_by("channel_number")
-        else:
-            channels = Channel.objects.order_by("channel_number")
-
     # Check if the request wants to use direct logo URLs instead of cache
     use_cached_logos = request.GET.get('cachedlogos', 'true').lower() != 'false'
 
@@ -89,190 +107,171 @@ def generate_m3u(request, profile_name=None, user=None):
     # Options: 'channel_number' (default), 'tvg_id', 'gracenote'
     tvg_id_source = request.GET.get('tvg_id_source', 'channel_number').lower()
 
-    m3u_content = "#EXTM3U\n"
-    for channel in channels:
-        group_title = channel.channel_group.name if channel.channel_group else "Default"
+    base_url = request.build_absolute_uri('/')[:-1]
 
-        # Format channel number as integer if it has no decimal component
-        if channel.channel_number is not None:
-            if channel.channel_number == int(channel.channel_number):
-                formatted_channel_number = int(channel.channel_number)
-            else:
-                formatted_channel_number = channel.channel_number
-        else:
-            formatted_channel_number = ""
+    def m3u_generator():
+        channels = get_output_channels(profile_name, user).select_related(
+            "channel_group", "logo"
+        )
+        if use_direct_urls:
+            channels = channels.prefetch_related(
+                Prefetch(
+                    "channelstream_set",
+                    queryset=ChannelStream.objects.select_related("stream").only(
+                        "channel_id", "order", "stream__id", "stream__url", "stream__m3u_account_id"
+                    ),
+                )
+            )
+            channels = list(channels)
+            direct_urls = get_direct_stream_urls(channels)
 
-        # Determine the tvg-id based on the selected source
-        if tvg_id_source == 'tvg_id' and channel.tvg_id:
-            tvg_id = channel.tvg_id
-        elif tvg_id_source == 'gracenote' and channel.tvc_guide_stationid:
-            tvg_id = channel.tvc_guide_stationid
-        else:
-            # Default to channel number (original behavior)
-            tvg_id = str(formatted_channel_number) if formatted_channel_number != "" else str(channel.id)
+        build_logo_url = get_logo_url_builder(request, use_cached_logos)
 
-        tvg_name = channel.name
+        lines = ["#EXTM3U\n"]
+        for channel in channels:
+            group_title = channel.channel_group.name if channel.channel_group else "Default"
 
-        tvg_logo = ""
-        if channel.logo:
-            if use_cached_logos:
-                # Use cached logo as before
-                tvg_logo = request.build_absolute_uri(reverse('api:channels:logo-cache', args=[channel.logo.id]))
-            else:
-                # Try to find direct logo URL from channel's streams
-                direct_logo = channel.logo.url if channel.logo.url.startswith(('http://', 'https://')) else None
-                # If direct logo found, use it; otherwise fall back to cached version
-                if direct_logo:
-                    tvg_logo = direct_logo
-                else:
-                    tvg_logo = request.build_absolute_uri(reverse('api:channels:logo-cache', args=[channel.logo.id]))
-
-        # create possible gracenote id insertion
-        tvc_guide_stationid = ""
-        if channel.tvc_guide_stationid:
-            tvc_guide_stationid = (
-                f'tvc-guide-stationid="{channel.tvc_guide_stationid}" '
-            )
+            # Format channel number as integer if it has no decimal component
+            formatted_channel_number = format_channel_number(channel.channel_number)
 
-        extinf_line = (
-            f'#EXTINF:-1 tvg-id="{tvg_id}" tvg-name="{tvg_name}" tvg-logo="{tvg_logo}" '
-            f'tvg-chno="{formatted_channel_number}" {tvc_guide_stationid}group-title="{group_title}",{channel.name}\n'
-        )
+            # Determine the tvg-id based on the selected source
+            tvg_id = get_channel_tvg_id(channel, tvg_id_source, formatted_channel_number)
+
+            tvg_logo = build_logo_url(channel.logo)
+
+            # create possible gracenote id insertion
+            tvc_guide_stationid = ""
+            if channel.tvc_guide_stationid:
+                tvc_guide_stationid = (
+                    f'tvc-guide-stationid="{channel.tvc_guide_stationid}" '
+                )
 
-        # Determine the stream URL based on the direct parameter
-        if use_direct_urls:
-            # Try to get the first stream's direct URL
-            first_stream = channel.streams.first()
-            if first_stream and first_stream.url:
-                # Use the direct stream URL
-                stream_url = first_stream.url
-            else:
-                # Fall back to proxy URL if no direct URL available
-                base_url = request.build_absolute_uri('/')[:-1]
-                stream_url = f"{base_url}/proxy/ts/stream/{channel.uuid}"
-        else:
             # Standard behavior - use proxy URL
-            base_url = request.build_absolute_uri('/')[:-1]
             stream_url = f"{base_url}/proxy/ts/stream/{channel.uuid}"
+            if use_direct_urls:
+                # Use the channel's primary stream URL when it has one
+                stream_url = direct_urls.get(channel.id, stream_url)
+
+            lines.append(
+                f'#EXTINF:-1 tvg-id="{tvg_id}" tvg-name="{channel.name}" tvg-logo="{tvg_logo}" '
+                f'tvg-chno="{formatted_channel_number}" {tvc_guide_stationid}group-title="{group_title}",{channel.name}\n'
+                f"{stream_url}\n"
+            )
+
+            if len(lines) >= 500:
+                yield "".join(lines)
+                lines = []
+
+        if lines:
+            yield "".join(lines)
+
+    cache_key = get_document_key(
+        "m3u",
+        # Direct URLs are rewritten with the M3U profiles' patterns
+        (CHANNELS_CACHE, STREAM_PLANS_CACHE) if use_direct_urls else (CHANNELS_CACHE,),
+        profile_name,
+        user.id if user is not None else None,
+        use_cached_logos,
+        use_direct_urls,
+        tvg_id_source,
+        base_url,
+    )
+
+    if cache_key is not None:
+        etag = make_etag(cache_key)
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
 
-        m3u_content += extinf_line + stream_url + "\n"
+        response = cached_document_response(request, "m3u", cache_key, "audio/x-mpegurl")
+        if response is None:
+            response = StreamingHttpResponse(
+                stream_and_cache("m3u", cache_key, m3u_generator()),
+                content_type="audio/x-mpegurl",
+            )
+        response["ETag"] = etag
+    else:
+        response = StreamingHttpResponse(m3u_generator(), content_type="audio/x-mpegurl")
 
-    response = HttpResponse(m3u_content, content_type="audio/x-mpegurl")
     response["Content-Disposition"] = 'attachment; filename="channels.m3u"'
+    response["Cache-Control"] = "no-cache"
     return response
 
 
-def generate_dummy_programs(channel_id, channel_name, num_days=1, program_length_hours=4):
-    # Get current time rounded to hour
-    now = timezone.now()
-    now = now.replace(minute=0, second=0, microsecond=0)
-
-    # Humorous program descriptions based on time of day
-    time_descriptions = {
-        (0, 4): [
-            f"Late Night with {channel_name} - Where insomniacs unite!",
-            f"The 'Why Am I Still Awake?' Show on {channel_name}",
-            f"Counting Sheep - A {channel_name} production for the sleepless",
-        ],
-        (4, 8): [
-            f"Dawn Patrol - Rise and shine with {channel_name}!",
-            f"Early Bird Special - Coffee not included",
-            f"Morning Zombies - Before coffee viewing on {channel_name}",
-        ],
-        (8, 12): [
-            f"Mid-Morning Meetings - Pretend you're paying attention while watching {channel_name}",
-            f"The 'I Should Be Working' Hour on {channel_name}",
-            f"Productivity Killer - {channel_name}'s daytime programming",
-        ],
-        (12, 16): [
-            f"Lunchtime Laziness with {channel_name}",
-            f"The Afternoon Slump - Brought to you by {channel_name}",
-            f"Post-Lunch Food Coma Theater on {channel_name}",
-        ],
-        (16, 20): [
-            f"Rush Hour - {channel_name}'s alternative to traffic",
-            f"The 'What's For Dinner?' Debate on {channel_name}",
-            f"Evening Escapism - {channel_name}'s remedy for reality",
-        ],
-        (20, 24): [
-            f"Prime Time Placeholder - {channel_name}'s finest not-programming",
-            f"The 'Netflix Was Too Complicated' Show on {channel_name}",
-            f"Family Argument Avoider - Courtesy of {channel_name}",
-        ],
-    }
+def format_channel_number(channel_number):
+    """Format a channel number as an integer if it has no decimal component."""
+    if channel_number is None:
+        return ""
+    if channel_number == int(channel_number):
+        return int(channel_number)
+    return channel_number
 
-    programs = []
-
-    # Create programs for each day
-    for day in range(num_days):
-        day_start = now + timedelta(days=day)
-
-        # Create programs with specified length throughout the day
-        for hour_offset in range(0, 24, program_length_hours):
-            # Calculate program start and end times
-            start_time = day_start + timedelta(hours=hour_offset)
-            end_time = start_time + timedelta(hours=program_length_hours)
-
-            # Get the hour for selecting a description
-            hour = start_time.hour
-
-            # Find the appropriate time slot for description
-            for time_range, descriptions in time_descriptions.items():
-                start_range, end_range = time_range
-                if start_range <= hour < end_range:
-                    # Pick a description using the sum of the hour and day as seed
-                    # This makes it somewhat random but consistent for the same timeslot
-                    description = descriptions[(hour + day) % len(descriptions)]
-                    break
-            else:
-                # Fallback description if somehow no range matches
-                description = f"Placeholder program for {channel_name} - EPG data went on vacation"
 
-            programs.append({
-                "channel_id": channel_id,
-                "start_time": start_time,
-                "end_time": end_time,
-                "title": channel_name,
-                "description": description,
-            })
+def get_channel_tvg_id(channel, tvg_id_source, formatted_channel_number=None):
+    """
+    Determine the tvg-id / XMLTV channel id for a channel.
+    Options for tvg_id_source: 'channel_number' (default), 'tvg_id', 'gracenote'
+    """
+    if tvg_id_source == 'tvg_id' and channel.tvg_id:
+        return channel.tvg_id
+    if tvg_id_source == 'gracenote' and channel.tvc_guide_stationid:
+        return channel.tvc_guide_stationid
 
-    return programs
+    # Default to channel number (original behavior)
+    if formatted_channel_number is None:
+        formatted_channel_number = format_channel_number(channel.channel_number)
+    return str(formatted_channel_number) if formatted_channel_number != "" else str(channel.id)
 
 
-def generate_dummy_epg(
-    channel_id, channel_name, xml_lines=None, num_days=1, program_length_hours=4
-):
+def get_logo_url_builder(request, use_cached_logos=True):
     """
-    Generate dummy EPG programs for channels without EPG data.
-    Creates program blocks for a specified number of days.
-
-    Args:
-        channel_id: The channel ID to use in the program entries
-        channel_name: The name of the channel to use in program titles
-        xml_lines: Optional list to append lines to, otherwise returns new list
-        num_days: Number of days to generate EPG data for (default: 1)
-        program_length_hours: Length of each program block in hours (default: 4)
-
-    Returns:
-        List of XML lines for the dummy EPG entries
+    Return a function mapping a Logo to the URL clients should fetch it from.
+    The absolute cache URL is resolved once rather than once per channel.
     """
-    if xml_lines is None:
-        xml_lines = []
+    placeholder = "__logo_id__"
+    cache_prefix, cache_suffix = request.build_absolute_uri(
+        reverse('api:channels:logo-cache', args=[placeholder])
+    ).split(placeholder, 1)
 
-    for program in generate_dummy_programs(channel_id, channel_name, num_days=1, program_length_hours=4):
-        # Format times in XMLTV format
-        start_str = program['start_time'].strftime("%Y%m%d%H%M%S %z")
-        stop_str = program['end_time'].strftime("%Y%m%d%H%M%S %z")
+    def build(logo):
+        if logo is None:
+            return ""
+        # Use the direct logo URL when requested and available
+        if not use_cached_logos and logo.url.startswith(('http://', 'https://')):
+            return logo.url
+        return f"{cache_prefix}{logo.id}{cache_suffix}"
 
-        # Create program entry with escaped channel name
-        xml_lines.append(
-            f'  <programme start="{start_str}" stop="{stop_str}" channel="{program['channel_id']}">'
+    return build
+
+
+def get_output_channels(profile_name=None, user=None):
+    """Channels visible to the given user, or in the given channel profile."""
+    if user is not None:
+        if user.user_level == 0:
+            filters = {
+                "channelprofilemembership__enabled": True,
+                "user_level__lte": user.user_level,
+            }
+
+            if user.channel_profiles.count() != 0:
+                channel_profiles = user.channel_profiles.all()
+                filters["channelprofilemembership__channel_profile__in"] = (
+                    channel_profiles
+                )
+
+            return Channel.objects.filter(**filters).order_by("channel_number")
+
+        return Channel.objects.filter(user_level__lte=user.user_level).order_by(
+            "channel_number"
         )
-        xml_lines.append(f"    <title>{html.escape(program['title'])}</title>")
-        xml_lines.append(f"    <desc>{html.escape(program['description'])}</desc>")
-        xml_lines.append(f"  </programme>")
 
-    return xml_lines
+    if profile_name is not None:
+        channel_profile = ChannelProfile.objects.get(name=profile_name)
+        return Channel.objects.filter(
+            channelprofilemembership__channel_profile=channel_profile,
+            channelprofilemembership__enabled=True,
+        ).order_by("channel_number")
+
+    return Channel.objects.order_by("channel_number")
 
 
 def generate_epg(request, profile_name=None, user=None):
@@ -281,10 +280,32 @@ def generate_epg(request, profile_name=None, user=None):
     Since the EPG data is stored independently of Channels, we group programmes
     by their associated EPGData record.
     This version filters data based on the 'days' parameter and sends keep-alives during processing.
+
+    Programmes are pre-rendered per EPGData record at import time (see apps.epg.xmltv),
+    and the finished document is cached on disk until channels or EPG data change.
     """
-    def epg_generator():
-        """Generator function that yields EPG data with keep-alives during processing"""        # Send initial HTTP headers as comments (these will be ignored by XML parsers but keep connection alive)
+    # Check if the request wants to use direct logo URLs instead of cache
+    use_cached_logos = request.GET.get('cachedlogos', 'true').lower() != 'false'
+
+    # Get the source to use for tvg-id value
+    # Options: 'channel_number' (default), 'tvg_id', 'gracenote'
+    tvg_id_source = request.GET.get('tvg_id_source', 'channel_number').lower()
 
+    # Get the number of days for EPG data
+    try:
+        # Default to 0 days (everything) for real EPG if not specified
+        days_param = request.GET.get('days', '0')
+        num_days = int(days_param)
+        # Set reasonable limits
+        num_days = max(0, min(num_days, 365))  # Between 0 and 365 days
+    except ValueError:
+        num_days = 0  # Default to all data if invalid value
+
+    # For dummy EPG, use either the specified value or default to 3 days
+    dummy_days = num_days if num_days > 0 else 3
+
+    def epg_generator():
+        """Generator function that yields EPG data with keep-alives during processing"""
         xml_lines = []
         xml_lines.append('<?xml version="1.0" encoding="UTF-8"?>')
         xml_lines.append(
@@ -292,394 +313,100 @@ def generate_epg(request, profile_name=None, user=None):
         )
 
         # Get channels based on user/profile
-        if user is not None:
-            if user.user_level == 0:
-                filters = {
-                    "channelprofilemembership__enabled": True,
-                    "user_level__lte": user.user_level,
-                }
-
-                if user.channel_profiles.count() != 0:
-                    channel_profiles = user.channel_profiles.all()
-                    filters["channelprofilemembership__channel_profile__in"] = (
-                        channel_profiles
-                    )
-
-                channels = Channel.objects.filter(**filters).order_by("channel_number")
-            else:
-                channels = Channel.objects.filter(user_level__lte=user.user_level).order_by(
-                    "channel_number"
-                )
-        else:
-            if profile_name is not None:
-                channel_profile = ChannelProfile.objects.get(name=profile_name)
-                channels = Channel.objects.filter(
-                    channelprofilemembership__channel_profile=channel_profile,
-                    channelprofilemembership__enabled=True,
-                )
-            else:
-                channels = Channel.objects.all()
-
-        # Check if the request wants to use direct logo URLs instead of cache
-        use_cached_logos = request.GET.get('cachedlogos', 'true').lower() != 'false'
-
-        # Get the source to use for tvg-id value
-        # Options: 'channel_number' (default), 'tvg_id', 'gracenote'
-        tvg_id_source = request.GET.get('tvg_id_source', 'channel_number').lower()
-
-        # Get the number of days for EPG data
-        try:
-            # Default to 0 days (everything) for real EPG if not specified
-            days_param = request.GET.get('days', '0')
-            num_days = int(days_param)
-            # Set reasonable limits
-            num_days = max(0, min(num_days, 365))  # Between 0 and 365 days
-        except ValueError:
-            num_days = 0  # Default to all data if invalid value
-
-        # For dummy EPG, use either the specified value or default to 3 days
-        dummy_days = num_days if num_days > 0 else 3
+        channels = list(
+            get_output_channels(profile_name, user).select_related("epg_data", "logo")
+        )
+        build_logo_url = get_logo_url_builder(request, use_cached_logos)
 
         # Calculate cutoff date for EPG data filtering (only if days > 0)
-        now = timezone.now()
-        cutoff_date = now + timedelta(days=num_days) if num_days > 0 else None
+        now_ts = int(timezone.now().timestamp())
+        cutoff_ts = now_ts + num_days * 86400 if num_days > 0 else None
 
         # Process channels for the <channel> section
+        program_channels = []
         for channel in channels:
-            # Format channel number as integer if it has no decimal component - same as M3U generation
-            if channel.channel_number is not None:
-                if channel.channel_number == int(channel.channel_number):
-                    formatted_channel_number = int(channel.channel_number)
-                else:
-                    formatted_channel_number = channel.channel_number
-            else:
-                formatted_channel_number = ""
-
-            # Determine the channel ID based on the selected source
-            if tvg_id_source == 'tvg_id' and channel.tvg_id:
-                channel_id = channel.tvg_id
-            elif tvg_id_source == 'gracenote' and channel.tvc_guide_stationid:
-                channel_id = channel.tvc_guide_stationid
-            else:
-                # Default to channel number (original behavior)
-                channel_id = str(formatted_channel_number) if formatted_channel_number != "" else str(channel.id)
-
-            # Add channel logo if available
-            tvg_logo = ""
-            if channel.logo:
-                if use_cached_logos:
-                    # Use cached logo as before
-                    tvg_logo = request.build_absolute_uri(reverse('api:channels:logo-cache', args=[channel.logo.id]))
-                else:
-                    # Try to find direct logo URL from channel's streams
-                    direct_logo = channel.logo.url if channel.logo.url.startswith(('http://', 'https://')) else None
-                    # If direct logo found, use it; otherwise fall back to cached version
-                    if direct_logo:
-                        tvg_logo = direct_logo
-                    else:
-                        tvg_logo = request.build_absolute_uri(reverse('api:channels:logo-cache', args=[channel.logo.id]))
-
+            channel_id = html.escape(get_channel_tvg_id(channel, tvg_id_source))
             display_name = channel.epg_data.name if channel.epg_data else channel.name
+
             xml_lines.append(f'  <channel id="{channel_id}">')
             xml_lines.append(f'    <display-name>{html.escape(display_name)}</display-name>')
-            xml_lines.append(f'    <icon src="{html.escape(tvg_logo)}" />')
+            xml_lines.append(f'    <icon src="{html.escape(build_logo_url(channel.logo))}" />')
             xml_lines.append("  </channel>")
 
+            program_channels.append((channel_id, display_name, channel.epg_data_id))
+
         # Send all channel definitions
         yield '\n'.join(xml_lines) + '\n'
         xml_lines = []  # Clear to save memory
+        channels = None
 
-        # Process programs for each channel
-        for channel in channels:
+        # Several channels can share one EPG source; keep its fragment loaded only
+        # until the last of them has been written
+        remaining_refs = Counter(epg_id for _, _, epg_id in program_channels if epg_id)
+        fragments = {}
 
-            # Use the same channel ID determination for program entries
-            if tvg_id_source == 'tvg_id' and channel.tvg_id:
-                channel_id = channel.tvg_id
-            elif tvg_id_source == 'gracenote' and channel.tvc_guide_stationid:
-                channel_id = channel.tvc_guide_stationid
+        # Process programs for each channel
+        for channel_id, display_name, epg_id in program_channels:
+            if not epg_id:
+                yield render_dummy_xmltv(channel_id, display_name, dummy_days)
+                continue
+
+            fragment = fragments.get(epg_id)
+            if fragment is None:
+                fragment = load_epg_fragment(epg_id)
+                fragments[epg_id] = fragment
+
+            remaining_refs[epg_id] -= 1
+            if remaining_refs[epg_id] <= 0:
+                fragments.pop(epg_id, None)
+
+            # For real EPG data - filter only if days parameter was specified
+            if cutoff_ts is not None:
+                program_xml = "".join(
+                    xml for start_ts, xml in fragment if now_ts <= start_ts < cutoff_ts
+                )
             else:
-                # Get formatted channel number
-                if channel.channel_number is not None:
-                    if channel.channel_number == int(channel.channel_number):
-                        formatted_channel_number = int(channel.channel_number)
-                    else:
-                        formatted_channel_number = channel.channel_number
-                else:
-                    formatted_channel_number = ""
-                # Default to channel number
-                channel_id = str(formatted_channel_number) if formatted_channel_number != "" else str(channel.id)
+                program_xml = "".join(xml for _, xml in fragment)
 
-            display_name = channel.epg_data.name if channel.epg_data else channel.name
-
-            if not channel.epg_data:
-                # Use the enhanced dummy EPG generation function with defaults
-                program_length_hours = 4  # Default to 4-hour program blocks
-                dummy_programs = generate_dummy_programs(channel_id, display_name, num_days=dummy_days, program_length_hours=program_length_hours)
-
-                for program in dummy_programs:
-                    # Format times in XMLTV format
-                    start_str = program['start_time'].strftime("%Y%m%d%H%M%S %z")
-                    stop_str = program['end_time'].strftime("%Y%m%d%H%M%S %z")
-
-                    # Create program entry with escaped channel name
-                    yield f'  <programme start="{start_str}" stop="{stop_str}" channel="{channel_id}">\n'
-                    yield f"    <title>{html.escape(program['title'])}</title>\n"
-                    yield f"    <desc>{html.escape(program['description'])}</desc>\n"
-                    yield f"  </programme>\n"
-
-            else:
-                # For real EPG data - filter only if days parameter was specified
-                if num_days > 0:
-                    programs = channel.epg_data.programs.filter(
-                        start_time__gte=now,
-                        start_time__lt=cutoff_date
-                    )
-                else:
-                    # Return all programs if days=0 or not specified
-                    programs = channel.epg_data.programs.all()
-
-                # Process programs in chunks to avoid memory issues
-                program_batch = []
-                batch_size = 100
-
-                for prog in programs.iterator():  # Use iterator to avoid loading all at once
-                    start_str = prog.start_time.strftime("%Y%m%d%H%M%S %z")
-                    stop_str = prog.end_time.strftime("%Y%m%d%H%M%S %z")
-
-                    program_xml = [f'  <programme start="{start_str}" stop="{stop_str}" channel="{channel_id}">']
-                    program_xml.append(f'    <title>{html.escape(prog.title)}</title>')
-
-                    # Add subtitle if available
-                    if prog.sub_title:
-                        program_xml.append(f"    <sub-title>{html.escape(prog.sub_title)}</sub-title>")
-
-                    # Add description if available
-                    if prog.description:
-                        program_xml.append(f"    <desc>{html.escape(prog.description)}</desc>")
-
-                    # Process custom properties if available
-                    if prog.custom_properties:
-                        try:
-                            custom_data = json.loads(prog.custom_properties)
-
-                            # Add categories if available
-                            if "categories" in custom_data and custom_data["categories"]:
-                                for category in custom_data["categories"]:
-                                    program_xml.append(f"    <category>{html.escape(category)}</category>")
-
-                            # Add keywords if available
-                            if "keywords" in custom_data and custom_data["keywords"]:
-                                for keyword in custom_data["keywords"]:
-                                    program_xml.append(f"    <keyword>{html.escape(keyword)}</keyword>")
-
-                            # Handle episode numbering - multiple formats supported
-                            # Prioritize onscreen_episode over standalone episode for onscreen system
-                            if "onscreen_episode" in custom_data:
-                                program_xml.append(f'    <episode-num system="onscreen">{html.escape(custom_data["onscreen_episode"])}</episode-num>')
-                            elif "episode" in custom_data:
-                                program_xml.append(f'    <episode-num system="onscreen">E{custom_data["episode"]}</episode-num>')
-
-                            # Handle dd_progid format
-                            if 'dd_progid' in custom_data:
-                                program_xml.append(f'    <episode-num system="dd_progid">{html.escape(custom_data["dd_progid"])}</episode-num>')
-
-                            # Handle external database IDs
-                            for system in ['thetvdb.com', 'themoviedb.org', 'imdb.com']:
-                                if f'{system}_id' in custom_data:
-                                    program_xml.append(f'    <episode-num system="{system}">{html.escape(custom_data[f"{system}_id"])}</episode-num>')
-
-                            # Add season and episode numbers in xmltv_ns format if available
-                            if "season" in custom_data and "episode" in custom_data:
-                                season = (
-                                    int(custom_data["season"]) - 1
-                                    if str(custom_data["season"]).isdigit()
-                                    else 0
-                                )
-                                episode = (
-                                    int(custom_data["episode"]) - 1
-                                    if str(custom_data["episode"]).isdigit()
-                                    else 0
-                                )
-                                program_xml.append(f'    <episode-num system="xmltv_ns">{season}.{episode}.</episode-num>')
-
-                            # Add language information
-                            if "language" in custom_data:
-                                program_xml.append(f'    <language>{html.escape(custom_data["language"])}</language>')
-
-                            if "original_language" in custom_data:
-                                program_xml.append(f'    <orig-language>{html.escape(custom_data["original_language"])}</orig-language>')
-
-                            # Add length information
-                            if "length" in custom_data and isinstance(custom_data["length"], dict):
-                                length_value = custom_data["length"].get("value", "")
-                                length_units = custom_data["length"].get("units", "minutes")
-                                program_xml.append(f'    <length units="{html.escape(length_units)}">{html.escape(str(length_value))}</length>')
-
-                            # Add video information
-                            if "video" in custom_data and isinstance(custom_data["video"], dict):
-                                program_xml.append("    <video>")
-                                for attr in ['present', 'colour', 'aspect', 'quality']:
-                                    if attr in custom_data["video"]:
-                                        program_xml.append(f"      <{attr}>{html.escape(custom_data['video'][attr])}</{attr}>")
-                                program_xml.append("    </video>")
-
-                            # Add audio information
-                            if "audio" in custom_data and isinstance(custom_data["audio"], dict):
-                                program_xml.append("    <audio>")
-                                for attr in ['present', 'stereo']:
-                                    if attr in custom_data["audio"]:
-                                        program_xml.append(f"      <{attr}>{html.escape(custom_data['audio'][attr])}</{attr}>")
-                                program_xml.append("    </audio>")
-
-                            # Add subtitles information
-                            if "subtitles" in custom_data and isinstance(custom_data["subtitles"], list):
-                                for subtitle in custom_data["subtitles"]:
-                                    if isinstance(subtitle, dict):
-                                        subtitle_type = subtitle.get("type", "")
-                                        type_attr = f' type="{html.escape(subtitle_type)}"' if subtitle_type else ""
-                                        program_xml.append(f"    <subtitles{type_attr}>")
-                                        if "language" in subtitle:
-                                            program_xml.append(f"      <language>{html.escape(subtitle['language'])}</language>")
-                                        program_xml.append("    </subtitles>")
-
-                            # Add rating if available
-                            if "rating" in custom_data:
-                                rating_system = custom_data.get("rating_system", "TV Parental Guidelines")
-                                program_xml.append(f'    <rating system="{html.escape(rating_system)}">')
-                                program_xml.append(f'      <value>{html.escape(custom_data["rating"])}</value>')
-                                program_xml.append(f"    </rating>")
-
-                            # Add star ratings
-                            if "star_ratings" in custom_data and isinstance(custom_data["star_ratings"], list):
-                                for star_rating in custom_data["star_ratings"]:
-                                    if isinstance(star_rating, dict) and "value" in star_rating:
-                                        system_attr = f' system="{html.escape(star_rating["system"])}"' if "system" in star_rating else ""
-                                        program_xml.append(f"    <star-rating{system_attr}>")
-                                        program_xml.append(f"      <value>{html.escape(star_rating['value'])}</value>")
-                                        program_xml.append("    </star-rating>")
-
-                            # Add reviews
-                            if "reviews" in custom_data and isinstance(custom_data["reviews"], list):
-                                for review in custom_data["reviews"]:
-                                    if isinstance(review, dict) and "content" in review:
-                                        review_type = review.get("type", "text")
-                                        attrs = [f'type="{html.escape(review_type)}"']
-                                        if "source" in review:
-                                            attrs.append(f'source="{html.escape(review["source"])}"')
-                                        if "reviewer" in review:
-                                            attrs.append(f'reviewer="{html.escape(review["reviewer"])}"')
-                                        attr_str = " ".join(attrs)
-                                        program_xml.append(f'    <review {attr_str}>{html.escape(review["content"])}</review>')
-
-                            # Add images
-                            if "images" in custom_data and isinstance(custom_data["images"], list):
-                                for image in custom_data["images"]:
-                                    if isinstance(image, dict) and "url" in image:
-                                        attrs = []
-                                        for attr in ['type', 'size', 'orient', 'system']:
-                                            if attr in image:
-                                                attrs.append(f'{attr}="{html.escape(image[attr])}"')
-                                        attr_str = " " + " ".join(attrs) if attrs else ""
-                                        program_xml.append(f'    <image{attr_str}>{html.escape(image["url"])}</image>')
-
-                            # Add enhanced credits handling
-                            if "credits" in custom_data:
-                                program_xml.append("    <credits>")
-                                credits = custom_data["credits"]
-
-                                # Handle different credit types
-                                for role in ['director', 'writer', 'adapter', 'producer', 'composer', 'editor', 'presenter', 'commentator', 'guest']:
-                                    if role in credits:
-                                        people = credits[role]
-                                        if isinstance(people, list):
-                                            for person in people:
-                                                program_xml.append(f"      <{role}>{html.escape(person)}</{role}>")
-                                        else:
-                                            program_xml.append(f"      <{role}>{html.escape(people)}</{role}>")
-
-                                # Handle actors separately to include role and guest attributes
-                                if "actor" in credits:
-                                    actors = credits["actor"]
-                                    if isinstance(actors, list):
-                                        for actor in actors:
-                                            if isinstance(actor, dict):
-                                                name = actor.get("name", "")
-                                                role_attr = f' role="{html.escape(actor["role"])}"' if "role" in actor else ""
-                                                guest_attr = ' guest="yes"' if actor.get("guest") else ""
-                                                program_xml.append(f"      <actor{role_attr}{guest_attr}>{html.escape(name)}</actor>")
-                                            else:
-                                                program_xml.append(f"      <actor>{html.escape(actor)}</actor>")
-                                    else:
-                                        program_xml.append(f"      <actor>{html.escape(actors)}</actor>")
-
-                                program_xml.append("    </credits>")
-
-                            # Add program date if available (full date, not just year)
-                            if "date" in custom_data:
-                                program_xml.append(f'    <date>{html.escape(custom_data["date"])}</date>')
-
-                            # Add country if available
-                            if "country" in custom_data:
-                                program_xml.append(f'    <country>{html.escape(custom_data["country"])}</country>')
-
-                            # Add icon if available
-                            if "icon" in custom_data:
-                                program_xml.append(f'    <icon src="{html.escape(custom_data["icon"])}" />')
-
-                            # Add special flags as proper tags with enhanced handling
-                            if custom_data.get("previously_shown", False):
-                                prev_shown_details = custom_data.get("previously_shown_details", {})
-                                attrs = []
-                                if "start" in prev_shown_details:
-                                    attrs.append(f'start="{html.escape(prev_shown_details["start"])}"')
-                                if "channel" in prev_shown_details:
-                                    attrs.append(f'channel="{html.escape(prev_shown_details["channel"])}"')
-                                attr_str = " " + " ".join(attrs) if attrs else ""
-                                program_xml.append(f"    <previously-shown{attr_str} />")
-
-                            if custom_data.get("premiere", False):
-                                premiere_text = custom_data.get("premiere_text", "")
-                                if premiere_text:
-                                    program_xml.append(f"    <premiere>{html.escape(premiere_text)}</premiere>")
-                                else:
-                                    program_xml.append("    <premiere />")
-
-                            if custom_data.get("last_chance", False):
-                                last_chance_text = custom_data.get("last_chance_text", "")
-                                if last_chance_text:
-                                    program_xml.append(f"    <last-chance>{html.escape(last_chance_text)}</last-chance>")
-                                else:
-                                    program_xml.append("    <last-chance />")
-
-                            if custom_data.get("new", False):
-                                program_xml.append("    <new />")
-
-                            if custom_data.get('live', False):
-                                program_xml.append('    <live />')
-
-                        except Exception as e:
-                            program_xml.append(f"    <!-- Error parsing custom properties: {html.escape(str(e))} -->")
-
-                    program_xml.append("  </programme>")
-
-                    # Add to batch
-                    program_batch.extend(program_xml)
-
-                    # Send batch when full or send keep-alive
-                    if len(program_batch) >= batch_size:
-                        yield '\n'.join(program_batch) + '\n'
-                        program_batch = []                        # Send keep-alive every batch
-
-                # Send remaining programs in batch
-                if program_batch:
-                    yield '\n'.join(program_batch) + '\n'
+            if program_xml:
+                yield program_xml.replace(CHANNEL_PLACEHOLDER, channel_id)
 
         # Send final closing tag and completion message
-        yield "</tv>\n"    # Return streaming response
-    response = StreamingHttpResponse(
-        streaming_content=epg_generator(),
-        content_type="application/xml"
+        yield "</tv>\n"
+
+    # Dummy programmes are aligned to the current hour and 'days' is relative to now,
+    # so a rendered document is only valid within the hour it was built in
+    cache_key = get_document_key(
+        "xmltv",
+        (CHANNELS_CACHE, EPG_CACHE),
+        timezone.now().strftime("%Y%m%d%H"),
+        profile_name,
+        user.id if user is not None else None,
+        tvg_id_source,
+        num_days,
+        use_cached_logos,
+        request.build_absolute_uri('/'),
     )
+
+    response = None
+    if cache_key is not None:
+        etag = make_etag(cache_key)
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+
+        response = cached_document_response(request, "xmltv", cache_key, "application/xml")
+        if response is None:
+            response = StreamingHttpResponse(
+                streaming_content=stream_and_cache("xmltv", cache_key, epg_generator()),
+                content_type="application/xml"
+            )
+        response["ETag"] = etag
+    else:
+        response = StreamingHttpResponse(
+            streaming_content=epg_generator(),
+            content_type="application/xml"
+        )
+
     response["Content-Disposition"] = 'attachment; filename="Dispatcharr.xml"'
     response["Cache-Control"] = "no-cache"
     return response
@@ -692,29 +419,10 @@ def xc_get_user(request):
     if not username or not password:
         return None
 
-    user = get_object_or_404(User, username=username)
-    custom_properties = (
-        json.loads(user.custom_properties) if user.custom_properties else {}
-    )
-
-    if "xc_password" not in custom_properties:
-        return None
-
-    if custom_properties["xc_password"] != password:
-        return None
-
-    return user
-
-
-def xc_get_info(request, full=False):
-    if not network_access_allowed(request, 'XC_API'):
-        return JsonResponse({'error': 'Forbidden'}, status=403)
-
-    user = xc_get_user(request)
+    return get_xc_user(username, password)
 
-    if user is None:
-        return JsonResponse({'error': 'Unauthorized'}, status=401)
 
+def xc_get_info(request, user):
     raw_host = request.get_host()
     if ":" in raw_host:
         hostname, port = raw_host.split(":", 1)
@@ -722,7 +430,7 @@ def xc_get_info(request, full=False):
         hostname = raw_host
         port = "443" if request.is_secure() else "80"
 
-    info = {
+    return {
         "user_info": {
             "username": request.GET.get("username"),
             "password": request.GET.get("password"),
@@ -746,15 +454,18 @@ def xc_get_info(request, full=False):
         },
     }
 
-    if full == True:
-        info['categories'] = {
-            "series": [],
-            "movie": [],
-            "live": xc_get_live_categories(user),
-        }
-        info['available_channels'] = {channel["stream_id"]: channel for channel in xc_get_live_streams(request, user, request.GET.get("category_id"))}
 
-    return info
+def xc_catalog_response(request, snapshot, content, *etag_parts):
+    """Serve a pre-encoded catalog listing, with an ETag tied to the snapshot."""
+    etag = make_etag(snapshot.etag_key(*etag_parts)) if snapshot.key else None
+    if etag and etag_matches(request, etag):
+        return not_modified_response(etag)
+
+    response = HttpResponse(content, content_type="application/json")
+    if etag:
+        response["ETag"] = etag
+        response["Cache-Control"] = "no-cache"
+    return response
 
 
 def xc_player_api(request, full=False):
@@ -767,15 +478,18 @@ def xc_player_api(request, full=False):
     if user is None:
         return JsonResponse({'error': 'Unauthorized'}, status=401)
 
-    server_info = xc_get_info(request)
-
     if not action:
-        return JsonResponse(server_info)
+        return JsonResponse(xc_get_info(request, user))
 
     if action == "get_live_categories":
-        return JsonResponse(xc_get_live_categories(user), safe=False)
+        snapshot = get_catalog(request, user)
+        return xc_catalog_response(request, snapshot, snapshot.categories_json(), "categories")
     if action == "get_live_streams":
-        return JsonResponse(xc_get_live_streams(request, user, request.GET.get("category_id")), safe=False)
+        category_id = request.GET.get("category_id")
+        snapshot = get_catalog(request, user)
+        return xc_catalog_response(
+            request, snapshot, snapshot.streams_json(category_id), "streams", category_id
+        )
     if action == "get_short_epg":
         return JsonResponse(xc_get_epg(request, user, short=True), safe=False)
     if action == "get_simple_data_table":
@@ -804,7 +518,20 @@ def xc_panel_api(request):
     if user is None:
         return JsonResponse({'error': 'Unauthorized'}, status=401)
 
-    return JsonResponse(xc_get_info(request, True))
+    snapshot = get_catalog(request, user)
+    category_id = request.GET.get("category_id")
+
+    # The catalog is spliced in pre-encoded rather than re-serialized
+    info = json.dumps(xc_get_info(request, user)).encode("utf-8")
+    content = b"".join([
+        info[:-1],
+        b',"categories":{"series":[],"movie":[],"live":',
+        snapshot.categories_json(),
+        b'},"available_channels":',
+        snapshot.available_channels_json(category_id),
+        b"}",
+    ])
+    return HttpResponse(content, content_type="application/json")
 
 
 def xc_get(request):
@@ -832,156 +559,49 @@ def xc_xmltv(request):
     return generate_epg(request, None, user)
 
 
-def xc_get_live_categories(user):
-    response = []
-
-    if user.user_level == 0:
-        filters = {
-            "channels__channelprofilemembership__enabled": True,
-            "channels__user_level": 0,
-        }
-
-        if user.channel_profiles.count() != 0:
-            # Only get data from active profile
-            channel_profiles = user.channel_profiles.all()
-            filters["channels__channelprofilemembership__channel_profile__in"] = (
-                channel_profiles
-            )
-
-        channel_groups = ChannelGroup.objects.filter(**filters).distinct()
-    else:
-        channel_groups = ChannelGroup.objects.filter(
-            channels__isnull=False, channels__user_level__lte=user.user_level
-        ).distinct()
-
-    for group in channel_groups:
-        response.append(
-            {
-                "category_id": str(group.id),
-                "category_name": group.name,
-                "parent_id": 0,
-            }
-        )
-
-    return response
-
-
-def xc_get_live_streams(request, user, category_id=None):
-    streams = []
-
-    if user.user_level == 0:
-        filters = {
-            "channelprofilemembership__enabled": True,
-            "user_level__lte": user.user_level,
-        }
-
-        if user.channel_profiles.count() > 0:
-            # Only get data from active profile
-            channel_profiles = user.channel_profiles.all()
-            filters["channelprofilemembership__channel_profile__in"] = channel_profiles
-
-        if category_id is not None:
-            filters["channel_group__id"] = category_id
-
-        channels = Channel.objects.filter(**filters).order_by("channel_number")
-    else:
-        if not category_id:
-            channels = Channel.objects.filter(user_level__lte=user.user_level).order_by("channel_number")
-        else:
-            channels = Channel.objects.filter(
-                channel_group__id=category_id, user_level__lte=user.user_level
-            ).order_by("channel_number")
-
-    for channel in channels:
-        streams.append(
-            {
-                "num": int(channel.channel_number) if channel.channel_number.is_integer() else channel.channel_number,
-                "name": channel.name,
-                "stream_type": "live",
-                "stream_id": channel.id,
-                "stream_icon": (
-                    None
-                    if not channel.logo
-                    else request.build_absolute_uri(
-                        reverse("api:channels:logo-cache", args=[channel.logo.id])
-                    )
-                ),
-                "epg_channel_id": str(int(channel.channel_number)) if channel.channel_number.is_integer() else str(channel.channel_number),
-                "added": int(time.time()),  # @TODO: make this the actual created date
-                "is_adult": 0,
-                "category_id": str(channel.channel_group.id),
-                "category_ids": [channel.channel_group.id],
-                "custom_sid": None,
-                "tv_archive": 0,
-                "direct_source": "",
-                "tv_archive_duration": 0,
-            }
-        )
-
-    return streams
-
-
 def xc_get_epg(request, user, short=False):
     channel_id = request.GET.get('stream_id')
     if not channel_id:
         raise Http404()
 
-    channel = None
-    if user.user_level < 10:
-        filters = {
-            "id": channel_id,
-            "channelprofilemembership__enabled": True,
-            "user_level__lte": user.user_level,
-        }
-
-        if user.channel_profiles.count() > 0:
-            channel_profiles = user.channel_profiles.all()
-            filters["channelprofilemembership__channel_profile__in"] = channel_profiles
+    if not get_xc_channel_uuid(user, channel_id):
+        raise Http404()
 
-        channel = get_object_or_404(Channel, **filters)
-    else:
-        channel = get_object_or_404(Channel, id=channel_id)
+    channel = get_object_or_404(Channel, id=channel_id)
 
-    if not channel:
-        raise Http404()
+    # get_short_epg defaults to now/next; the full table to the cached window
+    limit = request.GET.get('limit')
+    try:
+        limit = max(int(limit), 1) if limit else (None if short == False else 4)
+    except ValueError:
+        limit = 4
 
-    limit = request.GET.get('limit', 4)
-    if channel.epg_data:
-        if short == False:
-            programs = channel.epg_data.programs.filter(
-                start_time__gte=timezone.now()
-            ).order_by('start_time')
-        else:
-            programs = channel.epg_data.programs.all().order_by('start_time')[:limit]
+    if channel.epg_data_id:
+        listings = get_upcoming_listings(channel.epg_data_id, limit)
     else:
-        programs = generate_dummy_programs(channel_id=channel_id, channel_name=channel.name)
+        listings = get_dummy_listings(channel.name, limit)
 
-    output = {"epg_listings": []}
-    for program in programs:
-        id = "0"
-        epg_id = "0"
-        title = program['title'] if isinstance(program, dict) else program.title
-        description = program['description'] if isinstance(program, dict) else program.description
-
-        start = program["start_time"] if isinstance(program, dict) else program.start_time
-        end = program["end_time"] if isinstance(program, dict) else program.end_time
+    channel_number = int(channel.channel_number) if channel.channel_number.is_integer() else channel.channel_number
+    now_ts = int(time.time())
 
+    output = {"epg_listings": []}
+    for listing in listings:
         program_output = {
-            "id": f"{id}",
-            "epg_id": f"{epg_id}",
-            "title": base64.b64encode(title.encode()).decode(),
+            "id": "0",
+            "epg_id": "0",
+            "title": listing["title"],
             "lang": "",
-            "start": start.strftime("%Y%m%d%H%M%S"),
-            "end": end.strftime("%Y%m%d%H%M%S"),
-            "description": base64.b64encode(description.encode()).decode(),
-            "channel_id": int(channel.channel_number) if channel.channel_number.is_integer() else channel.channel_number,
-            "start_timestamp": int(start.timestamp()),
-            "stop_timestamp": int(end.timestamp()),
+            "start": listing["start"],
+            "end": listing["end"],
+            "description": listing["description"],
+            "channel_id": channel_number,
+            "start_timestamp": listing["start_timestamp"],
+            "stop_timestamp": listing["stop_timestamp"],
             "stream_id": f"{channel_id}",
         }
 
         if short == False:
-            program_output["now_playing"] = 1 if start <= timezone.now() <= end else 0
+            program_output["now_playing"] = 1 if listing["start_timestamp"] <= now_ts <= listing["stop_timestamp"] else 0
             program_output["has_archive"] = "0"
 
         output['epg_listings'].append(program_output)
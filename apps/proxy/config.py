@@ -12,6 +12,15 @@ class BaseConfig:
     BUFFERING_TIMEOUT = 15  # Seconds to wait for buffering before switching streams
     BUFFER_SPEED = 1 # What speed to condsider the stream buffering, 1x is normal speed, 2x is double speed, etc.
 
+    # Shared upstream connections (see apps.proxy.upstream)
+    UPSTREAM_CONNECT_TIMEOUT = 5      # Seconds to establish a connection to a provider
+    UPSTREAM_FIRST_BYTE_TIMEOUT = 10  # Seconds from sending a request to the response headers
+    UPSTREAM_READ_TIMEOUT = 60        # Seconds between reads once a stream is flowing
+    UPSTREAM_MAX_HOSTS = 32           # Provider hosts with a connection pool kept per process
+    UPSTREAM_POOL_SIZE = 8            # Idle keep-alive connections kept per host
+    UPSTREAM_DNS_TTL = 300            # Seconds a resolved provider address is reused
+    UPSTREAM_STATS_FLUSH_INTERVAL = 30  # Seconds between flushes of connection counters to Redis
+
     @classmethod
     def get_proxy_settings(cls):
         """Get proxy settings from CoreSettings JSON data with fallback to defaults"""
@@ -67,11 +76,13 @@ class TSConfig(BaseConfig):
 
     # Resource management
     CLEANUP_INTERVAL = 60  # Check for inactive channels every 60 seconds
+    CHANNEL_REGISTRY_TTL = 30  # Channels drop out of the registry when not refreshed for this long (seconds)
 
     # Client tracking settings
     CLIENT_RECORD_TTL = 5  # How long client records persist in Redis (seconds). Client will be considered MIA after this time.
     CLEANUP_CHECK_INTERVAL = 1  # How often to check for disconnected clients (seconds)
     CLIENT_HEARTBEAT_INTERVAL = 1  # How often to send client heartbeats (seconds)
+    CLIENT_HEARTBEAT_JITTER = 0.1  # Heartbeat ticks vary by up to this fraction of the interval
     GHOST_CLIENT_MULTIPLIER = 5.0  # How many heartbeat intervals before client considered ghost (5 would mean 5 secondsif heartbeat interval is 1)
     CLIENT_WAIT_TIMEOUT = 30  # Seconds to wait for client to connect
 
@@ -82,6 +93,28 @@ class TSConfig(BaseConfig):
     FAILOVER_GRACE_PERIOD = 20           # Extra time (seconds) to allow for stream switching before disconnecting clients
     URL_SWITCH_TIMEOUT = 20   # Max time allowed for a stream switch operation
 
+    # Hot standby: pre-connect the next alternate stream while the active one is degraded
+    HOT_STANDBY_ENABLED = False
+    HOT_STANDBY_STALL_TIME = 2       # Seconds without data before the active stream counts as degraded
+    HOT_STANDBY_MIN_SPEED = 1.0      # ffmpeg speed below which the active stream counts as degraded
+    HOT_STANDBY_CONNECT_TIMEOUT = 5  # Seconds to wait for the standby stream's first data
+    HOT_STANDBY_MAX_IDLE = 60        # Close an unused standby after this long (seconds) once the active stream recovers
+
+    # Stream health probing
+    STREAM_PROBE_TIMEOUT = 5          # Connect / first-bytes timeout of a probe (seconds)
+    STREAM_PROBE_WORKERS = 4          # Probes run concurrently
+    STREAM_PROBE_INTERVAL = 300       # Re-probe the alternates of watched channels this often (seconds)
+    STREAM_HEALTH_HALF_LIFE = 1800    # Age (seconds) at which a score has decayed halfway back to neutral
+    STREAM_HEALTH_TTL = 24 * 60 * 60  # Scores not refreshed for this long are dropped
+
+    # Transcoder stderr settings
+    STDERR_READ_SIZE = 65536      # Bytes read from ffmpeg's stderr per call
+    STDERR_MAX_LINE = 4096        # Partial stderr lines longer than this are flushed as-is
+    FFMPEG_STATS_INTERVAL = 1.0   # Parse ffmpeg stats (and publish them to Redis) at most this often (seconds)
+
+    # Transcoder stdout settings
+    TRANSCODE_READ_SIZE = 188 * 697  # Max bytes read from ffmpeg's stdout per call (~128KB, ~1/8s at TARGET_BITRATE)
+
 
 
     # Database-dependent settings with fallbacks
@@ -7,7 +7,6 @@ This proxy handles HLS live streams with support for:
 - Connection pooling and reuse
 """
 
-import requests
 import threading
 import logging
 import m3u8
@@ -18,6 +17,7 @@ from typing import Optional, Dict, List, Set, Deque
 import sys
 import os
 from apps.proxy.config import HLSConfig as Config
+from apps.proxy.upstream import UpstreamSession
 
 # Global state management
 manifest_buffer = None  # Stores current manifest content
@@ -346,7 +346,7 @@ class StreamFetcher:
     Attributes:
         manager (StreamManager): Associated stream manager instance
         buffer (StreamBuffer): Buffer for storing segments
-        session (requests.Session): Persistent HTTP session
+        session (UpstreamSession): Handle on the shared upstream session
         redirect_cache (dict): Cache for redirect responses
         
     Features:
@@ -360,26 +360,9 @@ class StreamFetcher:
         self.manager = manager
         self.buffer = buffer
         self.stream_url = manager.current_url
-        self.session = requests.Session()
-        
-        # Configure session headers
-        self.session.headers.update({
-            'User-Agent': manager.user_agent,
-            'Connection': 'keep-alive'
-        })
-        
-        # Set up connection pooling
-        adapter = requests.adapters.HTTPAdapter(
-            pool_connections=2,    # Number of connection pools
-            pool_maxsize=4,       # Connections per pool
-            max_retries=3,        # Auto-retry failed requests
-            pool_block=False      # Don't block when pool is full
-        )
-        
-        # Apply adapter to both HTTP and HTTPS
-        self.session.mount('http://', adapter)
-        self.session.mount('https://', adapter)
-        
+        # Handle on the shared upstream session: keep-alive pools per provider host, cached DNS
+        self.session = UpstreamSession(manager.user_agent)
+
         # Request optimization
         self.last_request_time = 0
         self.min_request_interval = 0.05  # Minimum time between requests
@@ -441,9 +424,9 @@ class StreamFetcher:
             if url in self.redirect_cache:
                 logging.debug(f"Using cached redirect for {url}")
                 final_url = self.redirect_cache[url]
-                response = self.session.get(final_url, timeout=10)
+                response = self.session.get(final_url)
             else:
-                response = self.session.get(url, allow_redirects=True, timeout=10)
+                response = self.session.get(url, allow_redirects=True)
                 if response.history:  # Cache redirects
                     logging.debug(f"Caching redirect for {url} -> {response.url}")
                     self.redirect_cache[url] = response.url
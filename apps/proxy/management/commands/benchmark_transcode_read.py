@@ -0,0 +1,115 @@
+import select
+import shutil
+import subprocess
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.proxy.config import TSConfig as Config
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark reading transcoder output: the old select() + 8KB read per chunk from a "
+        "buffered pipe against StreamManager.fetch_chunk's single readinto() per call, on an "
+        "ffmpeg testsrc MPEG-TS pipeline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seconds",
+            type=int,
+            default=30,
+            help="Length of the test stream in seconds (default: 30)",
+        )
+        parser.add_argument(
+            "--size",
+            default="1280x720",
+            help="Test picture size (default: 1280x720)",
+        )
+        parser.add_argument(
+            "--bitrate",
+            default="4M",
+            help="Video bitrate (default: 4M)",
+        )
+        parser.add_argument(
+            "--realtime",
+            action="store_true",
+            help="Produce the stream at its playback rate (-re), like a live channel, "
+            "instead of as fast as ffmpeg can",
+        )
+        parser.add_argument(
+            "--ffmpeg",
+            default="ffmpeg",
+            help="ffmpeg binary (default: ffmpeg)",
+        )
+
+    def handle(self, *args, **options):
+        if not shutil.which(options["ffmpeg"]):
+            raise CommandError(f"{options['ffmpeg']} not found")
+
+        command = [options["ffmpeg"], "-hide_banner", "-loglevel", "error"]
+        if options["realtime"]:
+            command.append("-re")
+        command += [
+            "-f", "lavfi",
+            "-i", f"testsrc=size={options['size']}:rate=25",
+            "-t", str(options["seconds"]),
+            # Built into every ffmpeg build, unlike libx264
+            "-c:v", "mpeg2video",
+            "-b:v", options["bitrate"],
+            "-f", "mpegts",
+            "pipe:1",
+        ]
+        self.stdout.write(" ".join(command))
+
+        for label, bufsize, read in (
+            ("select + read", 188 * 64, self._read_with_select),
+            ("readinto", 0, self._read_into),
+        ):
+            process = subprocess.Popen(
+                command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=bufsize
+            )
+            try:
+                start = time.perf_counter()
+                cpu_start = time.process_time()
+                total, reads = read(process.stdout)
+                cpu = time.process_time() - cpu_start
+                elapsed = time.perf_counter() - start
+            finally:
+                process.kill()
+                process.wait()
+
+            if not total:
+                raise CommandError(f"ffmpeg produced no output, check that {' '.join(command)} runs")
+
+            self.stdout.write(
+                f"{label}: {total / 1024 / 1024:.1f} MB in {reads} reads "
+                f"({total / reads / 1024:.1f} KB per read), {elapsed * 1000:.0f} ms wall, "
+                f"{cpu * 1000:.0f} ms reader CPU"
+            )
+
+    def _read_with_select(self, pipe):
+        # fetch_chunk before it read in large blocks
+        total = reads = 0
+        while True:
+            ready, _, _ = select.select([pipe], [], [], 10)
+            if not ready:
+                break
+            chunk = pipe.read(Config.CHUNK_SIZE)
+            reads += 1
+            if not chunk:
+                return total, reads
+            total += len(chunk)
+        return total, reads
+
+    def _read_into(self, pipe):
+        # fetch_chunk now
+        buffer = memoryview(bytearray(Config.TRANSCODE_READ_SIZE))
+        total = reads = 0
+        while True:
+            size = pipe.readinto(buffer)
+            reads += 1
+            if not size:
+                return total, reads
+            total += size
@@ -0,0 +1,129 @@
+"""
+Live channel stats for the UI, sent as deltas.
+
+Every publish compares the current basic info of all channels with the last
+broadcast and sends only what changed: changed fields per channel (null for a
+field that went away), new channels in full and the ids of channels that
+stopped. Time-relative fields (channel uptime, client connected_since) are
+sent as absolute timestamps (started_at, connected_at) so they don't change on
+every tick; the UI derives them from the broadcast's ts.
+
+The last broadcast is kept in Redis with a sequence number, so publishes from
+any Celery worker diff against the same state. A UI gets the full snapshot when
+its WebSocket connects, or asks for one when it sees a gap in the sequence.
+"""
+
+import json
+import logging
+import time
+
+from apps.proxy.ts_proxy.channel_status import ChannelStatus
+from core.utils import RedisClient, send_websocket_update
+
+logger = logging.getLogger(__name__)
+
+STATS_SNAPSHOT_KEY = "ts_proxy:stats_snapshot"
+STATS_PUBLISH_LOCK_KEY = "ts_proxy:stats_publish_lock"
+# The snapshot outlives a few missed publishes; after that the UIs start over
+STATS_SNAPSHOT_TTL = 60
+
+
+def _wire_form(info):
+    channel = {key: value for key, value in info.items() if key != 'uptime'}
+    channel['clients'] = [
+        {key: value for key, value in client.items() if key != 'connected_since'}
+        for client in info.get('clients', [])
+    ]
+    return channel
+
+
+def diff_channels(previous, current):
+    """
+    Changes from previous to current ({channel_id: channel} both).
+
+    Returns:
+        tuple: ({channel_id: changed fields}, [removed channel ids])
+    """
+    changed = {}
+    for channel_id, channel in current.items():
+        old = previous.get(channel_id)
+        if old is None:
+            changed[channel_id] = channel
+            continue
+
+        fields = {key: value for key, value in channel.items() if old.get(key) != value}
+        fields.update({key: None for key in old if key not in channel})
+        if fields:
+            changed[channel_id] = fields
+
+    removed = [channel_id for channel_id in previous if channel_id not in current]
+    return changed, removed
+
+
+def get_stats_snapshot():
+    """The last broadcast as a full channel_stats message."""
+    snapshot = None
+    redis_client = RedisClient.get_client()
+    if redis_client:
+        try:
+            raw = redis_client.get(STATS_SNAPSHOT_KEY)
+            snapshot = json.loads(raw) if raw else None
+        except Exception as e:
+            logger.warning(f"Unable to read channel stats snapshot: {e}")
+
+    snapshot = snapshot or {"seq": 0, "ts": time.time(), "channels": {}}
+    return {
+        "success": True,
+        "type": "channel_stats",
+        "full": True,
+        "seq": snapshot["seq"],
+        "ts": snapshot["ts"],
+        "channels": snapshot["channels"],
+        "removed": [],
+    }
+
+
+def publish_channel_stats():
+    """Broadcast the changes since the last publish to all connected UIs."""
+    redis_client = RedisClient.get_client()
+    if not redis_client:
+        return
+
+    # Overlapping publishes would diff against the same snapshot
+    if not redis_client.set(STATS_PUBLISH_LOCK_KEY, "1", ex=10, nx=True):
+        return
+
+    try:
+        raw = redis_client.get(STATS_SNAPSHOT_KEY)
+        previous = json.loads(raw) if raw else {"seq": 0, "channels": {}}
+
+        current = {
+            info['channel_id']: _wire_form(info)
+            for info in ChannelStatus.get_all_basic_channel_info()
+        }
+        changed, removed = diff_channels(previous["channels"], current)
+
+        seq = previous["seq"] + 1
+        ts = time.time()
+        redis_client.set(
+            STATS_SNAPSHOT_KEY,
+            json.dumps({"seq": seq, "ts": ts, "channels": current}),
+            ex=STATS_SNAPSHOT_TTL
+        )
+
+        # Sent even without changes: the UI advances uptimes from ts
+        send_websocket_update(
+            "updates",
+            "update",
+            {
+                "success": True,
+                "type": "channel_stats",
+                "full": False,
+                "seq": seq,
+                "ts": ts,
+                "channels": changed,
+                "removed": removed,
+            }
+        )
+    finally:
+        redis_client.delete(STATS_PUBLISH_LOCK_KEY)
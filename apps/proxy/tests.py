@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.channels.models import allocate_channel_stream, release_channel_stream
+from apps.proxy.ts_proxy.server import ProxyServer
+from core.utils import RedisClient
+
+LEADER_ID = 900001
+READER_ID = 900002
+STREAM_ID = 900003
+PROFILE_ID = 900004
+STREAM_PROFILE_ID = 1
+
+
+class SharedStreamSlotTest(SimpleTestCase):
+    """A channel sharing another channel's stream never holds an M3U profile slot."""
+
+    def setUp(self):
+        self.redis_client = RedisClient.get_client(max_retries=1)
+        if not self.redis_client:
+            self.skipTest("Redis is not available")
+        self.keys = [
+            f"channel_stream:{LEADER_ID}",
+            f"channel_stream:{READER_ID}",
+            f"stream_profile:{STREAM_ID}",
+            f"profile_connections:{PROFILE_ID}",
+        ]
+        self.redis_client.delete(*self.keys)
+
+        # Just the state find_shared_source looks at
+        self.proxy_server = ProxyServer.__new__(ProxyServer)
+        self.proxy_server.stream_managers = {}
+        self.proxy_server.shared_sessions = {}
+
+        self.plan = {
+            "channel_id": READER_ID,
+            "stream_profile_id": STREAM_PROFILE_ID,
+            "transcode": False,
+            "redirect": False,
+            "has_streams": True,
+            "candidates": [{
+                "stream_id": STREAM_ID,
+                "stream_name": "Shared",
+                "profile_id": PROFILE_ID,
+                "max_streams": 1,
+                "url": "http://example.com/live/1.ts",
+                "user_agent": "VLC",
+            }],
+        }
+
+    def tearDown(self):
+        self.redis_client.delete(*self.keys)
+
+    def connections(self):
+        return int(self.redis_client.get(f"profile_connections:{PROFILE_ID}") or 0)
+
+    def test_allocate_share_release(self):
+        stream_id, profile_id, maxed_out = allocate_channel_stream(
+            LEADER_ID, [(STREAM_ID, PROFILE_ID, 1)]
+        )
+        self.assertEqual((stream_id, profile_id), (STREAM_ID, PROFILE_ID))
+        self.assertEqual(self.connections(), 1)
+
+        # The leader's stream is running in this worker
+        channel_uuid = "leader-uuid"
+        self.proxy_server.stream_managers[channel_uuid] = SimpleNamespace(
+            running=True, connected=True, stopping=False,
+            url="http://example.com/live/1.ts", user_agent="VLC", current_stream_id=STREAM_ID,
+        )
+        self.proxy_server.shared_sessions[
+            ProxyServer._session_key(STREAM_ID, STREAM_PROFILE_ID)
+        ] = channel_uuid
+
+        # The profile is full, yet the reader gets the leader's stream without a slot
+        with mock.patch("apps.proxy.ts_proxy.server.get_stream_plan", return_value=self.plan):
+            stream_info = self.proxy_server.find_shared_source("reader-uuid")
+        self.assertEqual(stream_info["shared_with"], channel_uuid)
+        self.assertEqual(stream_info["stream_id"], STREAM_ID)
+        self.assertIsNone(stream_info["m3u_profile_id"])
+        self.assertEqual(self.connections(), 1)
+
+        # Releasing the reader leaves the leader's slot alone
+        self.assertEqual(release_channel_stream(READER_ID), 0)
+        self.assertEqual(self.connections(), 1)
+        self.assertEqual(int(self.redis_client.get(f"stream_profile:{STREAM_ID}")), PROFILE_ID)
+
+        self.assertEqual(release_channel_stream(LEADER_ID), PROFILE_ID)
+        self.assertEqual(self.connections(), 0)
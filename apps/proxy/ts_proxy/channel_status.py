@@ -1,6 +1,8 @@
 import logging
+import threading
 import time
 import re
+from apps.proxy.config import TSConfig as Config
 from .server import ProxyServer
 from .redis_keys import RedisKeys
 from .constants import TS_PACKET_SIZE, ChannelMetadataField
@@ -10,6 +12,51 @@ from django.db import DatabaseError  # Add import for error handling
 
 logger = get_logger()
 
+# How long stream / M3U profile names shown in channel stats are reused (seconds)
+NAME_CACHE_TTL = 60
+MAX_CACHED_NAMES = 4096
+
+# (kind, id) -> (expires_at, name)
+_name_cache = {}
+_name_cache_lock = threading.Lock()
+
+
+def _lookup_names(kind, ids):
+    """
+    Names of streams ('stream') or M3U profiles ('m3u_profile') by id, as {id: name}.
+    Names are cached per process for NAME_CACHE_TTL; the missing ones are loaded in one query.
+    """
+    now = time.monotonic()
+    names = {}
+    missing = set()
+    for obj_id in ids:
+        entry = _name_cache.get((kind, obj_id))
+        if entry and entry[0] > now:
+            names[obj_id] = entry[1]
+        else:
+            missing.add(obj_id)
+
+    if not missing:
+        return names
+
+    try:
+        if kind == 'stream':
+            from apps.channels.models import Stream as model
+        else:
+            from apps.m3u.models import M3UAccountProfile as model
+        loaded = dict(model.objects.filter(id__in=missing).values_list('id', 'name'))
+    except (ImportError, DatabaseError) as e:
+        logger.warning(f"Failed to get {kind} names for IDs {sorted(missing)}: {e}")
+        return names
+
+    with _name_cache_lock:
+        if len(_name_cache) + len(loaded) > MAX_CACHED_NAMES:
+            _name_cache.clear()
+        for obj_id, name in loaded.items():
+            _name_cache[(kind, obj_id)] = (now + NAME_CACHE_TTL, name)
+    names.update(loaded)
+    return names
+
 class ChannelStatus:
 
     @staticmethod
@@ -340,171 +387,218 @@ class ChannelStatus:
             logger.error(f"Redis command error in ChannelStatus: {e}")
             return None
 
+    @staticmethod
+    def get_active_channel_ids():
+        """
+        IDs of the channels in the channel registry (see ProxyServer.refresh_channel_registry).
+        Entries not refreshed within CHANNEL_REGISTRY_TTL are dropped first.
+        """
+        proxy_server = ProxyServer.get_instance()
+        registry_key = RedisKeys.channel_registry()
+
+        def read_registry():
+            pipe = proxy_server.redis_client.pipeline(transaction=False)
+            pipe.zremrangebyscore(registry_key, "-inf", time.time() - Config.CHANNEL_REGISTRY_TTL)
+            pipe.zrange(registry_key, 0, -1)
+            return pipe.execute()[1]
+
+        channel_ids = ChannelStatus._execute_redis_command(read_registry) or []
+        return [channel_id.decode('utf-8') for channel_id in channel_ids]
+
+    @staticmethod
+    def get_all_basic_channel_info():
+        """Basic info of all active channels"""
+        return ChannelStatus.get_basic_channel_infos(ChannelStatus.get_active_channel_ids())
+
     @staticmethod
     def get_basic_channel_info(channel_id):
         """Get basic channel information with Redis error handling"""
+        infos = ChannelStatus.get_basic_channel_infos([channel_id])
+        return infos[0] if infos else None
+
+    @staticmethod
+    def get_basic_channel_infos(channel_ids):
+        """
+        Basic info of several channels, read with two pipelined round trips
+        (channel data, then client details) however many channels there are.
+        Channels without metadata are left out.
+        """
         proxy_server = ProxyServer.get_instance()
+        if not channel_ids:
+            return []
 
         try:
-            # Use _execute_redis_command for Redis operations
-            metadata_key = RedisKeys.channel_metadata(channel_id)
-            metadata = ChannelStatus._execute_redis_command(
-                lambda: proxy_server.redis_client.hgetall(metadata_key)
-            )
-
-            if not metadata:
-                return None
-
-            # Basic channel info only - omit diagnostics and details
-            buffer_index_key = RedisKeys.buffer_index(channel_id)
-            buffer_index_value = proxy_server.redis_client.get(buffer_index_key)
-
-            # Count clients (using efficient count method)
-            client_set_key = RedisKeys.clients(channel_id)
-            client_count = proxy_server.redis_client.scard(client_set_key) or 0
-
-            # Calculate uptime
-            init_time_bytes = metadata.get(ChannelMetadataField.INIT_TIME.encode('utf-8'), b'0')
-            created_at = float(init_time_bytes.decode('utf-8'))
-            uptime = time.time() - created_at if created_at > 0 else 0
-
-            # Safely decode bytes or use defaults
-            def safe_decode(bytes_value, default="unknown"):
-                if bytes_value is None:
-                    return default
-                return bytes_value.decode('utf-8')
-
-            # Simplified info
-            info = {
-                'channel_id': channel_id,
-                'state': safe_decode(metadata.get(ChannelMetadataField.STATE.encode('utf-8'))),
-                'url': safe_decode(metadata.get(ChannelMetadataField.URL.encode('utf-8')), ""),
-                'stream_profile': safe_decode(metadata.get(ChannelMetadataField.STREAM_PROFILE.encode('utf-8')), ""),
-                'owner': safe_decode(metadata.get(ChannelMetadataField.OWNER.encode('utf-8'))),
-                'buffer_index': int(buffer_index_value.decode('utf-8')) if buffer_index_value else 0,
-                'client_count': client_count,
-                'uptime': uptime
-            }
-
-            # Add stream ID and name information
-            stream_id_bytes = metadata.get(ChannelMetadataField.STREAM_ID.encode('utf-8'))
-            if stream_id_bytes:
+            def read_channels():
+                pipe = proxy_server.redis_client.pipeline(transaction=False)
+                for channel_id in channel_ids:
+                    pipe.hgetall(RedisKeys.channel_metadata(channel_id))
+                    pipe.get(RedisKeys.buffer_index(channel_id))
+                    pipe.smembers(RedisKeys.clients(channel_id))
+                return pipe.execute()
+
+            results = ChannelStatus._execute_redis_command(read_channels)
+            if not results:
+                return []
+
+            channels = []
+            for i, channel_id in enumerate(channel_ids):
+                metadata, buffer_index_value, client_ids = results[3 * i:3 * i + 3]
+                if metadata:
+                    # Get up to 10 clients for the basic view
+                    listed = [client_id.decode('utf-8') for client_id in list(client_ids)[:10]]
+                    channels.append((channel_id, metadata, buffer_index_value, len(client_ids), listed))
+
+            def read_clients():
+                pipe = proxy_server.redis_client.pipeline(transaction=False)
+                for channel_id, _, _, _, client_ids in channels:
+                    for client_id in client_ids:
+                        pipe.hmget(RedisKeys.client_metadata(channel_id, client_id), 'user_agent', 'ip_address', 'connected_at')
+                return pipe.execute()
+
+            client_fields = iter(ChannelStatus._execute_redis_command(read_clients) or [])
+
+            stream_names = _lookup_names('stream', [
+                int(metadata[ChannelMetadataField.STREAM_ID.encode('utf-8')])
+                for _, metadata, _, _, _ in channels
+                if metadata.get(ChannelMetadataField.STREAM_ID.encode('utf-8'), b'').isdigit()
+            ])
+            profile_names = _lookup_names('m3u_profile', [
+                int(metadata[ChannelMetadataField.M3U_PROFILE.encode('utf-8')])
+                for _, metadata, _, _, _ in channels
+                if metadata.get(ChannelMetadataField.M3U_PROFILE.encode('utf-8'), b'').isdigit()
+            ])
+
+            infos = []
+            for channel_id, metadata, buffer_index_value, client_count, client_ids in channels:
+                clients = [
+                    (client_id, next(client_fields, (None, None, None)))
+                    for client_id in client_ids
+                ]
                 try:
-                    stream_id = int(stream_id_bytes.decode('utf-8'))
-                    info['stream_id'] = stream_id
-
-                    # Look up stream name from database
-                    try:
-                        from apps.channels.models import Stream
-                        stream = Stream.objects.filter(id=stream_id).first()
-                        if stream:
-                            info['stream_name'] = stream.name
-                    except (ImportError, DatabaseError) as e:
-                        logger.warning(f"Failed to get stream name for ID {stream_id}: {e}")
-                except ValueError:
-                    logger.warning(f"Invalid stream_id format in Redis: {stream_id_bytes}")
-
-            # Add data throughput information to basic info
-            total_bytes_bytes = proxy_server.redis_client.hget(metadata_key, ChannelMetadataField.TOTAL_BYTES.encode('utf-8'))
-            if total_bytes_bytes:
-                total_bytes = int(total_bytes_bytes.decode('utf-8'))
-                info['total_bytes'] = total_bytes
-
-                # Calculate and add bitrate
-                if uptime > 0:
-                    avg_bitrate = ChannelStatus._calculate_bitrate(total_bytes, uptime)
-                    info['avg_bitrate_kbps'] = avg_bitrate
-
-                    # Format for display
-                    if avg_bitrate > 1000:
-                        info['avg_bitrate'] = f"{avg_bitrate / 1000:.2f} Mbps"
-                    else:
-                        info['avg_bitrate'] = f"{avg_bitrate:.2f} Kbps"
-
-            # Quick health check if available locally
-            if channel_id in proxy_server.stream_managers:
-                manager = proxy_server.stream_managers[channel_id]
-                info['healthy'] = manager.healthy
-
-            # Get concise client information
-            clients = []
-            client_ids = proxy_server.redis_client.smembers(client_set_key)
-
-            # Process only if we have clients and keep it limited
-            if client_ids:
-                # Get up to 10 clients for the basic view
-                for client_id in list(client_ids)[:10]:
-                    client_id_str = client_id.decode('utf-8')
-                    client_key = RedisKeys.client_metadata(channel_id, client_id_str)
-
-                    # Efficient way - just retrieve the essentials
-                    client_info = {
-                        'client_id': client_id_str,
-                    }
-
-                    # Safely get user_agent and ip_address
-                    user_agent_bytes = proxy_server.redis_client.hget(client_key, 'user_agent')
-                    client_info['user_agent'] = safe_decode(user_agent_bytes)
-
-                    ip_address_bytes = proxy_server.redis_client.hget(client_key, 'ip_address')
-                    if ip_address_bytes:
-                        client_info['ip_address'] = safe_decode(ip_address_bytes)
-
-                    # Just get connected_at for client age
-                    connected_at_bytes = proxy_server.redis_client.hget(client_key, 'connected_at')
-                    if connected_at_bytes:
-                        connected_at = float(connected_at_bytes.decode('utf-8'))
-                        client_info['connected_since'] = time.time() - connected_at
-
-                    clients.append(client_info)
-
-            # Add clients to info
-            info['clients'] = clients
-
-            # Add M3U profile information
-            m3u_profile_id_bytes = metadata.get(ChannelMetadataField.M3U_PROFILE.encode('utf-8'))
-            if m3u_profile_id_bytes:
-                try:
-                    m3u_profile_id = int(m3u_profile_id_bytes.decode('utf-8'))
-                    info['m3u_profile_id'] = m3u_profile_id
-
-                    # Look up M3U profile name from database
-                    try:
-                        from apps.m3u.models import M3UAccountProfile
-                        m3u_profile = M3UAccountProfile.objects.filter(id=m3u_profile_id).first()
-                        if m3u_profile:
-                            info['m3u_profile_name'] = m3u_profile.name
-                    except (ImportError, DatabaseError) as e:
-                        logger.warning(f"Failed to get M3U profile name for ID {m3u_profile_id}: {e}")
-                except ValueError:
-                    logger.warning(f"Invalid m3u_profile_id format in Redis: {m3u_profile_id_bytes}")
-
-            # Add stream info to basic info as well
-            video_codec = metadata.get(ChannelMetadataField.VIDEO_CODEC.encode('utf-8'))
-            if video_codec:
-                info['video_codec'] = video_codec.decode('utf-8')
-
-            resolution = metadata.get(ChannelMetadataField.RESOLUTION.encode('utf-8'))
-            if resolution:
-                info['resolution'] = resolution.decode('utf-8')
-
-            source_fps = metadata.get(ChannelMetadataField.SOURCE_FPS.encode('utf-8'))
-            if source_fps:
-                info['source_fps'] = float(source_fps.decode('utf-8'))
-            ffmpeg_speed = metadata.get(ChannelMetadataField.FFMPEG_SPEED.encode('utf-8'))
-            if ffmpeg_speed:
-                info['ffmpeg_speed'] = float(ffmpeg_speed.decode('utf-8'))
-            audio_codec = metadata.get(ChannelMetadataField.AUDIO_CODEC.encode('utf-8'))
-            if audio_codec:
-                info['audio_codec'] = audio_codec.decode('utf-8')
-            audio_channels = metadata.get(ChannelMetadataField.AUDIO_CHANNELS.encode('utf-8'))
-            if audio_channels:
-                info['audio_channels'] = audio_channels.decode('utf-8')
-            stream_type = metadata.get(ChannelMetadataField.STREAM_TYPE.encode('utf-8'))
-            if stream_type:
-                info['stream_type'] = stream_type.decode('utf-8')
-
-            return info
+                    infos.append(ChannelStatus._build_basic_info(
+                        proxy_server, channel_id, metadata, buffer_index_value, client_count,
+                        clients, stream_names, profile_names
+                    ))
+                except Exception as e:
+                    logger.error(f"Error getting channel info for {channel_id}: {e}", exc_info=True)
+            return infos
         except Exception as e:
             logger.error(f"Error getting channel info: {e}", exc_info=True)  # Added exc_info for better debugging
-            return None
+            return []
+
+    @staticmethod
+    def _build_basic_info(proxy_server, channel_id, metadata, buffer_index_value, client_count,
+                          clients, stream_names, profile_names):
+        """Assemble one channel's basic info from its pipelined Redis data"""
+        # Calculate uptime
+        init_time_bytes = metadata.get(ChannelMetadataField.INIT_TIME.encode('utf-8'), b'0')
+        created_at = float(init_time_bytes.decode('utf-8'))
+        uptime = time.time() - created_at if created_at > 0 else 0
+
+        # Safely decode bytes or use defaults
+        def safe_decode(bytes_value, default="unknown"):
+            if bytes_value is None:
+                return default
+            return bytes_value.decode('utf-8')
+
+        # Simplified info
+        info = {
+            'channel_id': channel_id,
+            'state': safe_decode(metadata.get(ChannelMetadataField.STATE.encode('utf-8'))),
+            'url': safe_decode(metadata.get(ChannelMetadataField.URL.encode('utf-8')), ""),
+            'stream_profile': safe_decode(metadata.get(ChannelMetadataField.STREAM_PROFILE.encode('utf-8')), ""),
+            'owner': safe_decode(metadata.get(ChannelMetadataField.OWNER.encode('utf-8'))),
+            'buffer_index': int(buffer_index_value.decode('utf-8')) if buffer_index_value else 0,
+            'client_count': client_count,
+            'started_at': created_at,
+            'uptime': uptime
+        }
+
+        # Add stream ID and name information
+        stream_id_bytes = metadata.get(ChannelMetadataField.STREAM_ID.encode('utf-8'))
+        if stream_id_bytes:
+            try:
+                stream_id = int(stream_id_bytes.decode('utf-8'))
+                info['stream_id'] = stream_id
+                if stream_id in stream_names:
+                    info['stream_name'] = stream_names[stream_id]
+            except ValueError:
+                logger.warning(f"Invalid stream_id format in Redis: {stream_id_bytes}")
+
+        # Add data throughput information to basic info
+        total_bytes_bytes = metadata.get(ChannelMetadataField.TOTAL_BYTES.encode('utf-8'))
+        if total_bytes_bytes:
+            total_bytes = int(total_bytes_bytes.decode('utf-8'))
+            info['total_bytes'] = total_bytes
+
+            # Calculate and add bitrate
+            if uptime > 0:
+                avg_bitrate = ChannelStatus._calculate_bitrate(total_bytes, uptime)
+                info['avg_bitrate_kbps'] = avg_bitrate
+
+                # Format for display
+                if avg_bitrate > 1000:
+                    info['avg_bitrate'] = f"{avg_bitrate / 1000:.2f} Mbps"
+                else:
+                    info['avg_bitrate'] = f"{avg_bitrate:.2f} Kbps"
+
+        # Quick health check if available locally
+        if channel_id in proxy_server.stream_managers:
+            manager = proxy_server.stream_managers[channel_id]
+            info['healthy'] = manager.healthy
+
+        # Get concise client information
+        info['clients'] = []
+        for client_id, (user_agent_bytes, ip_address_bytes, connected_at_bytes) in clients:
+            client_info = {
+                'client_id': client_id,
+                'user_agent': safe_decode(user_agent_bytes),
+            }
+            if ip_address_bytes:
+                client_info['ip_address'] = safe_decode(ip_address_bytes)
+
+            # Just get connected_at for client age
+            if connected_at_bytes:
+                connected_at = float(connected_at_bytes.decode('utf-8'))
+                client_info['connected_at'] = connected_at
+                client_info['connected_since'] = time.time() - connected_at
+
+            info['clients'].append(client_info)
+
+        # Add M3U profile information
+        m3u_profile_id_bytes = metadata.get(ChannelMetadataField.M3U_PROFILE.encode('utf-8'))
+        if m3u_profile_id_bytes:
+            try:
+                m3u_profile_id = int(m3u_profile_id_bytes.decode('utf-8'))
+                info['m3u_profile_id'] = m3u_profile_id
+                if m3u_profile_id in profile_names:
+                    info['m3u_profile_name'] = profile_names[m3u_profile_id]
+            except ValueError:
+                logger.warning(f"Invalid m3u_profile_id format in Redis: {m3u_profile_id_bytes}")
+
+        # Add stream info to basic info as well
+        video_codec = metadata.get(ChannelMetadataField.VIDEO_CODEC.encode('utf-8'))
+        if video_codec:
+            info['video_codec'] = video_codec.decode('utf-8')
+
+        resolution = metadata.get(ChannelMetadataField.RESOLUTION.encode('utf-8'))
+        if resolution:
+            info['resolution'] = resolution.decode('utf-8')
+
+        source_fps = metadata.get(ChannelMetadataField.SOURCE_FPS.encode('utf-8'))
+        if source_fps:
+            info['source_fps'] = float(source_fps.decode('utf-8'))
+        ffmpeg_speed = metadata.get(ChannelMetadataField.FFMPEG_SPEED.encode('utf-8'))
+        if ffmpeg_speed:
+            info['ffmpeg_speed'] = float(ffmpeg_speed.decode('utf-8'))
+        audio_codec = metadata.get(ChannelMetadataField.AUDIO_CODEC.encode('utf-8'))
+        if audio_codec:
+            info['audio_codec'] = audio_codec.decode('utf-8')
+        audio_channels = metadata.get(ChannelMetadataField.AUDIO_CHANNELS.encode('utf-8'))
+        if audio_channels:
+            info['audio_channels'] = audio_channels.decode('utf-8')
+        stream_type = metadata.get(ChannelMetadataField.STREAM_TYPE.encode('utf-8'))
+        if stream_type:
+            info['stream_type'] = stream_type.decode('utf-8')
+
+        return info
@@ -4,12 +4,11 @@ import threading
 import logging
 import time
 import json
-import gevent
 from typing import Set, Optional
-from apps.proxy.config import TSConfig as Config
 from redis.exceptions import ConnectionError, TimeoutError
 from .constants import EventType
 from .config_helper import ConfigHelper
+from .heartbeat import scheduler as heartbeat_scheduler
 from .redis_keys import RedisKeys
 from .utils import get_logger
 
@@ -30,137 +29,19 @@ class ClientManager:
         self.client_set_key = RedisKeys.clients(channel_id)
         self.client_ttl = ConfigHelper.get('CLIENT_RECORD_TTL', 60)
         self.heartbeat_interval = ConfigHelper.get('CLIENT_HEARTBEAT_INTERVAL', 10)
-        self.last_heartbeat_time = {}
 
-        # Start heartbeat thread for local clients
-        self._start_heartbeat_thread()
         self._registered_clients = set()  # Track already registered client IDs
 
-    def _start_heartbeat_thread(self):
-        """Start thread to regularly refresh client presence in Redis"""
-        def heartbeat_task():
-            no_clients_count = 0  # Track consecutive empty cycles
-            max_empty_cycles = 3  # Exit after this many consecutive empty checks
-
-            logger.debug(f"Started heartbeat thread for channel {self.channel_id} (interval: {self.heartbeat_interval}s)")
-
-            while True:
-                try:
-                    # Wait for the interval
-                    gevent.sleep(self.heartbeat_interval)
-
-                    # Send heartbeat for all local clients
-                    with self.lock:
-                        if not self.clients or not self.redis_client:
-                            # No clients left, increment our counter
-                            no_clients_count += 1
-
-                            # Check if we're in a shutdown delay period before exiting
-                            in_shutdown_delay = False
-                            if self.redis_client:
-                                try:
-                                    disconnect_key = RedisKeys.last_client_disconnect(self.channel_id)
-                                    disconnect_time_bytes = self.redis_client.get(disconnect_key)
-                                    if disconnect_time_bytes:
-                                        disconnect_time = float(disconnect_time_bytes.decode('utf-8'))
-                                        elapsed = time.time() - disconnect_time
-                                        shutdown_delay = ConfigHelper.channel_shutdown_delay()
-
-                                        if elapsed < shutdown_delay:
-                                            in_shutdown_delay = True
-                                            logger.debug(f"Channel {self.channel_id} in shutdown delay: {elapsed:.1f}s of {shutdown_delay}s elapsed")
-                                except Exception as e:
-                                    logger.debug(f"Error checking shutdown delay: {e}")
-
-                            # Only exit if we've seen no clients for several consecutive checks AND we're not in shutdown delay
-                            if no_clients_count >= max_empty_cycles and not in_shutdown_delay:
-                                logger.info(f"No clients for channel {self.channel_id} after {no_clients_count} consecutive checks and not in shutdown delay, exiting heartbeat thread")
-                                return  # This exits the thread
-
-                            # Skip this cycle if we have no clients but continue if in shutdown delay
-                            if not in_shutdown_delay:
-                                continue
-                            else:
-                                # Reset counter during shutdown delay to prevent premature exit
-                                no_clients_count = 0
-                                continue
-                        else:
-                            # Reset counter when we see clients
-                            no_clients_count = 0
-
-                        # IMPROVED GHOST DETECTION: Check for stale clients before sending heartbeats
-                        current_time = time.time()
-                        clients_to_remove = set()
-
-                        # First identify clients that should be removed
-                        for client_id in self.clients:
-                            client_key = f"ts_proxy:channel:{self.channel_id}:clients:{client_id}"
-
-                            # Check if client exists in Redis at all
-                            exists = self.redis_client.exists(client_key)
-                            if not exists:
-                                logger.debug(f"Client {client_id} no longer exists in Redis, removing locally")
-                                clients_to_remove.add(client_id)
-                                continue
-
-                            # Check for stale activity using last_active field
-                            last_active = self.redis_client.hget(client_key, "last_active")
-                            if last_active:
-                                last_active_time = float(last_active.decode('utf-8'))
-                                ghost_timeout = self.heartbeat_interval * getattr(Config, 'GHOST_CLIENT_MULTIPLIER', 5.0)
-
-                                if current_time - last_active_time > ghost_timeout:
-                                    logger.debug(f"Client {client_id} inactive for {current_time - last_active_time:.1f}s, removing as ghost")
-                                    clients_to_remove.add(client_id)
-
-                        # Remove ghost clients in a separate step
-                        for client_id in clients_to_remove:
-                            self.remove_client(client_id)
-
-                        if clients_to_remove:
-                            logger.info(f"Removed {len(clients_to_remove)} ghost clients from channel {self.channel_id}")
-
-                        # Now send heartbeats only for remaining clients
-                        pipe = self.redis_client.pipeline()
-                        current_time = time.time()
-
-                        for client_id in self.clients:
-                            # Skip clients we just marked for removal
-                            if client_id in clients_to_remove:
-                                continue
-
-                            # Skip if we just sent a heartbeat recently
-                            if client_id in self.last_heartbeat_time:
-                                time_since_heartbeat = current_time - self.last_heartbeat_time[client_id]
-                                if time_since_heartbeat < self.heartbeat_interval * 0.5:  # Only heartbeat at half interval minimum
-                                    continue
-
-                            # Only update clients that remain
-                            client_key = f"ts_proxy:channel:{self.channel_id}:clients:{client_id}"
-                            pipe.hset(client_key, "last_active", str(current_time))
-                            pipe.expire(client_key, self.client_ttl)
-
-                            # Keep client in the set with TTL
-                            pipe.sadd(self.client_set_key, client_id)
-                            pipe.expire(self.client_set_key, self.client_ttl)
-
-                            # Track last heartbeat locally
-                            self.last_heartbeat_time[client_id] = current_time
-
-                        # Execute all commands atomically
-                        pipe.execute()
-
-                        # Only notify if we have real clients
-                        if self.clients and not all(c in clients_to_remove for c in self.clients):
-                            self._notify_owner_of_activity()
-
-                except Exception as e:
-                    logger.error(f"Error in client heartbeat thread: {e}")
-
-        thread = threading.Thread(target=heartbeat_task, daemon=True)
-        thread.name = f"client-heartbeat-{self.channel_id}"
-        thread.start()
-        logger.debug(f"Started client heartbeat thread for channel {self.channel_id} (interval: {self.heartbeat_interval}s)")
+        # Heartbeats for local clients are sent by the worker's shared scheduler
+        heartbeat_scheduler.register(self)
+
+    def stop(self):
+        """Stop heartbeating this channel's clients, once the channel is torn down here"""
+        heartbeat_scheduler.unregister(self)
+
+    def client_key(self, client_id):
+        """Redis key of a client's record"""
+        return f"ts_proxy:channel:{self.channel_id}:clients:{client_id}"
 
     def _execute_redis_command(self, command_func):
         """Execute Redis command with error handling"""
@@ -176,25 +57,27 @@ class ClientManager:
             logger.error(f"Redis command error in ClientManager: {e}")
             return None
 
+    def queue_activity(self, pipe):
+        """Queue the commands telling the channel owner that clients are active on this worker"""
+        worker_id = self.worker_id or "unknown"
+
+        # STANDARDIZED KEY: Worker info under channel namespace
+        worker_key = f"ts_proxy:channel:{self.channel_id}:worker:{worker_id}"
+        pipe.setex(worker_key, self.client_ttl, str(len(self.clients)))
+
+        # STANDARDIZED KEY: Activity timestamp under channel namespace
+        activity_key = f"ts_proxy:channel:{self.channel_id}:activity"
+        pipe.setex(activity_key, self.client_ttl, str(time.time()))
+
     def _notify_owner_of_activity(self):
         """Notify channel owner that clients are active on this worker"""
         if not self.redis_client or not self.clients:
             return
 
         try:
-            worker_id = self.worker_id or "unknown"
-
-            # STANDARDIZED KEY: Worker info under channel namespace
-            worker_key = f"ts_proxy:channel:{self.channel_id}:worker:{worker_id}"
-            self._execute_redis_command(
-                lambda: self.redis_client.setex(worker_key, self.client_ttl, str(len(self.clients)))
-            )
-
-            # STANDARDIZED KEY: Activity timestamp under channel namespace
-            activity_key = f"ts_proxy:channel:{self.channel_id}:activity"
-            self._execute_redis_command(
-                lambda: self.redis_client.setex(activity_key, self.client_ttl, str(time.time()))
-            )
+            pipe = self.redis_client.pipeline(transaction=False)
+            self.queue_activity(pipe)
+            self._execute_redis_command(pipe.execute)
         except Exception as e:
             logger.error(f"Error notifying owner of client activity: {e}")
 
@@ -206,8 +89,7 @@ class ClientManager:
 
         self._registered_clients.add(client_id)
 
-        # Use a function to get the client key
-        client_key = f"ts_proxy:channel:{self.channel_id}:clients:{client_id}"
+        client_key = self.client_key(client_id)
 
         # Prepare client data
         current_time = str(time.time())
@@ -264,8 +146,6 @@ class ClientManager:
                 total_clients = self.get_total_client_count()
                 logger.info(f"New client connected: {client_id} (local: {len(self.clients)}, total: {total_clients})")
 
-                self.last_heartbeat_time[client_id] = time.time()
-
                 return len(self.clients)
 
         except Exception as e:
@@ -278,9 +158,6 @@ class ClientManager:
             if client_id in self.clients:
                 self.clients.remove(client_id)
 
-            if client_id in self.last_heartbeat_time:
-                del self.last_heartbeat_time[client_id]
-
             self.last_active_time = time.time()
 
             if self.redis_client:
@@ -288,8 +165,7 @@ class ClientManager:
                 self.redis_client.srem(self.client_set_key, client_id)
 
                 # STANDARDIZED KEY: Delete individual client keys
-                client_key = f"ts_proxy:channel:{self.channel_id}:clients:{client_id}"
-                self.redis_client.delete(client_key)
+                self.redis_client.delete(self.client_key(client_id))
 
                 # Check if this was the last client
                 remaining = self.redis_client.scard(self.client_set_key) or 0
@@ -342,12 +218,13 @@ class ClientManager:
 
         try:
             # Refresh TTL for all clients belonging to this worker
-            for client_id in self.clients:
-                # STANDARDIZED: Use channel namespace for client keys
-                client_key = f"ts_proxy:channel:{self.channel_id}:clients:{client_id}"
-                self.redis_client.expire(client_key, self.client_ttl)
+            pipe = self.redis_client.pipeline(transaction=False)
+            with self.lock:
+                for client_id in self.clients:
+                    pipe.expire(self.client_key(client_id), self.client_ttl)
 
             # Refresh TTL on the set itself
-            self.redis_client.expire(self.client_set_key, self.client_ttl)
+            pipe.expire(self.client_set_key, self.client_ttl)
+            pipe.execute()
         except Exception as e:
             logger.error(f"Error refreshing client TTL: {e}")
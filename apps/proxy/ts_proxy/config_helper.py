@@ -86,6 +86,11 @@ class ConfigHelper:
         """Get extra time (in seconds) to allow for stream switching before disconnecting clients"""
         return ConfigHelper.get('FAILOVER_GRACE_PERIOD', 20)  # Default to 20 seconds
 
+    @staticmethod
+    def hot_standby_enabled():
+        """Whether to pre-connect an alternate stream when the active one degrades"""
+        return ConfigHelper.get('HOT_STANDBY_ENABLED', False)
+
     @staticmethod
     def buffering_timeout():
         """Get buffering timeout in seconds"""
@@ -44,6 +44,7 @@ class ChannelMetadataField:
     STATE = "state"
     OWNER = "owner"
     STREAM_ID = "stream_id"
+    SHARED_WITH = "shared_with"  # Channel whose stream this channel is reading
 
     # Profile fields
     STREAM_PROFILE = "stream_profile"
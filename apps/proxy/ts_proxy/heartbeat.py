@@ -0,0 +1,150 @@
+"""
+Client heartbeats for all channels of a worker.
+
+Every ClientManager registers with the worker's HeartbeatScheduler instead of
+running its own heartbeat thread. Each tick the scheduler refreshes the Redis
+records of all local clients of all channels in one pipeline: a script per
+channel drops clients whose record is gone or stale (ghosts) and refreshes the
+others, and a second pipeline tells the channel owners which channels still
+have clients here. Ticks are jittered so workers don't heartbeat in lockstep.
+"""
+
+import random
+import threading
+import time
+import weakref
+
+import gevent
+
+from apps.proxy.config import TSConfig as Config
+from .config_helper import ConfigHelper
+from .utils import get_logger
+
+logger = get_logger()
+
+# KEYS[1]: channel client set, KEYS[2..]: client records.
+# ARGV: now, client ttl, ghost timeout, then the client ids of KEYS[2..].
+# Refreshes live clients; never recreates a record that was deleted meanwhile.
+# Returns the ids of clients to drop (record gone or stale).
+HEARTBEAT_SCRIPT = """
+local now = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[2])
+local ghost_timeout = tonumber(ARGV[3])
+local dropped = {}
+local alive = 0
+
+for i = 2, #KEYS do
+    local client_id = ARGV[i + 2]
+    local last_active = redis.call('HGET', KEYS[i], 'last_active')
+    if not last_active or now - tonumber(last_active) > ghost_timeout then
+        table.insert(dropped, client_id)
+    else
+        redis.call('HSET', KEYS[i], 'last_active', ARGV[1])
+        redis.call('EXPIRE', KEYS[i], ttl)
+        redis.call('SADD', KEYS[1], client_id)
+        alive = alive + 1
+    end
+end
+
+if alive > 0 then
+    redis.call('EXPIRE', KEYS[1], ttl)
+end
+return dropped
+"""
+
+
+class HeartbeatScheduler:
+    """Sends the heartbeats of every registered ClientManager from one thread."""
+
+    def __init__(self):
+        # Managers unregister when their channel is torn down (ClientManager.stop);
+        # weak so one that is missed can't be kept alive
+        self.managers = weakref.WeakSet()
+        self.lock = threading.Lock()
+        self.thread = None
+        self._scripts = {}
+
+    def register(self, manager):
+        with self.lock:
+            self.managers.add(manager)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.name = "ts-proxy-client-heartbeat"
+                self.thread.start()
+                logger.debug("Started client heartbeat scheduler")
+
+    def unregister(self, manager):
+        with self.lock:
+            self.managers.discard(manager)
+
+    def _run(self):
+        interval = ConfigHelper.get('CLIENT_HEARTBEAT_INTERVAL', 10)
+        jitter = ConfigHelper.get('CLIENT_HEARTBEAT_JITTER', 0.1)
+
+        while True:
+            gevent.sleep(interval * random.uniform(1 - jitter, 1 + jitter))
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Error in client heartbeat scheduler: {e}")
+
+    def _script(self, redis_client):
+        script = self._scripts.get(id(redis_client))
+        if script is None:
+            script = self._scripts[id(redis_client)] = redis_client.register_script(HEARTBEAT_SCRIPT)
+        return script
+
+    def tick(self):
+        """Heartbeat all local clients, dropping ghosts."""
+        with self.lock:
+            managers = list(self.managers)
+
+        # Managers of one process share the proxy server's Redis client; group just in case
+        batches = {}
+        for manager in managers:
+            with manager.lock:
+                clients = list(manager.clients)
+            if clients and manager.redis_client:
+                batches.setdefault(id(manager.redis_client), []).append((manager, clients))
+
+        for batch in batches.values():
+            self._heartbeat(batch)
+
+    def _heartbeat(self, batch):
+        redis_client = batch[0][0].redis_client
+        script = self._script(redis_client)
+        now = time.time()
+        ghost_timeout = ConfigHelper.get('CLIENT_HEARTBEAT_INTERVAL', 10) * getattr(Config, 'GHOST_CLIENT_MULTIPLIER', 5.0)
+
+        pipe = redis_client.pipeline(transaction=False)
+        for manager, clients in batch:
+            keys = [manager.client_set_key] + [manager.client_key(client_id) for client_id in clients]
+            script(keys=keys, args=[str(now), manager.client_ttl, ghost_timeout] + clients, client=pipe)
+        # One channel's failure (e.g. a key of the wrong type) mustn't stop the others' heartbeats
+        results = pipe.execute(raise_on_error=False)
+
+        active = []
+        for (manager, clients), dropped in zip(batch, results):
+            if isinstance(dropped, Exception):
+                logger.warning(f"Client heartbeat failed for channel {manager.channel_id}: {dropped}")
+                continue
+            for client_id in dropped:
+                client_id = client_id.decode('utf-8') if isinstance(client_id, bytes) else client_id
+                logger.debug(f"Client {client_id} of channel {manager.channel_id} is gone or stale, removing as ghost")
+                manager.remove_client(client_id)
+            if dropped:
+                logger.info(f"Removed {len(dropped)} ghost clients from channel {manager.channel_id}")
+            if len(dropped) < len(clients):
+                active.append(manager)
+
+        # Tell the owners which channels still have clients on this worker
+        if active:
+            pipe = redis_client.pipeline(transaction=False)
+            for manager in active:
+                manager.queue_activity(pipe)
+            for result in pipe.execute(raise_on_error=False):
+                if isinstance(result, Exception):
+                    logger.warning(f"Error notifying channel owners of client activity: {result}")
+
+
+scheduler = HeartbeatScheduler()
@@ -74,6 +74,11 @@ class RedisKeys:
         """Key for stream switch status"""
         return f"ts_proxy:channel:{channel_id}:switch_status"
 
+    @staticmethod
+    def channel_registry():
+        """Sorted set of active channel IDs, scored by last refresh time"""
+        return "ts_proxy:channels"
+
     @staticmethod
     def worker_heartbeat(worker_id):
         """Key for worker heartbeat"""
@@ -25,12 +25,30 @@ from .stream_manager import StreamManager
 from .stream_buffer import StreamBuffer
 from .client_manager import ClientManager
 from .redis_keys import RedisKeys
-from .constants import ChannelState, EventType, StreamType
+from .constants import ChannelState, ChannelMetadataField, EventType, StreamType
 from .config_helper import ConfigHelper
+from .stream_health import probe_streams
+from .url_utils import get_alternate_streams
+from .stream_plan import get_stream_plan
 from .utils import get_logger
 
 logger = get_logger()
 
+# KEYS: channel owner keys. ARGV: worker id, lease ttl.
+# Extends the lease of the channels owned by the worker and returns every
+# channel's owner ('' when it has none).
+RENEW_OWNERSHIP_SCRIPT = """
+local owners = {}
+for i, key in ipairs(KEYS) do
+    local owner = redis.call('GET', key)
+    if owner == ARGV[1] then
+        redis.call('EXPIRE', key, ARGV[2])
+    end
+    owners[i] = owner or ''
+end
+return owners
+"""
+
 class ProxyServer:
     """Manages TS proxy server instance with worker coordination"""
     _instance = None
@@ -53,6 +71,11 @@ class ProxyServer:
         self.stream_buffers = {}
         self.client_managers = {}
 
+        # Shared sessions: (stream id, stream profile) -> channel running the stream,
+        # and channel reading a shared stream -> channel running it
+        self.shared_sessions = {}
+        self.shared_session_readers = {}
+
         # Generate a unique worker ID
         import socket
         import os
@@ -81,9 +104,13 @@ class ProxyServer:
             self.redis_client = None
 
         # Start cleanup thread
+        self._renew_ownership_script = None
         self.cleanup_interval = getattr(Config, 'CLEANUP_INTERVAL', 60)
         self._start_cleanup_thread()
 
+        # Keep health scores of watched channels' alternates fresh
+        self._start_stream_prober()
+
         # Start event listener for Redis pubsub messages
         self._start_event_listener()
 
@@ -461,8 +488,14 @@ class ProxyServer:
             logger.error(f"Error extending ownership: {e}")
             return False
 
-    def initialize_channel(self, url, channel_id, user_agent=None, transcode=False, stream_id=None):
-        """Initialize a channel without redundant active key"""
+    def initialize_channel(self, url, channel_id, user_agent=None, transcode=False, stream_id=None, stream_profile=None, shared_with=None):
+        """
+        Initialize a channel without redundant active key.
+
+        With shared_with (see find_shared_source) the channel reads from the stream
+        that channel runs in this worker instead of opening its own upstream
+        connection / ffmpeg process.
+        """
         try:
             # IMPROVED: First check if channel is already being initialized by another process
             if self.redis_client:
@@ -496,7 +529,7 @@ class ProxyServer:
 
             # Store in local tracking
             self.stream_buffers[channel_id] = buffer
-            self.client_managers[channel_id] = client_manager
+            self._set_client_manager(channel_id, client_manager)
 
             # IMPROVED: Set initializing state in Redis BEFORE any other operations
             if self.redis_client:
@@ -556,7 +589,7 @@ class ProxyServer:
 
                 # Create client manager with channel_id and redis_client
                 client_manager = ClientManager(channel_id=channel_id, redis_client=self.redis_client, worker_id=self.worker_id)
-                self.client_managers[channel_id] = client_manager
+                self._set_client_manager(channel_id, client_manager)
 
                 return True
 
@@ -577,7 +610,7 @@ class ProxyServer:
 
                 # Create client manager with channel_id and redis_client
                 client_manager = ClientManager(channel_id=channel_id, redis_client=self.redis_client, worker_id=self.worker_id)
-                self.client_managers[channel_id] = client_manager
+                self._set_client_manager(channel_id, client_manager)
 
                 return True
 
@@ -614,6 +647,10 @@ class ProxyServer:
                 else:
                     logger.warning(f"Failed to set stream_id in Redis for channel {channel_id}")
 
+            # Read from the stream another channel runs in this worker, holding no slot of our own
+            if shared_with:
+                return self._attach_shared_reader(channel_id, shared_with, buffer)
+
             # Create stream buffer
             buffer = StreamBuffer(channel_id=channel_id, redis_client=self.redis_client)
             logger.debug(f"Created StreamBuffer for channel {channel_id}")
@@ -631,6 +668,8 @@ class ProxyServer:
             )
             logger.info(f"Created StreamManager for channel {channel_id} with stream ID {channel_stream_id}")
             self.stream_managers[channel_id] = stream_manager
+            if channel_stream_id and stream_profile:
+                self.shared_sessions[self._session_key(channel_stream_id, stream_profile)] = channel_id
 
             # Create client manager with channel_id, redis_client AND worker_id
             client_manager = ClientManager(
@@ -638,7 +677,7 @@ class ProxyServer:
                 redis_client=self.redis_client,
                 worker_id=self.worker_id
             )
-            self.client_managers[channel_id] = client_manager
+            self._set_client_manager(channel_id, client_manager)
 
             # Start stream manager thread only for the owner
             thread = threading.Thread(target=stream_manager.run, daemon=True)
@@ -666,6 +705,100 @@ class ProxyServer:
             self.release_ownership(channel_id)
             return False
 
+    def _set_client_manager(self, channel_id, client_manager):
+        """Track a channel's client manager, stopping the one it replaces"""
+        previous = self.client_managers.get(channel_id)
+        self.client_managers[channel_id] = client_manager
+        if previous is not None and previous is not client_manager:
+            previous.stop()
+
+    @staticmethod
+    def _session_key(stream_id, stream_profile):
+        return (str(stream_id), str(stream_profile))
+
+    def _find_shared_session(self, session_key):
+        """Channel already running the stream of session_key in this worker, if any"""
+        leader_id = self.shared_sessions.get(session_key)
+        if not leader_id:
+            return None
+
+        # The session may have ended or switched to another stream since
+        manager = self.stream_managers.get(leader_id)
+        if (manager and manager.running and manager.connected and not manager.stopping
+                and str(manager.current_stream_id) == session_key[0]):
+            return leader_id
+
+        self.shared_sessions.pop(session_key, None)
+        return None
+
+    def find_shared_source(self, channel_id):
+        """
+        Stream info for reading a channel from a stream this worker already runs.
+
+        Checked before a stream is allocated: a channel sharing another channel's
+        stream never claims an M3U profile slot (nor a channel_stream key), so
+        releasing its stream is a no-op and only the leader gives the slot back.
+
+        Returns:
+            dict: like resolve_stream, plus shared_with (the leader channel), or
+            None if none of the channel's streams runs here with its stream profile
+        """
+        plan = get_stream_plan(channel_id)
+        if not plan or plan['redirect']:
+            return None
+
+        for candidate in plan['candidates']:
+            leader_id = self._find_shared_session(
+                self._session_key(candidate['stream_id'], plan['stream_profile_id'])
+            )
+            if leader_id and leader_id != channel_id:
+                manager = self.stream_managers[leader_id]
+                return {
+                    'url': manager.url,
+                    'user_agent': manager.user_agent,
+                    'transcode': plan['transcode'],
+                    'redirect': False,
+                    'stream_profile': plan['stream_profile_id'],
+                    'stream_id': manager.current_stream_id,
+                    # The M3U profile slot is the leader's
+                    'm3u_profile_id': None,
+                    'shared_with': leader_id,
+                }
+        return None
+
+    def _attach_shared_reader(self, channel_id, leader_id, buffer):
+        """Feed a channel from the stream another channel is already running"""
+        manager = self.stream_managers.get(leader_id)
+        if not manager or not manager.running or manager.stopping:
+            # Without a slot of its own the channel can't start a stream either
+            logger.warning(f"Channel {leader_id} stopped before channel {channel_id} could share its stream")
+            self.release_ownership(channel_id)
+            return False
+
+        manager.attach_reader(channel_id, buffer)
+        self.shared_session_readers[channel_id] = leader_id
+
+        # Ready once the leader has fed enough chunks (see StreamManager._set_reader_waiting_for_clients)
+        self.update_channel_state(channel_id, ChannelState.CONNECTING, {
+            ChannelMetadataField.SHARED_WITH: leader_id,
+            "init_time": str(time.time()),
+            "owner": self.worker_id
+        })
+        logger.info(f"Channel {channel_id} attached to the stream of channel {leader_id}")
+        return True
+
+    def _detach_shared_reader(self, channel_id):
+        """Stop feeding a channel from another channel's stream"""
+        leader_id = self.shared_session_readers.pop(channel_id, None)
+        manager = self.stream_managers.get(leader_id) if leader_id else None
+        if manager:
+            manager.detach_reader(channel_id)
+
+    def get_shared_reader_count(self, channel_id):
+        """Number of other channels reading this channel's stream"""
+        manager = self.stream_managers.get(channel_id)
+        return len(manager.shared_readers) if manager else 0
+
     def check_if_channel_exists(self, channel_id):
         """
         Check if a channel exists and is in a valid state.
@@ -782,11 +915,18 @@ class ProxyServer:
                 stop_key = RedisKeys.channel_stopping(channel_id)
                 self.redis_client.setex(stop_key, 10, "true")
 
+            # A channel reading another channel's stream just stops being fed
+            self._detach_shared_reader(channel_id)
+            shared_readers = []
+
             # Only stop the actual stream manager if we're the owner
             if self.am_i_owner(channel_id):
                 logger.info(f"This worker ({self.worker_id}) is the owner - closing provider connection")
                 if channel_id in self.stream_managers:
                     stream_manager = self.stream_managers[channel_id]
+                    shared_readers = list(stream_manager.shared_readers)
+                    for session_key in [k for k, v in self.shared_sessions.items() if v == channel_id]:
+                        del self.shared_sessions[session_key]
 
                     # Signal thread to stop and close resources
                     if hasattr(stream_manager, 'stop'):
@@ -846,7 +986,7 @@ class ProxyServer:
             # Clean up client manager - SAFE CHECK HERE TOO
             if channel_id in self.client_managers:
                 try:
-                    del self.client_managers[channel_id]
+                    self.client_managers.pop(channel_id).stop()
                     logger.info(f"Removed client manager for channel {channel_id}")
                 except KeyError:
                     logger.debug(f"Client manager for channel {channel_id} already removed")
@@ -854,6 +994,12 @@ class ProxyServer:
             # Clean up Redis keys
             self._clean_redis_keys(channel_id)
 
+            # Channels that were reading this stream have lost their source
+            for reader_id in shared_readers:
+                logger.info(f"Stopping channel {reader_id}, which was sharing the stream of channel {channel_id}")
+                self.shared_session_readers.pop(reader_id, None)
+                self.stop_channel(reader_id)
+
             return True
         except Exception as e:
             logger.error(f"Error stopping channel {channel_id}: {e}")
@@ -864,7 +1010,7 @@ class ProxyServer:
         channels_to_stop = []
 
         for channel_id, client_manager in self.client_managers.items():
-            if client_manager.get_client_count() == 0:
+            if client_manager.get_client_count() == 0 and not self.get_shared_reader_count(channel_id):
                 channels_to_stop.append(channel_id)
 
         for channel_id in channels_to_stop:
@@ -874,9 +1020,13 @@ class ProxyServer:
     def _cleanup_channel(self, channel_id: str) -> None:
         """Remove channel resources"""
         # Removed reference to non-existent fetch_threads collection
-        for collection in [self.stream_managers, self.stream_buffers, self.client_managers]:
+        for collection in [self.stream_managers, self.stream_buffers]:
             collection.pop(channel_id, None)
 
+        client_manager = self.client_managers.pop(channel_id, None)
+        if client_manager:
+            client_manager.stop()
+
     def shutdown(self) -> None:
         """Stop all channels and cleanup"""
         for channel_id in list(self.stream_managers.keys()):
@@ -887,154 +1037,7 @@ class ProxyServer:
         def cleanup_task():
             while True:
                 try:
-                    # Send worker heartbeat first
-                    if self.redis_client:
-                        worker_heartbeat_key = f"ts_proxy:worker:{self.worker_id}:heartbeat"
-                        self._execute_redis_command(
-                            lambda: self.redis_client.setex(worker_heartbeat_key, 30, str(time.time()))
-                        )
-
-                    # Refresh channel registry
-                    self.refresh_channel_registry()
-
-                    # Create a unified list of all channels we have locally
-                    all_local_channels = set(self.stream_managers.keys()) | set(self.client_managers.keys())
-
-                    # Single loop through all channels - process each exactly once
-                    for channel_id in list(all_local_channels):
-                        if self.am_i_owner(channel_id):
-                            # === OWNER CHANNEL HANDLING ===
-                            # Extend ownership lease
-                            self.extend_ownership(channel_id)
-
-                            # Get channel state from metadata hash
-                            channel_state = "unknown"
-                            if self.redis_client:
-                                metadata_key = RedisKeys.channel_metadata(channel_id)
-                                metadata = self.redis_client.hgetall(metadata_key)
-                                if metadata and b'state' in metadata:
-                                    channel_state = metadata[b'state'].decode('utf-8')
-
-                            # Check if channel has any clients left
-                            total_clients = 0
-                            if channel_id in self.client_managers:
-                                client_manager = self.client_managers[channel_id]
-                                total_clients = client_manager.get_total_client_count()
-
-                            # Log client count periodically
-                            if time.time() % 30 < 1:  # Every ~30 seconds
-                                logger.info(f"Channel {channel_id} has {total_clients} clients, state: {channel_state}")
-
-                            # If in connecting or waiting_for_clients state, check grace period
-                            if channel_state in [ChannelState.CONNECTING, ChannelState.WAITING_FOR_CLIENTS]:
-                                # Get connection ready time from metadata
-                                connection_ready_time = None
-                                if metadata and b'connection_ready_time' in metadata:
-                                    try:
-                                        connection_ready_time = float(metadata[b'connection_ready_time'].decode('utf-8'))
-                                    except (ValueError, TypeError):
-                                        pass
-
-                                # If still connecting, give it more time
-                                if channel_state == ChannelState.CONNECTING:
-                                    logger.debug(f"Channel {channel_id} still connecting - not checking for clients yet")
-                                    continue
-
-                                # If waiting for clients, check grace period
-                                if connection_ready_time:
-                                    grace_period = ConfigHelper.channel_init_grace_period()
-                                    time_since_ready = time.time() - connection_ready_time
-
-                                    # Add this debug log
-                                    logger.debug(f"GRACE PERIOD CHECK: Channel {channel_id} in {channel_state} state, "
-                                                 f"time_since_ready={time_since_ready:.1f}s, grace_period={grace_period}s, "
-                                                 f"total_clients={total_clients}")
-
-                                    if time_since_ready <= grace_period:
-                                        # Still within grace period
-                                        logger.debug(f"Channel {channel_id} in grace period - {time_since_ready:.1f}s of {grace_period}s elapsed")
-                                        continue
-                                    elif total_clients == 0:
-                                        # Grace period expired with no clients
-                                        logger.info(f"Grace period expired ({time_since_ready:.1f}s > {grace_period}s) with no clients - stopping channel {channel_id}")
-                                        self.stop_channel(channel_id)
-                                    else:
-                                        # Grace period expired but we have clients - mark channel as active
-                                        logger.info(f"Grace period expired with {total_clients} clients - marking channel {channel_id} as active")
-                                        old_state = "unknown"
-                                        if metadata and b'state' in metadata:
-                                            old_state = metadata[b'state'].decode('utf-8')
-                                        if self.update_channel_state(channel_id, ChannelState.ACTIVE, {
-                                            "grace_period_ended_at": str(time.time()),
-                                            "clients_at_activation": str(total_clients)
-                                        }):
-                                            logger.info(f"Channel {channel_id} activated with {total_clients} clients after grace period")
-                            # If active and no clients, start normal shutdown procedure
-                            elif channel_state not in [ChannelState.CONNECTING, ChannelState.WAITING_FOR_CLIENTS] and total_clients == 0:
-                                # Check if there's a pending no-clients timeout
-                                disconnect_key = RedisKeys.last_client_disconnect(channel_id)
-                                disconnect_time = None
-
-                                if self.redis_client:
-                                    disconnect_value = self.redis_client.get(disconnect_key)
-                                    if disconnect_value:
-                                        try:
-                                            disconnect_time = float(disconnect_value.decode('utf-8'))
-                                        except (ValueError, TypeError) as e:
-                                            logger.error(f"Invalid disconnect time for channel {channel_id}: {e}")
-
-                                current_time = time.time()
-
-                                if not disconnect_time:
-                                    # First time seeing zero clients, set timestamp
-                                    if self.redis_client:
-                                        self.redis_client.setex(disconnect_key, 60, str(current_time))
-                                    logger.warning(f"No clients detected for channel {channel_id}, starting shutdown timer")
-                                elif current_time - disconnect_time > ConfigHelper.channel_shutdown_delay():
-                                    # We've had no clients for the shutdown delay period
-                                    logger.warning(f"No clients for {current_time - disconnect_time:.1f}s, stopping channel {channel_id}")
-                                    self.stop_channel(channel_id)
-                                else:
-                                    # Still in shutdown delay period
-                                    logger.debug(f"Channel {channel_id} shutdown timer: "
-                                                f"{current_time - disconnect_time:.1f}s of "
-                                                f"{ConfigHelper.channel_shutdown_delay()}s elapsed")
-                            else:
-                                # There are clients or we're still connecting - clear any disconnect timestamp
-                                if self.redis_client:
-                                    self.redis_client.delete(f"ts_proxy:channel:{channel_id}:last_client_disconnect_time")
-
-                        else:
-                            # === NON-OWNER CHANNEL HANDLING ===
-                            # For channels we don't own, check if they've been stopped/cleaned up in Redis
-                            if self.redis_client:
-                                # Method 1: Check for stopping key
-                                stop_key = RedisKeys.channel_stopping(channel_id)
-                                if self.redis_client.exists(stop_key):
-                                    logger.debug(f"Non-owner cleanup: Channel {channel_id} has stopping flag in Redis, cleaning up local resources")
-                                    self._cleanup_local_resources(channel_id)
-                                    continue
-
-                                # Method 2: Check if owner still exists
-                                owner_key = RedisKeys.channel_owner(channel_id)
-                                if not self.redis_client.exists(owner_key):
-                                    logger.debug(f"Non-owner cleanup: Channel {channel_id} has no owner in Redis, cleaning up local resources")
-                                    self._cleanup_local_resources(channel_id)
-                                    continue
-
-                                # Method 3: Check if metadata still exists
-                                metadata_key = RedisKeys.channel_metadata(channel_id)
-                                if not self.redis_client.exists(metadata_key):
-                                    logger.debug(f"Non-owner cleanup: Channel {channel_id} has no metadata in Redis, cleaning up local resources")
-                                    self._cleanup_local_resources(channel_id)
-                                    continue
-
-                            # Check for local client count - if zero, clean up our local resources
-                            if self.client_managers[channel_id].get_client_count() == 0:
-                                # We're not the owner, and we have no local clients - clean up our resources
-                                logger.debug(f"Non-owner cleanup: Channel {channel_id} has no local clients, cleaning up local resources")
-                                self._cleanup_local_resources(channel_id)
-
+                    self.run_maintenance()
                 except Exception as e:
                     logger.error(f"Error in cleanup thread: {e}", exc_info=True)
 
@@ -1045,6 +1048,258 @@ class ProxyServer:
         thread.start()
         logger.info(f"Started TS proxy cleanup thread (interval: {ConfigHelper.cleanup_check_interval()}s)")
 
+    def run_maintenance(self):
+        """
+        One maintenance tick: worker heartbeat, ownership renewal and the
+        lifecycle checks of every local channel.
+
+        All Redis reads and renewals of a tick go out in one pipeline, and the
+        resulting timer updates in a second one, so the round trips per tick
+        don't grow with the number of channels.
+        """
+        # Create a unified list of all channels we have locally
+        channel_ids = list(set(self.stream_managers.keys()) | set(self.client_managers.keys()))
+        snapshot = self._fetch_maintenance_snapshot(channel_ids)
+        if snapshot is None:
+            # Without the channels' state every channel would look unowned and get torn down
+            logger.warning("Unable to read channel state from Redis, skipping maintenance tick")
+            return
+
+        pipe = self.redis_client.pipeline(transaction=False)
+
+        # Single loop through all channels - process each exactly once
+        for channel_id in channel_ids:
+            state = snapshot.get(channel_id)
+            if state is None:
+                # Its reads failed; it gets checked again next tick
+                continue
+            try:
+                if state.get("owner") == self.worker_id:
+                    self._maintain_owned_channel(channel_id, state, pipe)
+                else:
+                    self._maintain_remote_channel(channel_id, state)
+            except Exception as e:
+                logger.error(f"Error maintaining channel {channel_id}: {e}", exc_info=True)
+
+        if len(pipe):
+            self._execute_redis_command(pipe.execute)
+
+    def _fetch_maintenance_snapshot(self, channel_ids):
+        """
+        Send the worker heartbeat, refresh the registry, renew ownership of our
+        channels and read the state of all local channels in one pipeline.
+
+        Returns:
+            dict: channel_id -> {owner, state, connection_ready_time, clients,
+                disconnect_time, stopping, has_metadata}, leaving out channels
+                whose reads failed; None if the state couldn't be read at all
+        """
+        if not self.redis_client:
+            return None
+
+        pipe = self.redis_client.pipeline(transaction=False)
+
+        # Send worker heartbeat first
+        worker_heartbeat_key = RedisKeys.worker_heartbeat(self.worker_id)
+        pipe.setex(worker_heartbeat_key, 30, str(time.time()))
+
+        # Refresh channel registry
+        self.refresh_channel_registry(pipe)
+
+        if channel_ids:
+            # Renews the lease of the channels we own, returns every channel's owner
+            self._ownership_script()(
+                keys=[RedisKeys.channel_owner(channel_id) for channel_id in channel_ids],
+                args=[self.worker_id, 30],
+                client=pipe,
+            )
+
+            for channel_id in channel_ids:
+                metadata_key = RedisKeys.channel_metadata(channel_id)
+                pipe.hmget(metadata_key, ChannelMetadataField.STATE, ChannelMetadataField.CONNECTION_READY_TIME)
+                pipe.scard(RedisKeys.clients(channel_id))
+                pipe.get(RedisKeys.last_client_disconnect(channel_id))
+                pipe.exists(RedisKeys.channel_stopping(channel_id))
+                pipe.exists(metadata_key)
+
+        results = self._execute_redis_command(pipe.execute, raise_on_error=False)
+        if not results:
+            return None
+        if not channel_ids:
+            return {}
+
+        # Skip the heartbeat and registry refresh results
+        results = results[len(results) - 1 - 5 * len(channel_ids):]
+        owners = results[0]
+        if isinstance(owners, Exception):
+            logger.error(f"Unable to renew channel ownership: {owners}")
+            return None
+
+        snapshot = {}
+        for i, channel_id in enumerate(channel_ids):
+            channel_results = results[1 + 5 * i:6 + 5 * i]
+            error = next((result for result in channel_results if isinstance(result, Exception)), None)
+            if error:
+                logger.error(f"Unable to read state of channel {channel_id}: {error}")
+                continue
+
+            metadata, clients, disconnect_value, stopping, has_metadata = channel_results
+            state, ready_time = metadata
+
+            connection_ready_time = disconnect_time = None
+            try:
+                connection_ready_time = float(ready_time.decode('utf-8')) if ready_time else None
+            except (ValueError, TypeError):
+                pass
+            try:
+                disconnect_time = float(disconnect_value.decode('utf-8')) if disconnect_value else None
+            except (ValueError, TypeError) as e:
+                logger.error(f"Invalid disconnect time for channel {channel_id}: {e}")
+
+            snapshot[channel_id] = {
+                "owner": owners[i].decode('utf-8') if owners[i] else None,
+                "state": state.decode('utf-8') if state else None,
+                "connection_ready_time": connection_ready_time,
+                "clients": clients or 0,
+                "disconnect_time": disconnect_time,
+                "stopping": bool(stopping),
+                "has_metadata": bool(has_metadata),
+            }
+        return snapshot
+
+    def _ownership_script(self):
+        if self._renew_ownership_script is None:
+            self._renew_ownership_script = self.redis_client.register_script(RENEW_OWNERSHIP_SCRIPT)
+        return self._renew_ownership_script
+
+    def _maintain_owned_channel(self, channel_id, state, pipe):
+        """Lifecycle checks of a channel this worker owns; timer updates are queued on pipe"""
+        channel_state = state.get("state") or "unknown"
+
+        # Check if channel has any clients left
+        total_clients = state.get("clients", 0) if channel_id in self.client_managers else 0
+
+        # Channels reading this stream keep it alive like clients do
+        total_clients += self.get_shared_reader_count(channel_id)
+
+        # Log client count periodically
+        if time.time() % 30 < 1:  # Every ~30 seconds
+            logger.info(f"Channel {channel_id} has {total_clients} clients, state: {channel_state}")
+
+        # If in connecting or waiting_for_clients state, check grace period
+        if channel_state in [ChannelState.CONNECTING, ChannelState.WAITING_FOR_CLIENTS]:
+            # If still connecting, give it more time
+            if channel_state == ChannelState.CONNECTING:
+                logger.debug(f"Channel {channel_id} still connecting - not checking for clients yet")
+                return
+
+            # If waiting for clients, check grace period
+            connection_ready_time = state.get("connection_ready_time")
+            if connection_ready_time:
+                grace_period = ConfigHelper.channel_init_grace_period()
+                time_since_ready = time.time() - connection_ready_time
+
+                logger.debug(f"GRACE PERIOD CHECK: Channel {channel_id} in {channel_state} state, "
+                             f"time_since_ready={time_since_ready:.1f}s, grace_period={grace_period}s, "
+                             f"total_clients={total_clients}")
+
+                if time_since_ready <= grace_period:
+                    # Still within grace period
+                    logger.debug(f"Channel {channel_id} in grace period - {time_since_ready:.1f}s of {grace_period}s elapsed")
+                elif total_clients == 0:
+                    # Grace period expired with no clients
+                    logger.info(f"Grace period expired ({time_since_ready:.1f}s > {grace_period}s) with no clients - stopping channel {channel_id}")
+                    self.stop_channel(channel_id)
+                else:
+                    # Grace period expired but we have clients - mark channel as active
+                    logger.info(f"Grace period expired with {total_clients} clients - marking channel {channel_id} as active")
+                    if self.update_channel_state(channel_id, ChannelState.ACTIVE, {
+                        "grace_period_ended_at": str(time.time()),
+                        "clients_at_activation": str(total_clients)
+                    }):
+                        logger.info(f"Channel {channel_id} activated with {total_clients} clients after grace period")
+        # If active and no clients, start normal shutdown procedure
+        elif total_clients == 0:
+            # Check if there's a pending no-clients timeout
+            disconnect_time = state.get("disconnect_time")
+            current_time = time.time()
+
+            if not disconnect_time:
+                # First time seeing zero clients, set timestamp
+                if pipe is not None:
+                    pipe.setex(RedisKeys.last_client_disconnect(channel_id), 60, str(current_time))
+                logger.warning(f"No clients detected for channel {channel_id}, starting shutdown timer")
+            elif current_time - disconnect_time > ConfigHelper.channel_shutdown_delay():
+                # We've had no clients for the shutdown delay period
+                logger.warning(f"No clients for {current_time - disconnect_time:.1f}s, stopping channel {channel_id}")
+                self.stop_channel(channel_id)
+            else:
+                # Still in shutdown delay period
+                logger.debug(f"Channel {channel_id} shutdown timer: "
+                            f"{current_time - disconnect_time:.1f}s of "
+                            f"{ConfigHelper.channel_shutdown_delay()}s elapsed")
+        elif state.get("disconnect_time") and pipe is not None:
+            # There are clients again - clear the disconnect timestamp
+            pipe.delete(RedisKeys.last_client_disconnect(channel_id))
+
+    def _maintain_remote_channel(self, channel_id, state):
+        """Clean up local resources of a channel owned by another worker once it's gone or unused here"""
+        # For channels we don't own, check if they've been stopped/cleaned up in Redis
+        if self.redis_client and state:
+            # Method 1: Check for stopping key
+            if state["stopping"]:
+                logger.debug(f"Non-owner cleanup: Channel {channel_id} has stopping flag in Redis, cleaning up local resources")
+                self._cleanup_local_resources(channel_id)
+                return
+
+            # Method 2: Check if owner still exists
+            if not state["owner"]:
+                logger.debug(f"Non-owner cleanup: Channel {channel_id} has no owner in Redis, cleaning up local resources")
+                self._cleanup_local_resources(channel_id)
+                return
+
+            # Method 3: Check if metadata still exists
+            if not state["has_metadata"]:
+                logger.debug(f"Non-owner cleanup: Channel {channel_id} has no metadata in Redis, cleaning up local resources")
+                self._cleanup_local_resources(channel_id)
+                return
+
+        # Check for local client count - if zero, clean up our local resources
+        client_manager = self.client_managers.get(channel_id)
+        if not client_manager or client_manager.get_client_count() == 0:
+            # We're not the owner, and we have no local clients - clean up our resources
+            logger.debug(f"Non-owner cleanup: Channel {channel_id} has no local clients, cleaning up local resources")
+            self._cleanup_local_resources(channel_id)
+
+    def _start_stream_prober(self):
+        """Start background thread probing the alternate streams of channels with viewers"""
+        def prober_task():
+            while True:
+                gevent.sleep(Config.STREAM_PROBE_INTERVAL)
+                try:
+                    self.probe_alternate_streams()
+                except Exception as e:
+                    logger.error(f"Error in stream prober: {e}", exc_info=True)
+
+        thread = threading.Thread(target=prober_task, daemon=True)
+        thread.name = "ts-proxy-stream-prober"
+        thread.start()
+
+    def probe_alternate_streams(self):
+        """Probe the alternates of the channels this worker streams and that have clients"""
+        for channel_id, stream_manager in list(self.stream_managers.items()):
+            client_manager = self.client_managers.get(channel_id)
+            if not client_manager or not client_manager.get_total_client_count():
+                continue
+            if not self.am_i_owner(channel_id):
+                continue
+
+            alternates = get_alternate_streams(channel_id, stream_manager.current_stream_id)
+            if alternates:
+                responsive = probe_streams(alternates)
+                logger.debug(f"Probed {len(alternates)} alternate stream(s) of channel {channel_id}, "
+                             f"{len(responsive)} responded")
+
     def _check_orphaned_channels(self):
         """Check for orphaned channels in Redis (owner worker crashed)"""
         if not self.redis_client:
@@ -1098,6 +1353,8 @@ class ProxyServer:
             return 0
 
         try:
+            self.redis_client.zrem(RedisKeys.channel_registry(), channel_id)
+
             # Define key patterns to scan for
             patterns = [
                 f"ts_proxy:channel:{channel_id}:*",  # All channel keys
@@ -1125,20 +1382,30 @@ class ProxyServer:
             logger.error(f"Error cleaning Redis keys for channel {channel_id}: {e}")
             return 0
 
-    def refresh_channel_registry(self):
-        """Refresh TTL for active channels using standard keys"""
+    def refresh_channel_registry(self, pipe=None):
+        """Refresh TTL for active channels using standard keys (queued on pipe if given)"""
         if not self.redis_client:
             return
 
+        target = pipe if pipe is not None else self.redis_client.pipeline(transaction=False)
+
         # Refresh registry entries for channels we own
-        for channel_id in list(self.stream_buffers.keys()):
+        now = time.time()
+        channel_ids = list(self.stream_buffers.keys())
+        for channel_id in channel_ids:
             # Use standard key pattern
             metadata_key = RedisKeys.channel_metadata(channel_id)
 
-            # Update activity timestamp in metadata only
-            self.redis_client.hset(metadata_key, "last_active", str(time.time()))
-            self.redis_client.expire(metadata_key, 30)  # Reset TTL on metadata hash
-            logger.debug(f"Refreshed metadata TTL for channel {channel_id}")
+            # Update activity timestamp in metadata
+            target.hset(metadata_key, "last_active", str(now))
+            target.expire(metadata_key, 30)  # Reset TTL on metadata hash
+
+        # Index of active channels, read by the stats instead of scanning for metadata keys
+        if channel_ids:
+            target.zadd(RedisKeys.channel_registry(), {channel_id: now for channel_id in channel_ids})
+
+        if pipe is None:
+            target.execute()
 
     def update_channel_state(self, channel_id, new_state, additional_fields=None):
         """Update channel state with proper history tracking and logging"""
@@ -1194,7 +1461,7 @@ class ProxyServer:
                 logger.info(f"Non-owner cleanup: Removed stream buffer for channel {channel_id}")
 
             if channel_id in self.client_managers:
-                del self.client_managers[channel_id]
+                self.client_managers.pop(channel_id).stop()
                 logger.info(f"Non-owner cleanup: Removed client manager for channel {channel_id}")
 
             return True
@@ -21,7 +21,7 @@ class ChannelService:
     """Service class for channel operations"""
 
     @staticmethod
-    def initialize_channel(channel_id, stream_url, user_agent, transcode=False, stream_profile_value=None, stream_id=None, m3u_profile_id=None):
+    def initialize_channel(channel_id, stream_url, user_agent, transcode=False, stream_profile_value=None, stream_id=None, m3u_profile_id=None, shared_with=None):
         """
         Initialize a channel with the given parameters.
 
@@ -33,6 +33,7 @@ class ChannelService:
             stream_profile_value: Stream profile value to store in metadata
             stream_id: ID of the stream being used
             m3u_profile_id: ID of the M3U profile being used
+            shared_with: Channel whose stream to read instead of starting one (see ProxyServer.find_shared_source)
 
         Returns:
             bool: Success status
@@ -64,7 +65,7 @@ class ChannelService:
                 logger.error(f"Failed to set stream_id {stream_id} in Redis before initialization")
 
         # Now proceed with channel initialization
-        success = proxy_server.initialize_channel(stream_url, channel_id, user_agent, transcode, stream_id)
+        success = proxy_server.initialize_channel(stream_url, channel_id, user_agent, transcode, stream_id, stream_profile_value, shared_with)
 
         # Store additional metadata if initialization was successful
         if success and proxy_server.redis_client:
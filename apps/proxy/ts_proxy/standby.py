@@ -0,0 +1,228 @@
+"""
+Hot standby streams for fast failover.
+
+While a channel's active stream is degraded, the StreamManager opens the next
+alternate stream ahead of time: it claims a connection slot on the stream's M3U
+profile, connects (or starts ffmpeg) and waits for the first data. If the
+active stream then fails, the StreamManager adopts the standby's connection
+and keeps feeding the same buffer, instead of looking up, allocating and
+connecting to an alternate only after the failure.
+
+While a standby waits, its output (the HTTP response, or ffmpeg's pipes) is
+drained so the provider doesn't stall or drop it and ffmpeg never blocks on a
+full pipe; only the latest chunk is kept, so failover starts from live data.
+"""
+
+import select
+import subprocess
+import threading
+import time
+
+import requests
+
+from apps.channels.models import reserve_profile_slot, release_profile_slot
+from apps.proxy.config import TSConfig as Config
+from .constants import TS_PACKET_SIZE, TS_SYNC_BYTE
+from .utils import get_logger
+
+logger = get_logger()
+
+
+def align_to_packet(data):
+    """Drop leading bytes up to the first TS sync byte that starts a run of packets."""
+    for offset in range(min(len(data), TS_PACKET_SIZE)):
+        if data[offset] == TS_SYNC_BYTE and (
+            offset + TS_PACKET_SIZE >= len(data) or data[offset + TS_PACKET_SIZE] == TS_SYNC_BYTE
+        ):
+            return data[offset:]
+    return data
+
+
+class StandbyStream:
+    """A pre-connected alternate stream, held ready to replace a failing one."""
+
+    def __init__(self, channel_id, alternate, stream_info):
+        self.channel_id = channel_id
+        self.stream_id = alternate['stream_id']
+        self.profile_id = alternate['profile_id']
+        self.max_streams = alternate.get('max_streams', 0)
+        self.url = stream_info['url']
+        self.user_agent = stream_info['user_agent']
+        self.stream_profile = stream_info['stream_profile']
+
+        self.session = None
+        self.response = None
+        self.process = None
+        self.first_chunk = b""
+        self.slot_reserved = False
+        self.opened_at = None
+
+        # Drains the connection until the standby is taken over or closed
+        self._drain_thread = None
+        self._drain_lock = threading.Lock()
+        self._handed_over = threading.Event()
+        self.ended = False
+
+    def open(self, session, chunk_size, transcode_cmd=None):
+        """
+        Claim a profile slot, connect and read the first data.
+
+        Args:
+            session: requests session to connect with (HTTP streams)
+            chunk_size: Bytes to read for validation
+            transcode_cmd: ffmpeg command to start instead of connecting directly
+
+        Returns:
+            bool: True if the standby is connected and delivering data
+        """
+        if not reserve_profile_slot(self.profile_id, self.max_streams):
+            logger.info(f"No free connection on M3U profile {self.profile_id} for a standby of channel {self.channel_id}")
+            session.close()
+            return False
+        # Profiles without a limit hand out no slot, so there is none to give back
+        self.slot_reserved = bool(self.max_streams)
+
+        timeout = Config.HOT_STANDBY_CONNECT_TIMEOUT
+        try:
+            if transcode_cmd:
+                session.close()
+                self.process = subprocess.Popen(
+                    transcode_cmd,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    bufsize=0
+                )
+                # One-off wait for the first output; the stream itself is read without select
+                ready, _, _ = select.select([self.process.stdout], [], [], timeout)
+                if ready:
+                    self.first_chunk = self.process.stdout.read(chunk_size) or b""
+            else:
+                self.session = session
+                self.response = session.get(self.url, stream=True, timeout=(timeout, 60))
+                if self.response.status_code != 200:
+                    logger.info(f"Standby stream {self.stream_id} for channel {self.channel_id} returned HTTP {self.response.status_code}")
+                    self.close()
+                    return False
+                self.first_chunk = next(self.response.iter_content(chunk_size=chunk_size), b"")
+        except (requests.exceptions.RequestException, OSError, ValueError) as e:
+            logger.info(f"Standby stream {self.stream_id} for channel {self.channel_id} failed to connect: {e}")
+            self.close()
+            return False
+
+        self.first_chunk = align_to_packet(self.first_chunk)
+        if not self.first_chunk:
+            logger.info(f"Standby stream {self.stream_id} for channel {self.channel_id} sent no data within {timeout}s")
+            self.close()
+            return False
+
+        self.opened_at = time.time()
+        if self.process:
+            target, args = self._drain, (self.process, chunk_size)
+        else:
+            target, args = self._drain_response, (self.response.iter_content(chunk_size=chunk_size),)
+        self._drain_thread = threading.Thread(
+            target=target, args=args, daemon=True, name=f"standby-drain-{self.channel_id}"
+        )
+        self._drain_thread.start()
+
+        logger.info(f"Standby stream {self.stream_id} (M3U profile {self.profile_id}) ready for channel {self.channel_id}")
+        return True
+
+    def _drain(self, process, chunk_size):
+        """Read ffmpeg's stdout and stderr while the standby waits, keeping only the latest output."""
+        pipes = [process.stdout, process.stderr]
+        try:
+            while pipes and not self._handed_over.is_set() and process.poll() is None:
+                ready, _, _ = select.select(pipes, [], [], 1.0)
+                # Reads happen under the lock so none is in progress once the standby is taken over
+                with self._drain_lock:
+                    if self._handed_over.is_set():
+                        return
+                    for pipe in ready:
+                        data = pipe.read(chunk_size)
+                        if not data:
+                            pipes.remove(pipe)
+                        elif pipe is process.stdout:
+                            self.first_chunk = data
+            # ffmpeg exited (or closed its output) before the standby was needed
+            self.ended = not self._handed_over.is_set()
+        except (OSError, ValueError) as e:
+            logger.debug(f"Stopped draining standby stream {self.stream_id} for channel {self.channel_id}: {e}")
+            self.ended = True
+
+    def _drain_response(self, chunks):
+        """Read an HTTP standby while it waits, keeping only the latest chunk."""
+        try:
+            while not self._handed_over.is_set():
+                # Reads happen under the lock so none is in progress once the standby is taken over
+                with self._drain_lock:
+                    if self._handed_over.is_set():
+                        return
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        logger.info(f"Standby stream {self.stream_id} for channel {self.channel_id} ended")
+                        self.ended = True
+                        return
+                    if chunk:
+                        self.first_chunk = chunk
+        except (requests.exceptions.RequestException, OSError, ValueError) as e:
+            logger.debug(f"Stopped draining standby stream {self.stream_id} for channel {self.channel_id}: {e}")
+            self.ended = True
+
+    def take_over(self, timeout=2.0):
+        """
+        Stop draining and hand the connection over.
+
+        Returns:
+            bytes: The latest data read, starting at a packet boundary, or None if
+                the standby can't be used (its stream ended, or a read is stuck)
+        """
+        if not self._drain_lock.acquire(timeout=timeout):
+            self._handed_over.set()
+            return None
+        try:
+            self._handed_over.set()
+        finally:
+            self._drain_lock.release()
+
+        if self.ended:
+            return None
+        return align_to_packet(self.first_chunk)
+
+    def release_slot(self):
+        """Give back the reserved profile slot, e.g. once the channel's own allocation covers the stream."""
+        if self.slot_reserved:
+            self.slot_reserved = False
+            try:
+                release_profile_slot(self.profile_id)
+            except Exception as e:
+                logger.error(f"Error releasing standby slot on M3U profile {self.profile_id}: {e}")
+
+    def close(self):
+        """Close the standby connection and release its slot."""
+        # Not under the drain lock: closing the connection is what ends a blocked read
+        self._handed_over.set()
+
+        if self.response:
+            try:
+                self.response.close()
+            except Exception:
+                pass
+            self.response = None
+
+        if self.session:
+            try:
+                self.session.close()
+            except Exception:
+                pass
+            self.session = None
+
+        if self.process:
+            try:
+                self.process.kill()
+                self.process.wait(timeout=1.0)
+            except Exception:
+                pass
+            self.process = None
+
+        self.release_slot()
@@ -108,6 +108,10 @@ class StreamBuffer:
             logger.error(f"Error adding chunk to buffer: {e}")
             return False
 
+    def discard_partial_packet(self):
+        """Drop the incomplete packet left by the previous source, so a new source starts on a packet boundary"""
+        self._partial_packet = bytearray()
+
     def get_chunks(self, start_index=None):
         """Get chunks from the buffer with detailed logging"""
         try:
@@ -391,7 +391,8 @@ class StreamGenerator:
                         if self.channel_id in proxy_server.client_managers:
                             client_count = proxy_server.client_managers[self.channel_id].get_total_client_count()
                             # Only the last client or owner should release the stream
-                            if client_count <= 1 and proxy_server.am_i_owner(self.channel_id):
+                            if (client_count <= 1 and proxy_server.am_i_owner(self.channel_id)
+                                    and not proxy_server.get_shared_reader_count(self.channel_id)):
                                 from apps.channels.models import Channel
                                 try:
                                     # Get the channel by UUID
@@ -433,7 +434,7 @@ class StreamGenerator:
                 # After delay, check global client count
                 if self.channel_id in proxy_server.client_managers:
                     total = proxy_server.client_managers[self.channel_id].get_total_client_count()
-                    if total == 0:
+                    if total == 0 and not proxy_server.get_shared_reader_count(self.channel_id):
                         logger.info(f"Shutting down channel {self.channel_id} as no clients connected")
                         proxy_server.stop_channel(self.channel_id)
                     else:
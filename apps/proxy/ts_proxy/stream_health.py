@@ -0,0 +1,224 @@
+"""
+Stream health scores from concurrent probes.
+
+A probe opens a stream, reads its first bytes and records the latency, the HTTP
+status and whether the data looks like MPEG-TS. Each result is folded into a
+per-stream score between 0 (dead) and 1 (healthy) kept in Redis, which decays
+back towards NEUTRAL_SCORE as it ages, so an old failure doesn't bury a stream
+forever. Alternates are tried in score order, failover probes its candidates
+concurrently instead of one after another, and the proxy keeps the scores of
+watched channels' alternates fresh in the background.
+"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from apps.channels.models import reserve_profile_slot, release_profile_slot
+from apps.proxy.config import TSConfig as Config
+from apps.proxy.upstream import UpstreamSession
+from core.utils import RedisClient
+from .constants import TS_PACKET_SIZE, TS_SYNC_BYTE
+from .utils import get_logger
+
+logger = get_logger()
+
+# Score of streams that haven't been probed (recently)
+NEUTRAL_SCORE = 0.5
+# Weight of a new probe result against the stream's current score
+PROBE_WEIGHT = 0.5
+# Bytes read to check that a stream is delivering TS
+PROBE_READ_SIZE = TS_PACKET_SIZE * 10
+
+# KEYS[1]: stream health key.
+# ARGV: now, sample score, probe weight, neutral score, half life, ttl, then the
+# JSON of the entry's other fields. Decays the stored score like _decayed, folds
+# the sample in and stores the entry in one step, so concurrent probes of a
+# stream don't overwrite each other's results. Returns the new score (as a string).
+RECORD_PROBE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local neutral = tonumber(ARGV[4])
+local current = neutral
+local stored = redis.call('GET', KEYS[1])
+if stored then
+    local previous = cjson.decode(stored)
+    current = neutral + (previous.score - neutral) * 0.5 ^ ((now - previous.at) / tonumber(ARGV[5]))
+end
+
+local weight = tonumber(ARGV[3])
+local score = current * (1 - weight) + tonumber(ARGV[2]) * weight
+local entry = cjson.decode(ARGV[7])
+entry.score = math.floor(score * 10000 + 0.5) / 10000
+entry.at = now
+redis.call('SET', KEYS[1], cjson.encode(entry), 'EX', ARGV[6])
+return tostring(score)
+"""
+
+_scripts = {}
+
+
+def _health_key(stream_id):
+    return f"stream_health:{stream_id}"
+
+
+def is_ts_data(data):
+    """Whether data starts with (up to) two consecutive TS packets, allowing a short lead-in."""
+    for offset in range(min(len(data), TS_PACKET_SIZE)):
+        if data[offset] == TS_SYNC_BYTE:
+            next_packet = offset + TS_PACKET_SIZE
+            return next_packet >= len(data) or data[next_packet] == TS_SYNC_BYTE
+    return False
+
+
+def probe_stream(url, user_agent=None, timeout=None):
+    """
+    Open a stream and read its first bytes.
+
+    Returns:
+        dict: ok, status (HTTP status or None), latency (seconds to the first
+            bytes), ts_valid, final_url and message
+    """
+    timeout = timeout or Config.STREAM_PROBE_TIMEOUT
+    start = time.time()
+    result = {"ok": False, "status": None, "latency": None, "ts_valid": False, "final_url": url, "message": ""}
+
+    try:
+        with UpstreamSession(user_agent).get(
+            url,
+            stream=True,
+            timeout=(timeout, timeout),
+            allow_redirects=True,
+        ) as response:
+            result["status"] = response.status_code
+            result["final_url"] = response.url
+            if not 200 <= response.status_code < 300:
+                result["message"] = f"Invalid HTTP status: {response.status_code}"
+                return result
+
+            data = next(response.iter_content(chunk_size=PROBE_READ_SIZE), b"")
+            result["latency"] = time.time() - start
+            if not data:
+                result["message"] = "Empty response from server"
+                return result
+
+            result["ok"] = True
+            # HLS playlists and the like are still playable (through ffmpeg), they just don't score as well
+            result["ts_valid"] = is_ts_data(data)
+            result["message"] = f"Received {len(data)} bytes in {result['latency']:.2f}s"
+    except requests.exceptions.RequestException as e:
+        result["message"] = f"Request failed: {e}"
+
+    return result
+
+
+def _sample_score(result):
+    if not result["ok"]:
+        return 0.0
+    timeout = Config.STREAM_PROBE_TIMEOUT
+    speed = max(0.5, 1.0 - (result["latency"] or 0) / timeout)
+    return speed * (1.0 if result["ts_valid"] else 0.7)
+
+
+def _decayed(entry, now):
+    """A stored score, decayed towards NEUTRAL_SCORE by its age."""
+    weight = 0.5 ** ((now - entry["at"]) / Config.STREAM_HEALTH_HALF_LIFE)
+    return NEUTRAL_SCORE + (entry["score"] - NEUTRAL_SCORE) * weight
+
+
+def get_health_scores(stream_ids):
+    """Current scores of the given streams, as {stream_id: score}."""
+    stream_ids = list(stream_ids)
+    redis_client = RedisClient.get_client()
+    if not redis_client or not stream_ids:
+        return {stream_id: NEUTRAL_SCORE for stream_id in stream_ids}
+
+    now = time.time()
+    scores = {}
+    try:
+        entries = redis_client.mget([_health_key(stream_id) for stream_id in stream_ids])
+    except Exception as e:
+        logger.warning(f"Unable to read stream health scores: {e}")
+        entries = [None] * len(stream_ids)
+
+    for stream_id, entry in zip(stream_ids, entries):
+        scores[stream_id] = _decayed(json.loads(entry), now) if entry else NEUTRAL_SCORE
+    return scores
+
+
+def _record_probe_script(redis_client):
+    script = _scripts.get(id(redis_client))
+    if script is None:
+        script = _scripts[id(redis_client)] = redis_client.register_script(RECORD_PROBE_SCRIPT)
+    return script
+
+
+def record_probe(stream_id, result):
+    """Fold a probe result into a stream's score. Returns the new score."""
+    sample = _sample_score(result)
+    redis_client = RedisClient.get_client()
+    if redis_client:
+        fields = {
+            "latency": result["latency"],
+            "status": result["status"],
+            "ts_valid": result["ts_valid"],
+        }
+        try:
+            return float(_record_probe_script(redis_client)(
+                keys=[_health_key(stream_id)],
+                args=[
+                    time.time(), sample, PROBE_WEIGHT, NEUTRAL_SCORE,
+                    Config.STREAM_HEALTH_HALF_LIFE, Config.STREAM_HEALTH_TTL, json.dumps(fields),
+                ],
+            ))
+        except Exception as e:
+            logger.warning(f"Unable to store health score of stream {stream_id}: {e}")
+
+    return NEUTRAL_SCORE * (1 - PROBE_WEIGHT) + sample * PROBE_WEIGHT
+
+
+def rank_by_health(candidates):
+    """Candidates (dicts with a stream_id) sorted by score, keeping their order among equals."""
+    scores = get_health_scores({candidate["stream_id"] for candidate in candidates})
+    return sorted(candidates, key=lambda candidate: -scores[candidate["stream_id"]])
+
+
+def _probe_candidate(candidate):
+    # Don't push a profile past its connection limit just to probe it
+    max_streams = candidate.get("max_streams", 0)
+    if not reserve_profile_slot(candidate["profile_id"], max_streams):
+        return None
+
+    try:
+        result = probe_stream(candidate["url"], candidate.get("user_agent"))
+    finally:
+        if max_streams:
+            release_profile_slot(candidate["profile_id"])
+
+    record_probe(candidate["stream_id"], result)
+    return result
+
+
+def probe_streams(candidates, workers=None):
+    """
+    Probe candidates concurrently (at most STREAM_PROBE_WORKERS at a time) and record their scores.
+
+    Args:
+        candidates: Dicts with stream_id, profile_id, max_streams, url and user_agent,
+            as returned by get_alternate_streams
+
+    Returns:
+        list: (candidate, result) pairs of the candidates that responded, best first
+    """
+    if not candidates:
+        return []
+
+    workers = min(workers or Config.STREAM_PROBE_WORKERS, len(candidates))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_probe_candidate, candidates))
+
+    # Candidates are in preference order; sorting is stable
+    responded = [(candidate, result) for candidate, result in zip(candidates, results) if result and result["ok"]]
+    responded.sort(key=lambda pair: -_sample_score(pair[1]))
+    return responded
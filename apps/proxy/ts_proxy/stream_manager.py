@@ -3,7 +3,6 @@
 import threading
 import logging
 import time
-import socket
 import requests
 import subprocess
 import gevent
@@ -11,6 +10,7 @@ import re
 from typing import Optional, List
 from django.shortcuts import get_object_or_404
 from apps.proxy.config import TSConfig as Config
+from apps.proxy.upstream import UpstreamSession, set_read_timeout
 from apps.channels.models import Channel, Stream
 from apps.m3u.models import M3UAccount, M3UAccountProfile
 from core.models import UserAgent, CoreSettings
@@ -20,9 +20,17 @@ from .redis_keys import RedisKeys
 from .constants import ChannelState, EventType, StreamType, ChannelMetadataField, TS_PACKET_SIZE
 from .config_helper import ConfigHelper
 from .url_utils import get_alternate_streams, get_stream_info_for_switch, get_stream_object
+from .standby import StandbyStream
+from .stream_health import probe_streams, record_probe
 
 logger = get_logger()
 
+# ffmpeg stats, e.g. "frame= 1234 fps= 30 q=28.0 size=    2048kB time=00:00:41.33 bitrate= 406.1kbits/s speed=1.02x"
+FFMPEG_SPEED_RE = re.compile(r'speed=\s*([0-9.]+)x?')
+FFMPEG_FPS_RE = re.compile(r'fps=\s*([0-9.]+)')
+FFMPEG_BITRATE_RE = re.compile(r'bitrate=\s*([0-9.]+(?:\.[0-9]+)?)\s*([kmg]?)bits/s', re.IGNORECASE)
+STDERR_LINE_BREAK = re.compile(rb'[\r\n]')
+
 class StreamManager:
     """Manages a connection to a TS stream without using raw sockets"""
 
@@ -60,6 +68,22 @@ class StreamManager:
         self.healthy = True
         self.health_check_interval = ConfigHelper.get('HEALTH_CHECK_INTERVAL', 5)
         self.chunk_size = ConfigHelper.chunk_size()
+        # Reusable buffer for transcoder output, allocated on first read
+        self._read_buffer = None
+
+        # Buffers of other channels sharing this stream (see ProxyServer.initialize_channel).
+        # Replaced rather than mutated, so the read loop can iterate it without locking.
+        self.shared_readers = {}
+        self._shared_readers_lock = threading.Lock()
+        self._ready_readers = set()
+
+        # Hot standby (see standby.py), prepared on its own thread; swapped under _standby_lock
+        self.standby = None
+        self._standby_lock = threading.Lock()
+        self._standby_thread = None
+        self.ffmpeg_speed = None
+        self._last_standby_attempt = 0
+        self._last_degraded_time = 0
 
         # Add to your __init__ method
         self._buffer_check_timers = []
@@ -110,30 +134,11 @@ class StreamManager:
         # Add stderr reader thread property
         self.stderr_reader_thread = None
         self.ffmpeg_input_phase = True  # Track if we're still reading input info
+        self.last_stats_parse_time = 0
 
     def _create_session(self):
-        """Create and configure requests session with optimal settings"""
-        session = requests.Session()
-
-        # Configure session headers
-        session.headers.update({
-            'User-Agent': self.user_agent,
-            'Connection': 'keep-alive'
-        })
-
-        # Set up connection pooling for better performance
-        adapter = requests.adapters.HTTPAdapter(
-            pool_connections=1,     # Single connection for this stream
-            pool_maxsize=1,         # Max size of connection pool
-            max_retries=3,          # Auto-retry for failed requests
-            pool_block=False        # Don't block when pool is full
-        )
-
-        # Apply adapter to both HTTP and HTTPS
-        session.mount('http://', adapter)
-        session.mount('https://', adapter)
-
-        return session
+        """Handle on the shared upstream session (pooled keep-alive connections, cached DNS)"""
+        return UpstreamSession(self.user_agent)
 
     def _wait_for_existing_processes_to_close(self, timeout=5.0):
         """Wait for existing processes/connections to fully close before establishing new ones"""
@@ -256,6 +261,10 @@ class StreamManager:
                             self._process_stream_data()
                             # If we get here, the connection was closed/failed
 
+                            # Carry on with the hot standby right away if one is ready
+                            while self._promote_standby():
+                                self._process_stream_data()
+
                             # Reset stream switch attempts if the connection lasted longer than threshold
                             # This indicates we had a stable connection for a while before failing
                             connection_duration = time.time() - connection_start_time
@@ -302,6 +311,11 @@ class StreamManager:
 
                 # If URL failed and we're still running, try switching to another stream
                 if url_failed and self.running:
+                    if self.current_stream_id:
+                        record_probe(self.current_stream_id, {
+                            "ok": False, "status": None, "latency": None, "ts_valid": False
+                        })
+
                     logger.info(f"URL {self.url} failed after {self.retry_count} attempts, trying next stream for channel: {self.channel_id}")
 
                     # Try to switch to next stream
@@ -337,6 +351,8 @@ class StreamManager:
 
             self._buffer_check_timers.clear()
 
+            self._discard_standby()
+
             # Make sure transcode process is terminated
             if self.transcode_process_active:
                 logger.info(f"Ensuring transcode process is terminated in finally block for channel: {self.channel_id}")
@@ -375,6 +391,11 @@ class StreamManager:
                         # Also set stopping key to ensure clients disconnect
                         stop_key = RedisKeys.channel_stopping(self.channel_id)
                         self.buffer.redis_client.setex(stop_key, 60, "true")
+
+                        # Channels sharing this stream have lost their source as well
+                        for reader_id in self.shared_readers:
+                            self.buffer.redis_client.hset(RedisKeys.channel_metadata(reader_id), mapping=update_data)
+                            self.buffer.redis_client.setex(RedisKeys.channel_stopping(reader_id), 60, "true")
                 except Exception as e:
                     logger.error(f"Failed to update channel state in Redis: {e} for channel {self.channel_id}", exc_info=True)
 
@@ -400,20 +421,7 @@ class StreamManager:
                 logger.debug(f"Closing existing HTTP connections before establishing transcode connection for channel {self.channel_id}")
                 self._close_connection()
 
-            channel = get_stream_object(self.channel_id)
-
-            # Use FFmpeg specifically for HLS streams
-            if hasattr(self, 'force_ffmpeg') and self.force_ffmpeg:
-                from core.models import StreamProfile
-                try:
-                    stream_profile = StreamProfile.objects.get(name='ffmpeg', locked=True)
-                    logger.info("Using FFmpeg stream profile for HLS content")
-                except StreamProfile.DoesNotExist:
-                    # Fall back to channel's profile if FFmpeg not found
-                    stream_profile = channel.get_stream_profile()
-                    logger.warning(f"FFmpeg profile not found, using channel default profile for channel: {self.channel_id}")
-            else:
-                stream_profile = channel.get_stream_profile()
+            stream_profile = self._get_transcode_profile()
 
             # Build and start transcode command
             self.transcode_cmd = stream_profile.build_command(self.url, self.user_agent)
@@ -424,7 +432,7 @@ class StreamManager:
                 self.transcode_cmd,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,  # Capture stderr instead of discarding it
-                bufsize=188 * 64            # Buffer optimized for TS packets
+                bufsize=0                # Unbuffered: fetch_chunk reads straight into its own buffer
             )
 
             # Start a thread to read stderr
@@ -448,6 +456,23 @@ class StreamManager:
             self._close_socket()
             return False
 
+    def _get_transcode_profile(self):
+        """Stream profile used to build the transcode command"""
+        channel = get_stream_object(self.channel_id)
+
+        # Use FFmpeg specifically for HLS streams
+        if hasattr(self, 'force_ffmpeg') and self.force_ffmpeg:
+            from core.models import StreamProfile
+            try:
+                stream_profile = StreamProfile.objects.get(name='ffmpeg', locked=True)
+                logger.info("Using FFmpeg stream profile for HLS content")
+                return stream_profile
+            except StreamProfile.DoesNotExist:
+                # Fall back to channel's profile if FFmpeg not found
+                logger.warning(f"FFmpeg profile not found, using channel default profile for channel: {self.channel_id}")
+
+        return channel.get_stream_profile()
+
     def _start_stderr_reader(self):
         """Start a thread to read stderr from the transcode process"""
         if self.transcode_process and self.transcode_process.stderr:
@@ -459,103 +484,33 @@ class StreamManager:
             logger.debug(f"Started stderr reader thread for channel {self.channel_id}")
 
     def _read_stderr(self):
-        """Read and log ffmpeg stderr output with real-time stats parsing"""
+        """Read ffmpeg stderr in blocks, splitting it into lines on CR / LF"""
         try:
-            buffer = b""
-            last_stats_line = b""
+            stderr = self.transcode_process.stderr
+            pending = b""
 
-            # Read byte by byte for immediate detection
-            while self.transcode_process and self.transcode_process.stderr:
+            while True:
                 try:
-                    # Read one byte at a time for immediate processing
-                    byte = self.transcode_process.stderr.read(1)
-                    if not byte:
-                        break
+                    # The pipe is unbuffered: returns whatever is available (up to the read size) with a single read
+                    data = stderr.read(Config.STDERR_READ_SIZE)
+                except (OSError, ValueError) as e:
+                    logger.debug(f"Stderr of channel {self.channel_id} closed: {e}")
+                    break
+                if not data:
+                    break
 
-                    buffer += byte
-
-                    # Check for frame= at the start of buffer (new stats line)
-                    if buffer == b"frame=":
-                        # We detected the start of a stats line, read until we get a complete line
-                        # or hit a carriage return (which overwrites the previous stats)
-                        while True:
-                            next_byte = self.transcode_process.stderr.read(1)
-                            if not next_byte:
-                                break
-
-                            buffer += next_byte
-
-                            # Break on carriage return (stats overwrite) or newline
-                            if next_byte in (b'\r', b'\n'):
-                                break
-
-                            # Also break if we have enough data for a typical stats line
-                            if len(buffer) > 200:  # Typical stats line length
-                                break
-
-                        # Process the stats line immediately
-                        if buffer.strip():
-                            try:
-                                stats_text = buffer.decode('utf-8', errors='ignore').strip()
-                                if stats_text and "frame=" in stats_text:
-                                    self._parse_ffmpeg_stats(stats_text)
-                                    self._log_stderr_content(stats_text)
-                            except Exception as e:
-                                logger.debug(f"Error parsing immediate stats line: {e}")
-
-                        # Clear buffer after processing
-                        buffer = b""
-                        continue
-
-                    # Handle regular line breaks for non-stats content
-                    elif byte == b'\n':
-                        if buffer.strip():
-                            line_text = buffer.decode('utf-8', errors='ignore').strip()
-                            if line_text and not line_text.startswith("frame="):
-                                self._log_stderr_content(line_text)
-                        buffer = b""
-
-                    # Handle carriage returns (potential stats overwrite)
-                    elif byte == b'\r':
-                        # Check if this might be a stats line
-                        if b"frame=" in buffer:
-                            try:
-                                stats_text = buffer.decode('utf-8', errors='ignore').strip()
-                                if stats_text and "frame=" in stats_text:
-                                    self._parse_ffmpeg_stats(stats_text)
-                                    self._log_stderr_content(stats_text)
-                            except Exception as e:
-                                logger.debug(f"Error parsing stats on carriage return: {e}")
-                        elif buffer.strip():
-                            # Regular content with carriage return
-                            line_text = buffer.decode('utf-8', errors='ignore').strip()
-                            if line_text:
-                                self._log_stderr_content(line_text)
-                        buffer = b""
-
-                    # Prevent buffer from growing too large for non-stats content
-                    elif len(buffer) > 1024 and b"frame=" not in buffer:
-                        # Process whatever we have if it's not a stats line
-                        if buffer.strip():
-                            line_text = buffer.decode('utf-8', errors='ignore').strip()
-                            if line_text:
-                                self._log_stderr_content(line_text)
-                        buffer = b""
+                # ffmpeg rewrites its stats line with CR, everything else ends with LF
+                lines = STDERR_LINE_BREAK.split(pending + data)
+                pending = lines.pop()
+                if len(pending) > Config.STDERR_MAX_LINE:
+                    lines.append(pending)
+                    pending = b""
 
-                except Exception as e:
-                    logger.error(f"Error reading stderr byte: {e}")
-                    break
+                self._process_stderr_lines(lines)
 
             # Process any remaining buffer content
-            if buffer.strip():
-                try:
-                    remaining_text = buffer.decode('utf-8', errors='ignore').strip()
-                    if remaining_text:
-                        if "frame=" in remaining_text:
-                            self._parse_ffmpeg_stats(remaining_text)
-                        self._log_stderr_content(remaining_text)
-                except Exception as e:
-                    logger.debug(f"Error processing remaining buffer: {e}")
+            if pending:
+                self._process_stderr_lines([pending], force_stats=True)
 
         except Exception as e:
             # Catch any other exceptions in the thread to prevent crashes
@@ -564,6 +519,33 @@ class StreamManager:
             except:
                 pass
 
+    def _process_stderr_lines(self, lines, force_stats=False):
+        """Log stderr lines; of the stats lines in a block only the latest is parsed."""
+        stats_line = None
+        for raw_line in lines:
+            line = raw_line.decode('utf-8', errors='ignore').strip()
+            if not line:
+                continue
+            if "frame=" in line:
+                stats_line = line
+            else:
+                self._log_stderr_content(line)
+
+        if stats_line is None:
+            return
+
+        # Stats arrive several times a second; parsing them once per interval is plenty
+        now = time.monotonic()
+        if not force_stats and now - self.last_stats_parse_time < Config.FFMPEG_STATS_INTERVAL:
+            return
+        self.last_stats_parse_time = now
+
+        try:
+            self._parse_ffmpeg_stats(stats_line)
+            self._log_stderr_content(stats_line)
+        except Exception as e:
+            logger.debug(f"Error parsing stats line: {e}")
+
     def _log_stderr_content(self, content):
         """Log stderr content from FFmpeg with appropriate log levels"""
         try:
@@ -620,15 +602,16 @@ class StreamManager:
             # frame= 1234 fps= 30 q=28.0 size=    2048kB time=00:00:41.33 bitrate= 406.1kbits/s speed=1.02x
 
             # Extract speed (e.g., "speed=1.02x")
-            speed_match = re.search(r'speed=\s*([0-9.]+)x?', stats_line)
+            speed_match = FFMPEG_SPEED_RE.search(stats_line)
             ffmpeg_speed = float(speed_match.group(1)) if speed_match else None
+            self.ffmpeg_speed = ffmpeg_speed
 
             # Extract fps (e.g., "fps= 30")
-            fps_match = re.search(r'fps=\s*([0-9.]+)', stats_line)
+            fps_match = FFMPEG_FPS_RE.search(stats_line)
             ffmpeg_fps = float(fps_match.group(1)) if fps_match else None
 
             # Extract bitrate (e.g., "bitrate= 406.1kbits/s")
-            bitrate_match = re.search(r'bitrate=\s*([0-9.]+(?:\.[0-9]+)?)\s*([kmg]?)bits/s', stats_line, re.IGNORECASE)
+            bitrate_match = FFMPEG_BITRATE_RE.search(stats_line)
             ffmpeg_output_bitrate = None
             if bitrate_match:
                 bitrate_value = float(bitrate_match.group(1))
@@ -645,9 +628,6 @@ class StreamManager:
             actual_fps = None
             if ffmpeg_fps is not None and ffmpeg_speed is not None and ffmpeg_speed > 0:
                 actual_fps = ffmpeg_fps / ffmpeg_speed
-            # Store in Redis if we have valid data
-            if any(x is not None for x in [ffmpeg_speed, ffmpeg_fps, actual_fps, ffmpeg_output_bitrate]):
-                self._update_ffmpeg_stats_in_redis(ffmpeg_speed, ffmpeg_fps, actual_fps, ffmpeg_output_bitrate)
 
             # Fix the f-string formatting
             actual_fps_str = f"{actual_fps:.1f}" if actual_fps is not None else "N/A"
@@ -657,6 +637,7 @@ class StreamManager:
                         f"Actual FPS: {actual_fps_str}, "
                         f"Output Bitrate: {ffmpeg_output_bitrate_str} kbps")
             # If we have a valid speed, check for buffering
+            state = None
             if ffmpeg_speed is not None and ffmpeg_speed < self.buffering_speed:
                 if self.buffering:
                     # Buffering is still ongoing, check for how long
@@ -683,9 +664,7 @@ class StreamManager:
                 # Log buffering warning
                 logger.debug(f"FFmpeg speed on channel {self.channel_id} is below {self.buffering_speed} ({ffmpeg_speed}x) - buffering detected")
                 # Set channel state to buffering
-                if hasattr(self.buffer, 'redis_client') and self.buffer.redis_client:
-                    metadata_key = RedisKeys.channel_metadata(self.channel_id)
-                    self.buffer.redis_client.hset(metadata_key, ChannelMetadataField.STATE, ChannelState.BUFFERING)
+                state = ChannelState.BUFFERING
             elif ffmpeg_speed is not None and ffmpeg_speed >= self.buffering_speed:
                 # Speed is good, check if we were buffering
                 if self.buffering:
@@ -694,15 +673,17 @@ class StreamManager:
                     self.buffering = False
                     self.buffering_start_time = None
                     # Set channel state to active if speed is good
-                    if hasattr(self.buffer, 'redis_client') and self.buffer.redis_client:
-                        metadata_key = RedisKeys.channel_metadata(self.channel_id)
-                        self.buffer.redis_client.hset(metadata_key, ChannelMetadataField.STATE, ChannelState.ACTIVE)
+                    state = ChannelState.ACTIVE
+
+            # Store stats (and any state change) in Redis in one write
+            if state or any(x is not None for x in [ffmpeg_speed, ffmpeg_fps, actual_fps, ffmpeg_output_bitrate]):
+                self._update_ffmpeg_stats_in_redis(ffmpeg_speed, ffmpeg_fps, actual_fps, ffmpeg_output_bitrate, state)
 
         except Exception as e:
             logger.debug(f"Error parsing FFmpeg stats: {e}")
 
-    def _update_ffmpeg_stats_in_redis(self, speed, fps, actual_fps, output_bitrate):
-        """Update FFmpeg performance stats in Redis metadata"""
+    def _update_ffmpeg_stats_in_redis(self, speed, fps, actual_fps, output_bitrate, state=None):
+        """Update FFmpeg performance stats (and optionally the channel state) in Redis metadata"""
         try:
             if hasattr(self.buffer, 'redis_client') and self.buffer.redis_client:
                 metadata_key = RedisKeys.channel_metadata(self.channel_id)
@@ -722,6 +703,9 @@ class StreamManager:
                 if output_bitrate is not None:
                     update_data[ChannelMetadataField.FFMPEG_OUTPUT_BITRATE] = str(round(output_bitrate, 1))
 
+                if state is not None:
+                    update_data[ChannelMetadataField.STATE] = state
+
                 self.buffer.redis_client.hset(metadata_key, mapping=update_data)
 
         except Exception as e:
@@ -748,19 +732,15 @@ class StreamManager:
                 logger.debug(f"Closing existing transcode process before establishing HTTP connection for channel {self.channel_id}")
                 self._close_socket()
 
-            # Create new session for each connection attempt
             session = self._create_session()
             self.current_session = session
 
-            # Stream the URL with proper timeout handling
-            response = session.get(
-                self.url,
-                stream=True,
-                timeout=(10, 60)  # 10s connect timeout, 60s read timeout
-            )
+            # Connect / first byte timeouts from the upstream config
+            response = session.get(self.url, stream=True)
             self.current_response = response
 
             if response.status_code == 200:
+                set_read_timeout(response, Config.UPSTREAM_READ_TIMEOUT)
                 self.connected = True
                 self.healthy = True
                 logger.info(f"Successfully connected to stream source for channel {self.channel_id}")
@@ -835,17 +815,10 @@ class StreamManager:
                             chunk_size = len(chunk)
                             self._update_bytes_processed(chunk_size)
 
-                            # Add chunk to buffer with TS packet alignment
-                            success = self.buffer.add_chunk(chunk)
-
-                            if success:
+                            # Add chunk to buffer(s) with TS packet alignment
+                            if self._add_chunk(chunk):
                                 self.last_data_time = time.time()
                                 chunk_count += 1
-
-                                # Update last data timestamp in Redis
-                                if hasattr(self.buffer, 'redis_client') and self.buffer.redis_client:
-                                    last_data_key = RedisKeys.last_data(self.buffer.channel_id)
-                                    self.buffer.redis_client.set(last_data_key, str(time.time()), ex=60)
                 except (AttributeError, ConnectionError) as e:
                     if self.stop_requested or self.url_switching:
                         logger.debug(f"Expected connection error during shutdown/URL switch for channel {self.channel_id}: {e}")
@@ -926,6 +899,7 @@ class StreamManager:
 
         # Explicitly close socket/transcode resources
         self._close_socket()
+        self._discard_standby()
 
         # Set running to false to ensure thread exits
         self.running = False
@@ -1056,6 +1030,10 @@ class StreamManager:
 
                         consecutive_unhealthy_checks = 0 # Reset after setting flag
 
+                        # The transcode reader blocks until ffmpeg writes; wake it up so the flags are acted on
+                        if self.transcode and (self.needs_reconnect or self.needs_stream_switch):
+                            self._interrupt_transcode_read()
+
                 elif self.connected and not self.healthy:
                     # Auto-recover health when data resumes
                     logger.info(f"Stream health restored for channel {self.channel_id} - data resumed after {inactivity_duration:.1f}s")
@@ -1068,11 +1046,173 @@ class StreamManager:
                 if self.healthy:
                     consecutive_unhealthy_checks = 0
 
+                if ConfigHelper.hot_standby_enabled():
+                    self._check_standby(now, inactivity_duration)
+
             except Exception as e:
                 logger.error(f"Error in health monitor: {e}")
 
             gevent.sleep(self.health_check_interval)  # REPLACE time.sleep(self.health_check_interval)
 
+    def _check_standby(self, now, inactivity_duration):
+        """Open a standby while the stream is degraded, fail over to it once the stream stalls"""
+        degraded = self.connected and (
+            inactivity_duration > Config.HOT_STANDBY_STALL_TIME
+            or (self.transcode and self.ffmpeg_speed is not None and self.ffmpeg_speed < Config.HOT_STANDBY_MIN_SPEED)
+        )
+
+        if not degraded:
+            # Don't hold a second upstream connection for a stream that has recovered
+            if self.standby and now - self._last_degraded_time > Config.HOT_STANDBY_MAX_IDLE:
+                logger.info(f"Stream recovered, closing standby stream for channel {self.channel_id}")
+                self._discard_standby()
+            return
+
+        self._last_degraded_time = now
+        if self.standby is None:
+            preparing = self._standby_thread is not None and self._standby_thread.is_alive()
+            if not preparing and now - self._last_standby_attempt > Config.HOT_STANDBY_MAX_IDLE / 2:
+                self._last_standby_attempt = now
+                # Opening alternates blocks for up to HOT_STANDBY_CONNECT_TIMEOUT each; keep it off the health monitor
+                self._standby_thread = threading.Thread(target=self._prepare_standby, daemon=True)
+                self._standby_thread.name = f"standby-{self.channel_id}"
+                self._standby_thread.start()
+        elif inactivity_duration > getattr(Config, 'CONNECTION_TIMEOUT', 10) and not self.needs_stream_switch:
+            # Stalled with a standby ready: no need to wait for the usual consecutive checks
+            logger.warning(f"No data for {inactivity_duration:.1f}s, failing over to standby stream for channel {self.channel_id}")
+            self.needs_stream_switch = True
+            self._interrupt_read()
+
+    def _prepare_standby(self):
+        """Connect to the next alternate stream and keep it ready"""
+        alternates = [
+            alternate for alternate in get_alternate_streams(self.channel_id, self.current_stream_id)
+            if alternate['stream_id'] not in self.tried_stream_ids
+        ]
+
+        for alternate in alternates:
+            if not self.running or self.stop_requested:
+                return False
+
+            stream_info = get_stream_info_for_switch(self.channel_id, alternate['stream_id'])
+            if 'error' in stream_info or not stream_info.get('url'):
+                continue
+
+            session = self._create_session()
+            session.headers['User-Agent'] = stream_info['user_agent']
+            transcode_cmd = None
+            if self.transcode:
+                transcode_cmd = self._get_transcode_profile().build_command(stream_info['url'], stream_info['user_agent'])
+
+            standby = StandbyStream(self.channel_id, alternate, stream_info)
+            read_size = Config.TRANSCODE_READ_SIZE if self.transcode else self.chunk_size
+            if standby.open(session, read_size, transcode_cmd):
+                with self._standby_lock:
+                    # The channel may have stopped or recovered while connecting
+                    keep = self.running and not self.stop_requested and self.standby is None
+                    if keep:
+                        self.standby = standby
+                if not keep:
+                    standby.close()
+                return keep
+
+        logger.info(f"No standby stream available for channel {self.channel_id}")
+        return False
+
+    def _discard_standby(self):
+        """Close the standby stream, if any"""
+        with self._standby_lock:
+            standby, self.standby = self.standby, None
+        if standby:
+            standby.close()
+
+    def _interrupt_read(self):
+        """Make the blocked read of the active stream return so _process_stream_data exits"""
+        if self.transcode:
+            self._interrupt_transcode_read()
+        elif self.current_response:
+            try:
+                self.current_response.close()
+            except Exception as e:
+                logger.debug(f"Error closing response for channel {self.channel_id}: {e}")
+
+    def _promote_standby(self):
+        """
+        Replace the failed connection with the standby stream, splicing its data
+        into the buffer at a packet boundary.
+
+        Returns:
+            bool: True if the standby took over and should be read
+        """
+        with self._standby_lock:
+            standby = self.standby
+            if not standby or not self.running or self.stop_requested or self.url_switching:
+                return False
+            self.standby = None
+        first_chunk = standby.take_over()
+        if first_chunk is None:
+            logger.warning(f"Standby stream {standby.stream_id} for channel {self.channel_id} is no longer usable")
+            standby.close()
+            return False
+
+        logger.info(f"Failing over channel {self.channel_id} from stream {self.current_stream_id} to standby stream {standby.stream_id}")
+        self._close_socket()
+
+        # Move the channel's allocation to the standby's profile, then drop the standby's own slot
+        try:
+            channel = Channel.objects.get(uuid=self.channel_id)
+            channel.update_stream_profile(standby.profile_id)
+        except Exception as e:
+            logger.error(f"Error updating stream profile for channel {self.channel_id}: {e}")
+        standby.release_slot()
+
+        # Adopt the standby's connection
+        self.url = standby.url
+        self.user_agent = standby.user_agent
+        self.current_stream_id = standby.stream_id
+        self.tried_stream_ids.add(standby.stream_id)
+        if standby.process:
+            self.transcode_process = standby.process
+            self.socket = standby.process.stdout
+            self.transcode_process_active = True
+            self._start_stderr_reader()
+        else:
+            self.current_session = standby.session
+            self.current_response = standby.response
+        standby.process = standby.session = standby.response = None
+
+        # The failed source may have left half a packet behind
+        for buffer in (self.buffer, *self.shared_readers.values()):
+            buffer.discard_partial_packet()
+        self._update_bytes_processed(len(first_chunk))
+        self._add_chunk(first_chunk)
+
+        now = time.time()
+        self.connected = True
+        self.healthy = True
+        self.last_data_time = now
+        self.connection_start_time = now
+        self.needs_reconnect = False
+        self.needs_stream_switch = False
+        self.buffering = False
+        self.buffering_start_time = None
+        self.ffmpeg_speed = None
+
+        if hasattr(self.buffer, 'redis_client') and self.buffer.redis_client:
+            metadata_key = RedisKeys.channel_metadata(self.channel_id)
+            self.buffer.redis_client.hset(metadata_key, mapping={
+                ChannelMetadataField.URL: standby.url,
+                ChannelMetadataField.USER_AGENT: standby.user_agent,
+                ChannelMetadataField.STREAM_PROFILE: standby.stream_profile,
+                ChannelMetadataField.M3U_PROFILE: str(standby.profile_id),
+                ChannelMetadataField.STREAM_ID: str(standby.stream_id),
+                ChannelMetadataField.STREAM_SWITCH_TIME: str(now),
+                ChannelMetadataField.STREAM_SWITCH_REASON: "hot_standby_failover"
+            })
+
+        logger.info(f"Channel {self.channel_id} now streaming from standby stream {standby.stream_id}")
+        return True
+
     def _attempt_reconnect(self):
         """Attempt to reconnect to the current stream"""
         try:
@@ -1236,63 +1376,42 @@ class StreamManager:
         self._buffer_check_timers = []
 
     def fetch_chunk(self):
-        """Fetch data from socket with timeout handling"""
+        """
+        Read the transcoder's available output (up to TRANSCODE_READ_SIZE bytes) into the buffer.
+
+        The read blocks this stream's thread until ffmpeg writes something; there's
+        no per-read timeout. A stalled transcoder is detected by the health monitor,
+        which kills the process so the read returns (see _interrupt_transcode_read).
+        """
         if not self.connected or not self.socket:
             return False
 
         try:
-            # Set timeout for chunk reads
-            chunk_timeout = ConfigHelper.get('CHUNK_TIMEOUT', 10)  # Default 10 seconds
-
-            try:
-                # Handle different socket types with timeout
-                if hasattr(self.socket, 'recv'):
-                    # Standard socket - set timeout
-                    original_timeout = self.socket.gettimeout()
-                    self.socket.settimeout(chunk_timeout)
-                    chunk = self.socket.recv(Config.CHUNK_SIZE)
-                    self.socket.settimeout(original_timeout)  # Restore original timeout
-                else:
-                    # SocketIO object (transcode process stdout) - use select for timeout
-                    import select
-                    ready, _, _ = select.select([self.socket], [], [], chunk_timeout)
-
-                    if not ready:
-                        # Timeout occurred
-                        logger.debug(f"Chunk read timeout ({chunk_timeout}s) for channel {self.channel_id}")
-                        return False
+            if self._read_buffer is None:
+                self._read_buffer = memoryview(bytearray(Config.TRANSCODE_READ_SIZE))
 
-                    chunk = self.socket.read(Config.CHUNK_SIZE)
+            # A single read(2) into the reusable buffer: returns whatever the pipe holds
+            size = self.socket.readinto(self._read_buffer)
 
-            except socket.timeout:
-                # Socket timeout occurred
-                logger.debug(f"Socket timeout ({chunk_timeout}s) for channel {self.channel_id}")
-                return False
-
-            if not chunk:
-                # Connection closed by server
+            if not size:
+                # Transcoder exited or closed its output
                 logger.warning(f"Server closed connection for channel {self.channel_id}")
                 self._close_socket()
                 self.connected = False
                 return False
 
             # Track chunk size before adding to buffer
-            chunk_size = len(chunk)
-            self._update_bytes_processed(chunk_size)
-
-            # Add directly to buffer without TS-specific processing
-            success = self.buffer.add_chunk(chunk)
+            self._update_bytes_processed(size)
 
-            # Update last data timestamp in Redis if successful
-            if success and hasattr(self.buffer, 'redis_client') and self.buffer.redis_client:
-                last_data_key = RedisKeys.last_data(self.buffer.channel_id)
-                self.buffer.redis_client.set(last_data_key, str(time.time()), ex=60)
+            # Add directly to buffer(s) without TS-specific processing
+            self._add_chunk(bytes(self._read_buffer[:size]))
 
             return True
 
-        except (socket.timeout, socket.error) as e:
-            # Socket error
-            logger.error(f"Socket error: {e}")
+        except (OSError, ValueError) as e:
+            # Pipe error, or the pipe was closed by another thread (stop / URL switch)
+            if not self.stop_requested and not self.url_switching:
+                logger.error(f"Transcode read error for channel {self.channel_id}: {e}")
             self._close_socket()
             self.connected = False
             return False
@@ -1301,6 +1420,74 @@ class StreamManager:
             logger.error(f"Error in fetch_chunk: {e}")
             return False
 
+    def _add_chunk(self, chunk):
+        """Add a chunk to the channel's buffer and to the buffers of channels sharing this stream"""
+        success = self.buffer.add_chunk(chunk)
+        if success:
+            self._touch_last_data(self.buffer)
+
+        for channel_id, buffer in self.shared_readers.items():
+            if buffer.add_chunk(chunk):
+                self._touch_last_data(buffer)
+                if channel_id not in self._ready_readers:
+                    self._set_reader_waiting_for_clients(channel_id, buffer)
+
+        return success
+
+    def _touch_last_data(self, buffer):
+        """Update the last data timestamp of a buffer's channel in Redis"""
+        if hasattr(buffer, 'redis_client') and buffer.redis_client:
+            last_data_key = RedisKeys.last_data(buffer.channel_id)
+            buffer.redis_client.set(last_data_key, str(time.time()), ex=60)
+
+    def attach_reader(self, channel_id, buffer):
+        """Feed another channel's buffer from this stream"""
+        with self._shared_readers_lock:
+            self._ready_readers.discard(channel_id)
+            self.shared_readers = {**self.shared_readers, channel_id: buffer}
+        logger.info(f"Channel {channel_id} is now sharing the stream of channel {self.channel_id} "
+                    f"({len(self.shared_readers)} shared reader(s))")
+
+    def detach_reader(self, channel_id):
+        """Stop feeding a channel attached with attach_reader"""
+        with self._shared_readers_lock:
+            if channel_id not in self.shared_readers:
+                return
+            readers = dict(self.shared_readers)
+            del readers[channel_id]
+            self.shared_readers = readers
+            self._ready_readers.discard(channel_id)
+        logger.info(f"Channel {channel_id} stopped sharing the stream of channel {self.channel_id} "
+                    f"({len(self.shared_readers)} shared reader(s) left)")
+
+    def _set_reader_waiting_for_clients(self, channel_id, buffer):
+        """Mark a shared reader's channel ready once its buffer has enough chunks, like _set_waiting_for_clients"""
+        if buffer.index < ConfigHelper.initial_behind_chunks() or not buffer.redis_client:
+            return
+
+        self._ready_readers.add(channel_id)
+        current_time = str(time.time())
+        try:
+            buffer.redis_client.hset(RedisKeys.channel_metadata(channel_id), mapping={
+                ChannelMetadataField.STATE: ChannelState.WAITING_FOR_CLIENTS,
+                ChannelMetadataField.CONNECTION_READY_TIME: current_time,
+                ChannelMetadataField.STATE_CHANGED_AT: current_time,
+                ChannelMetadataField.BUFFER_CHUNKS: str(buffer.index)
+            })
+            logger.info(f"Shared reader channel {channel_id} -> {ChannelState.WAITING_FOR_CLIENTS} with {buffer.index} buffer chunks")
+        except Exception as e:
+            logger.error(f"Error setting waiting for clients state for shared reader channel {channel_id}: {e}")
+
+    def _interrupt_transcode_read(self):
+        """Kill a stalled transcoder so the reader blocked in fetch_chunk sees EOF and recovers"""
+        process = self.transcode_process
+        if process and process.poll() is None:
+            logger.warning(f"Killing stalled transcode process for channel {self.channel_id}")
+            try:
+                process.kill()
+            except Exception as e:
+                logger.debug(f"Error killing stalled transcode process for channel {self.channel_id}: {e}")
+
     def _set_waiting_for_clients(self):
         """Set channel state to waiting for clients AFTER buffer has enough chunks"""
         try:
@@ -1426,8 +1613,13 @@ class StreamManager:
                     logger.warning(f"All {len(alternate_streams)} alternate streams have been tried for channel {self.channel_id}")
                 return False
 
-            # Get the next stream to try
-            next_stream = untried_streams[0]
+            # Probe the candidates concurrently and take the best one that responds,
+            # rather than finding the dead ones one connection timeout at a time
+            responsive = probe_streams(untried_streams) if len(untried_streams) > 1 else []
+            if responsive:
+                next_stream = responsive[0][0]
+            else:
+                next_stream = untried_streams[0]
             stream_id = next_stream['stream_id']
             profile_id = next_stream['profile_id']  # This is the M3U profile ID we need
 
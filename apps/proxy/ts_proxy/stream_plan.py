@@ -0,0 +1,253 @@
+"""
+Cached per-channel stream plans for tune requests.
+
+A plan holds everything needed to start a channel that doesn't depend on the
+current connection counts: the channel's stream profile and, in order of
+preference, every (stream, M3U profile) candidate with its rewritten URL and
+user agent. Plans are built with a handful of queries on first use, then kept
+in Redis (shared by every worker) and in a small per-process LRU. They are keyed
+on the CHANNELS_CACHE and STREAM_PLANS_CACHE generations, so any change to a
+channel, stream, M3U account/profile, user agent, stream profile or core
+setting invalidates them. Slots are still allocated atomically in Redis on
+every tune.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from uuid import UUID
+
+from apps.channels.models import (
+    Channel,
+    Stream,
+    allocate_channel_stream,
+    allocation_error_reason,
+    get_stream_candidates,
+    release_channel_stream,
+)
+from apps.m3u.models import M3UAccountProfile
+from core.utils import RedisClient, get_cache_generation, CHANNELS_CACHE, STREAM_PLANS_CACHE
+from .utils import get_logger
+
+logger = get_logger()
+
+# Plans only change through signals, the TTL just bounds what idle channels keep in Redis
+STREAM_PLAN_TTL = 60 * 60
+# Plans kept per process
+MAX_LOCAL_PLANS = 512
+
+_plans = OrderedDict()
+_plans_lock = threading.Lock()
+
+
+def _cache_key(generation, channel_uuid):
+    return f"stream_plan:{generation}:{channel_uuid}"
+
+
+def serialize_candidates(pairs):
+    """Turn (stream, M3U profile) pairs into plan candidates with their final URL and user agent."""
+    # Imported here: url_utils imports this module
+    from .url_utils import transform_urls
+
+    # Rewrite the URLs of each profile in one pass
+    urls_by_profile = {}
+    for stream, profile in pairs:
+        urls_by_profile.setdefault(profile.id, (profile, []))[1].append(stream.url)
+
+    rewritten = {
+        profile_id: iter(transform_urls(urls, profile.search_pattern, profile.replace_pattern, profile_id))
+        for profile_id, (profile, urls) in urls_by_profile.items()
+    }
+
+    user_agents = {}
+    candidates = []
+    for stream, profile in pairs:
+        account = stream.m3u_account
+        if account.id not in user_agents:
+            user_agents[account.id] = account.get_user_agent().user_agent
+
+        candidates.append({
+            "stream_id": stream.id,
+            "stream_name": stream.name,
+            "profile_id": profile.id,
+            "max_streams": profile.max_streams,
+            "url": next(rewritten[profile.id]),
+            "user_agent": user_agents[account.id],
+        })
+
+    return candidates
+
+
+def build_stream_plan(channel):
+    stream_profile = channel.get_stream_profile()
+    pairs = channel.get_stream_candidates()
+
+    return {
+        "channel_id": channel.id,
+        "stream_profile_id": stream_profile.id,
+        "transcode": not stream_profile.is_proxy(),
+        "redirect": stream_profile.is_redirect(),
+        "has_streams": bool(pairs) or channel.streams.exists(),
+        "candidates": serialize_candidates(pairs),
+    }
+
+
+def get_stream_plan(channel_uuid):
+    """
+    Return the stream plan of a channel, building it on first use.
+
+    Returns None if channel_uuid isn't the UUID of an existing channel (e.g. it
+    is a stream hash). Without Redis (no cache generation) the plan is rebuilt
+    every time.
+    """
+    try:
+        channel_uuid = str(UUID(str(channel_uuid)))
+    except ValueError:
+        return None
+
+    generation = get_cache_generation(CHANNELS_CACHE, STREAM_PLANS_CACHE)
+    if generation is None:
+        channel = Channel.objects.filter(uuid=channel_uuid).first()
+        return build_stream_plan(channel) if channel else None
+
+    key = _cache_key(generation, channel_uuid)
+    with _plans_lock:
+        plan = _plans.get(key)
+        if plan is not None:
+            _plans.move_to_end(key)
+            return plan
+
+    redis_client = RedisClient.get_client()
+    plan = None
+    try:
+        cached = redis_client.get(key)
+        if cached is not None:
+            plan = json.loads(cached)
+    except Exception as e:
+        logger.warning(f"Unable to read stream plan for channel {channel_uuid}: {e}")
+
+    if plan is None:
+        channel = Channel.objects.filter(uuid=channel_uuid).first()
+        if channel is None:
+            return None
+
+        plan = build_stream_plan(channel)
+        try:
+            redis_client.set(key, json.dumps(plan, separators=(",", ":")), ex=STREAM_PLAN_TTL)
+        except Exception as e:
+            logger.warning(f"Unable to store stream plan for channel {channel_uuid}: {e}")
+
+    with _plans_lock:
+        _plans[key] = plan
+        while len(_plans) > MAX_LOCAL_PLANS:
+            _plans.popitem(last=False)
+
+    return plan
+
+
+def get_stream_candidates_for(plan, stream_id):
+    """
+    The plan's candidates for one stream. Streams that aren't assigned to the
+    channel (e.g. an explicit switch to another stream) are read from the database.
+    """
+    candidates = [candidate for candidate in plan["candidates"] if candidate["stream_id"] == stream_id]
+    if candidates:
+        return candidates
+
+    streams = (
+        Stream.objects.filter(pk=stream_id)
+        .select_related("m3u_account")
+        .prefetch_related("m3u_account__profiles")
+    )
+    return serialize_candidates(get_stream_candidates(streams))
+
+
+def _find_candidate(plan, stream_id, profile_id):
+    for candidate in plan["candidates"]:
+        if candidate["stream_id"] == stream_id and candidate["profile_id"] == profile_id:
+            return candidate
+
+    # The channel may still hold a stream / profile the plan no longer lists
+    try:
+        stream = Stream.objects.select_related("m3u_account").get(pk=stream_id)
+        profile = M3UAccountProfile.objects.get(pk=profile_id)
+    except (Stream.DoesNotExist, M3UAccountProfile.DoesNotExist):
+        return None
+
+    if not stream.m3u_account:
+        return None
+    return serialize_candidates([(stream, profile)])[0]
+
+
+def allocate_stream(plan):
+    """
+    Reuse the channel's active stream or claim a slot on the first candidate with room.
+
+    Returns:
+        Tuple[Optional[dict], Optional[str]]: (candidate, error_reason)
+    """
+    if not plan["has_streams"]:
+        return None, "No streams assigned to channel"
+
+    stream_id, profile_id, maxed_out = allocate_channel_stream(
+        plan["channel_id"],
+        [
+            (candidate["stream_id"], candidate["profile_id"], candidate["max_streams"])
+            for candidate in plan["candidates"]
+        ],
+    )
+
+    if not stream_id:
+        return None, allocation_error_reason(bool(plan["candidates"]), maxed_out)
+
+    candidate = _find_candidate(plan, stream_id, profile_id)
+    if candidate is None:
+        release_channel_stream(plan["channel_id"])
+        return None, "Assigned stream is no longer available"
+
+    return candidate, None
+
+
+def get_current_profile_id(redis_client, channel_id):
+    """M3U profile used by the channel's active stream, if any."""
+    existing_stream_id = redis_client.get(f"channel_stream:{channel_id}")
+    if not existing_stream_id:
+        return None
+
+    # Decode bytes to string/int for proper Redis key lookup
+    existing_profile_id = redis_client.get(f"stream_profile:{existing_stream_id.decode('utf-8')}")
+    if not existing_profile_id:
+        return None
+    return int(existing_profile_id.decode("utf-8"))
+
+
+def get_available_candidates(plan, candidates):
+    """
+    The subset of candidates whose profile has a free connection, counting the
+    channel's own connection as free. Without Redis every candidate is returned.
+    """
+    redis_client = RedisClient.get_client()
+    if not redis_client or not candidates:
+        return list(candidates)
+
+    current_profile_id = get_current_profile_id(redis_client, plan["channel_id"])
+    connections = redis_client.mget(
+        [f"profile_connections:{candidate['profile_id']}" for candidate in candidates]
+    )
+
+    available = []
+    for candidate, current_connections in zip(candidates, connections):
+        # Calculate effective connections (subtract 1 if channel already using this profile)
+        effective_connections = int(current_connections or 0)
+        if candidate["profile_id"] == current_profile_id:
+            effective_connections -= 1
+
+        if candidate["max_streams"] == 0 or effective_connections < candidate["max_streams"]:
+            available.append(candidate)
+        else:
+            logger.debug(
+                f"Profile {candidate['profile_id']} at max connections: "
+                f"{effective_connections}/{candidate['max_streams']}"
+            )
+
+    return available
@@ -4,17 +4,32 @@ Utilities for handling stream URLs and transformations.
 
 import logging
 import re
+import threading
+from collections import OrderedDict
 from typing import Optional, Tuple, List
 from django.shortcuts import get_object_or_404
 from apps.channels.models import Channel, Stream
-from apps.m3u.models import M3UAccount, M3UAccountProfile
-from core.models import UserAgent, CoreSettings
+from apps.m3u.models import M3UAccountProfile
+from .stream_plan import (
+    get_stream_plan,
+    allocate_stream,
+    serialize_candidates,
+    get_stream_candidates_for,
+    get_available_candidates,
+)
+from .stream_health import rank_by_health
 from .utils import get_logger
 from uuid import UUID
 import requests
 
 logger = get_logger()
 
+# Compiled M3U profile patterns kept per process
+MAX_URL_REWRITERS = 256
+
+_url_rewriters = OrderedDict()
+_url_rewriters_lock = threading.Lock()
+
 def get_stream_object(id: str):
     try:
         logger.info(f"Fetching channel ID {id}")
@@ -24,6 +39,70 @@ def get_stream_object(id: str):
         logger.info(f"Fetching stream hash {id}")
         return get_object_or_404(Stream, stream_hash=id)
 
+def _stream_info(plan, candidate):
+    return {
+        'url': candidate['url'],
+        'user_agent': candidate['user_agent'],
+        'transcode': plan['transcode'],
+        'redirect': plan['redirect'],
+        'stream_profile': plan['stream_profile_id'],
+        'stream_id': candidate['stream_id'],
+        'm3u_profile_id': candidate['profile_id'],
+    }
+
+def resolve_stream(channel_id: str) -> dict:
+    """
+    Allocate a stream for a channel (or a stream hash) and return what's needed to start it.
+
+    Channels resolve from their cached stream plan, so apart from the slot
+    allocation in Redis a tune doesn't touch the database.
+
+    Args:
+        channel_id: The UUID of the channel, or a stream hash
+
+    Returns:
+        dict: url, user_agent, transcode, redirect, stream_profile, stream_id and
+        m3u_profile_id, or {'error': reason} if no stream is available
+    """
+    try:
+        plan = get_stream_plan(channel_id)
+        if plan is None:
+            return _resolve_stream_object(get_stream_object(channel_id))
+
+        candidate, error_reason = allocate_stream(plan)
+        if candidate is None:
+            logger.error(f"No stream available for channel {channel_id}: {error_reason}")
+            return {'error': error_reason}
+
+        return _stream_info(plan, candidate)
+    except Exception as e:
+        logger.error(f"Error generating stream URL: {e}")
+        return {'error': f'Error: {str(e)}'}
+
+def _resolve_stream_object(obj) -> dict:
+    # Streams requested directly by hash have no plan
+    stream_id, profile_id, error_reason = obj.get_stream()
+
+    if not stream_id or not profile_id:
+        logger.error(f"No stream available for {obj}: {error_reason}")
+        return {'error': error_reason or 'No available streams'}
+
+    # Look up the Stream and Profile objects
+    try:
+        stream = Stream.objects.select_related('m3u_account').get(id=stream_id)
+        profile = M3UAccountProfile.objects.get(id=profile_id)
+    except (Stream.DoesNotExist, M3UAccountProfile.DoesNotExist) as e:
+        logger.error(f"Error getting stream or profile: {e}")
+        return {'error': 'Stream or profile not found'}
+
+    stream_profile = obj.get_stream_profile()
+    plan = {
+        'transcode': not stream_profile.is_proxy(),
+        'redirect': stream_profile.is_redirect(),
+        'stream_profile_id': stream_profile.id,
+    }
+    return _stream_info(plan, serialize_candidates([(stream, profile)])[0])
+
 def generate_stream_url(channel_id: str) -> Tuple[str, str, bool, Optional[int]]:
     """
     Generate the appropriate stream URL for a channel based on its profile settings.
@@ -34,55 +113,57 @@ def generate_stream_url(channel_id: str) -> Tuple[str, str, bool, Optional[int]]
     Returns:
         Tuple[str, str, bool, Optional[int]]: (stream_url, user_agent, transcode_flag, profile_id)
     """
-    try:
-        channel = get_stream_object(channel_id)
+    stream_info = resolve_stream(channel_id)
+    if 'error' in stream_info:
+        return None, None, False, None
 
-        # Get stream and profile for this channel
-        # Note: get_stream now returns 3 values (stream_id, profile_id, error_reason)
-        stream_id, profile_id, error_reason = channel.get_stream()
+    return stream_info['url'], stream_info['user_agent'], stream_info['transcode'], stream_info['stream_profile']
 
-        if not stream_id or not profile_id:
-            logger.error(f"No stream available for channel {channel_id}: {error_reason}")
-            return None, None, False, None
+class UrlRewriter:
+    """A compiled M3U profile search / replace pair."""
 
-        # Look up the Stream and Profile objects
-        try:
-            stream = Stream.objects.get(id=stream_id)
-            profile = M3UAccountProfile.objects.get(id=profile_id)
-        except (Stream.DoesNotExist, M3UAccountProfile.DoesNotExist) as e:
-            logger.error(f"Error getting stream or profile: {e}")
-            return None, None, False, None
-
-        # Get the M3U account profile for URL pattern
-        m3u_profile = profile
-
-        # Get the appropriate user agent
-        m3u_account = M3UAccount.objects.get(id=m3u_profile.m3u_account.id)
-        stream_user_agent = m3u_account.get_user_agent().user_agent
-
-        if stream_user_agent is None:
-            stream_user_agent = UserAgent.objects.get(id=CoreSettings.get_default_user_agent_id())
-            logger.debug(f"No user agent found for account, using default: {stream_user_agent}")
-
-        # Generate stream URL based on the selected profile
-        input_url = stream.url
-        stream_url = transform_url(input_url, m3u_profile.search_pattern, m3u_profile.replace_pattern)
-
-        # Check if transcoding is needed
-        stream_profile = channel.get_stream_profile()
-        if stream_profile.is_proxy() or stream_profile is None:
-            transcode = False
-        else:
-            transcode = True
+    def __init__(self, search_pattern: str, replace_pattern: str):
+        self.regex = re.compile(search_pattern)
+        # Handle backreferences in the replacement pattern
+        self.replacement = re.sub(r'\$(\d+)', r'\\\1', replace_pattern)
 
-        stream_profile_id = stream_profile.id
+    def rewrite(self, input_url: str) -> str:
+        return self.regex.sub(self.replacement, input_url)
 
-        return stream_url, stream_user_agent, transcode, stream_profile_id
-    except Exception as e:
-        logger.error(f"Error generating stream URL: {e}")
-        return None, None, False, None
+def get_url_rewriter(search_pattern: str, replace_pattern: str, profile_id: Optional[int] = None) -> Optional[UrlRewriter]:
+    """
+    Return the compiled rewriter for a search / replace pair, compiling it on first use.
 
-def transform_url(input_url: str, search_pattern: str, replace_pattern: str) -> str:
+    Rewriters are kept in a per-process LRU keyed on the M3U profile and its
+    patterns; saving a profile drops its entries (see invalidate_url_rewriters).
+    Returns None if the search pattern isn't a valid regex.
+    """
+    key = (profile_id, search_pattern, replace_pattern)
+    with _url_rewriters_lock:
+        rewriter = _url_rewriters.get(key)
+        if rewriter is not None:
+            _url_rewriters.move_to_end(key)
+            return rewriter
+
+    try:
+        rewriter = UrlRewriter(search_pattern, replace_pattern)
+    except (re.error, TypeError) as e:
+        logger.error(f"Invalid URL search pattern {search_pattern!r}: {e}")
+        return None
+
+    with _url_rewriters_lock:
+        _url_rewriters[key] = rewriter
+        while len(_url_rewriters) > MAX_URL_REWRITERS:
+            _url_rewriters.popitem(last=False)
+    return rewriter
+
+def invalidate_url_rewriters(profile_id: int):
+    """Drop the compiled patterns of an M3U profile, e.g. after it was saved."""
+    with _url_rewriters_lock:
+        for key in [key for key in _url_rewriters if key[0] == profile_id]:
+            del _url_rewriters[key]
+
+def transform_url(input_url: str, search_pattern: str, replace_pattern: str, profile_id: Optional[int] = None) -> str:
     """
     Transform a URL using regex pattern replacement.
 
@@ -90,28 +171,38 @@ def transform_url(input_url: str, search_pattern: str, replace_pattern: str) ->
         input_url: The base URL to transform
         search_pattern: The regex search pattern
         replace_pattern: The replacement pattern
+        profile_id: The M3U profile the patterns belong to, if any
 
     Returns:
         str: The transformed URL
     """
-    try:
-        logger.debug("Executing URL pattern replacement:")
-        logger.debug(f"  base URL: {input_url}")
-        logger.debug(f"  search: {search_pattern}")
+    stream_url = transform_urls([input_url], search_pattern, replace_pattern, profile_id)[0]
+    logger.debug(f"Generated stream url: {stream_url}")
+    return stream_url
 
-        # Handle backreferences in the replacement pattern
-        safe_replace_pattern = re.sub(r'\$(\d+)', r'\\\1', replace_pattern)
-        logger.debug(f"  replace: {replace_pattern}")
-        logger.debug(f"  safe replace: {safe_replace_pattern}")
+def transform_urls(input_urls: List[str], search_pattern: str, replace_pattern: str, profile_id: Optional[int] = None) -> List[str]:
+    """
+    Transform many URLs with the same pattern pair, compiling it once.
 
-        # Apply the transformation
-        stream_url = re.sub(search_pattern, safe_replace_pattern, input_url)
-        logger.info(f"Generated stream url: {stream_url}")
+    URLs that can't be transformed are returned unchanged.
+    """
+    rewriter = get_url_rewriter(search_pattern, replace_pattern, profile_id)
+    if rewriter is None:
+        return list(input_urls)
 
-        return stream_url
+    try:
+        return [rewriter.rewrite(input_url) for input_url in input_urls]
     except Exception as e:
+        # e.g. the replacement refers to a group the search pattern doesn't have
         logger.error(f"Error transforming URL: {e}")
-        return input_url  # Return original URL on error
+
+    results = []
+    for input_url in input_urls:
+        try:
+            results.append(rewriter.rewrite(input_url))
+        except Exception:
+            results.append(input_url)  # Return original URL on error
+    return results
 
 def get_stream_info_for_switch(channel_id: str, target_stream_id: Optional[int] = None) -> dict:
     """
@@ -125,110 +216,28 @@ def get_stream_info_for_switch(channel_id: str, target_stream_id: Optional[int]
         dict: Stream information including URL, user agent and transcode flag
     """
     try:
-        from core.utils import RedisClient
-
-        channel = get_object_or_404(Channel, uuid=channel_id)
-        redis_client = RedisClient.get_client()
+        plan = get_stream_plan(channel_id)
+        if plan is None:
+            return {'error': 'Channel not found'}
 
         # Use the target stream if specified, otherwise use current stream
         if target_stream_id:
-            stream_id = target_stream_id
-
-            # Get the stream object
-            stream = get_object_or_404(Stream, pk=stream_id)
-
-            # Find compatible profile for this stream with connection availability check
-            m3u_account = stream.m3u_account
-            if not m3u_account:
-                return {'error': 'Stream has no M3U account'}
-
-            m3u_profiles = m3u_account.profiles.all()
-            default_profile = next((obj for obj in m3u_profiles if obj.is_default), None)
-
-            if not default_profile:
-                return {'error': 'M3U account has no default profile'}
-
-            # Check profiles in order: default first, then others
-            profiles = [default_profile] + [obj for obj in m3u_profiles if not obj.is_default]
-
-            selected_profile = None
-            for profile in profiles:
-                # Skip inactive profiles
-                if not profile.is_active:
-                    logger.debug(f"Skipping inactive profile {profile.id}")
-                    continue
-
-                # Check connection availability
-                if redis_client:
-                    profile_connections_key = f"profile_connections:{profile.id}"
-                    current_connections = int(redis_client.get(profile_connections_key) or 0)
-
-                    # Check if this channel is already using this profile
-                    channel_using_profile = False
-                    existing_stream_id = redis_client.get(f"channel_stream:{channel.id}")
-                    if existing_stream_id:
-                        # Decode bytes to string/int for proper Redis key lookup
-                        existing_stream_id = existing_stream_id.decode('utf-8')
-                        existing_profile_id = redis_client.get(f"stream_profile:{existing_stream_id}")
-                        if existing_profile_id and int(existing_profile_id.decode('utf-8')) == profile.id:
-                            channel_using_profile = True
-                            logger.debug(f"Channel {channel.id} already using profile {profile.id}")
-
-                    # Calculate effective connections (subtract 1 if channel already using this profile)
-                    effective_connections = current_connections - (1 if channel_using_profile else 0)
-
-                    # Check if profile has available slots
-                    if profile.max_streams == 0 or effective_connections < profile.max_streams:
-                        selected_profile = profile
-                        logger.debug(f"Selected profile {profile.id} with {effective_connections}/{profile.max_streams} effective connections (current: {current_connections}, already using: {channel_using_profile})")
-                        break
-                    else:
-                        logger.debug(f"Profile {profile.id} at max connections: {effective_connections}/{profile.max_streams} (current: {current_connections}, already using: {channel_using_profile})")
-                else:
-                    # No Redis available, assume first active profile is okay
-                    selected_profile = profile
-                    break
-
-            if not selected_profile:
-                return {'error': 'No profiles available with connection capacity'}
+            candidates = get_stream_candidates_for(plan, int(target_stream_id))
+            if not candidates:
+                return {'error': 'Stream has no M3U account with an active default profile'}
 
-            m3u_profile_id = selected_profile.id
+            # Profiles in order: default first, then others
+            available = get_available_candidates(plan, candidates)
+            if not available:
+                return {'error': 'No profiles available with connection capacity'}
+            candidate = available[0]
+            logger.debug(f"Selected profile {candidate['profile_id']} for stream {candidate['stream_id']}")
         else:
-            stream_id, m3u_profile_id, error_reason = channel.get_stream()
-            if stream_id is None or m3u_profile_id is None:
+            candidate, error_reason = allocate_stream(plan)
+            if candidate is None:
                 return {'error': error_reason or 'No stream assigned to channel'}
 
-        # Get the stream and profile objects directly
-        stream = get_object_or_404(Stream, pk=stream_id)
-        profile = get_object_or_404(M3UAccountProfile, pk=m3u_profile_id)
-
-        # Check connections left
-        m3u_account = M3UAccount.objects.get(id=profile.m3u_account.id)
-        #connections_left = get_connections_left(m3u_profile_id)
-
-        #if connections_left <= 0:
-            #logger.warning(f"No connections left for M3U account {m3u_account.id}")
-            #return {'error': 'No connections left'}
-
-        # Get the user agent from the M3U account
-        user_agent = m3u_account.get_user_agent().user_agent
-
-        # Generate URL using the transform function directly
-        stream_url = transform_url(stream.url, profile.search_pattern, profile.replace_pattern)
-
-        # Get transcode info from the channel's stream profile
-        stream_profile = channel.get_stream_profile()
-        transcode = not (stream_profile.is_proxy() or stream_profile is None)
-        profile_value = stream_profile.id
-
-        return {
-            'url': stream_url,
-            'user_agent': user_agent,
-            'transcode': transcode,
-            'stream_profile': profile_value,
-            'stream_id': stream_id,
-            'm3u_profile_id': m3u_profile_id
-        }
+        return _stream_info(plan, candidate)
     except Exception as e:
         logger.error(f"Error getting stream info for switch: {e}", exc_info=True)
         return {'error': f'Error: {str(e)}'}
@@ -242,106 +251,45 @@ def get_alternate_streams(channel_id: str, current_stream_id: Optional[int] = No
         current_stream_id: The currently failing stream ID to exclude
 
     Returns:
-        List[dict]: List of stream information dictionaries with stream_id and profile_id
+        List[dict]: Stream information dictionaries (stream_id, profile_id, max_streams,
+            name, url and user_agent), healthiest first (see stream_health)
     """
     try:
-        from core.utils import RedisClient
-
-        # Get channel object
-        channel = get_stream_object(channel_id)
-        if isinstance(channel, Stream):
+        plan = get_stream_plan(channel_id)
+        if plan is None:
             logger.error(f"Stream is not a channel")
             return []
 
-        redis_client = RedisClient.get_client()
         logger.debug(f"Looking for alternate streams for channel {channel_id}, current stream ID: {current_stream_id}")
 
-        # Get all assigned streams for this channel using the correct ordering
-        streams = channel.streams.all().order_by('channelstream__order')
-        logger.debug(f"Channel {channel_id} has {streams.count()} total assigned streams")
-
-        if not streams.exists():
+        if not plan['has_streams']:
             logger.warning(f"No streams assigned to channel {channel_id}")
             return []
 
-        alternate_streams = []
-
-        # Process each stream in the user-defined order
-        for stream in streams:
-            logger.debug(f"Checking stream ID {stream.id} ({stream.name}) for channel {channel_id}")
-
-            # Skip the current failing stream
-            if current_stream_id and stream.id == current_stream_id:
-                logger.debug(f"Skipping current stream ID {current_stream_id}")
-                continue
+        # Skip the current failing stream
+        candidates = [
+            candidate for candidate in plan['candidates']
+            if not (current_stream_id and candidate['stream_id'] == current_stream_id)
+        ]
 
-            # Find compatible profiles for this stream with connection checking
-            try:
-                m3u_account = stream.m3u_account
-                if not m3u_account:
-                    logger.debug(f"Stream {stream.id} has no M3U account")
-                    continue
-
-                m3u_profiles = m3u_account.profiles.all()
-                default_profile = next((obj for obj in m3u_profiles if obj.is_default), None)
-
-                if not default_profile:
-                    logger.debug(f"M3U account {m3u_account.id} has no default profile")
-                    continue
-
-                # Check profiles in order with connection availability
-                profiles = [default_profile] + [obj for obj in m3u_profiles if not obj.is_default]
-
-                selected_profile = None
-                for profile in profiles:
-                    # Skip inactive profiles
-                    if not profile.is_active:
-                        logger.debug(f"Skipping inactive profile {profile.id}")
-                        continue
-
-                    # Check connection availability
-                    if redis_client:
-                        profile_connections_key = f"profile_connections:{profile.id}"
-                        current_connections = int(redis_client.get(profile_connections_key) or 0)
-
-                        # Check if this channel is already using this profile
-                        channel_using_profile = False
-                        existing_stream_id = redis_client.get(f"channel_stream:{channel.id}")
-                        if existing_stream_id:
-                            # Decode bytes to string/int for proper Redis key lookup
-                            existing_stream_id = existing_stream_id.decode('utf-8')
-                            existing_profile_id = redis_client.get(f"stream_profile:{existing_stream_id}")
-                            if existing_profile_id and int(existing_profile_id.decode('utf-8')) == profile.id:
-                                channel_using_profile = True
-                                logger.debug(f"Channel {channel.id} already using profile {profile.id}")
-
-                        # Calculate effective connections (subtract 1 if channel already using this profile)
-                        effective_connections = current_connections - (1 if channel_using_profile else 0)
-
-                        # Check if profile has available slots
-                        if profile.max_streams == 0 or effective_connections < profile.max_streams:
-                            selected_profile = profile
-                            logger.debug(f"Found available profile {profile.id} for stream {stream.id}: {effective_connections}/{profile.max_streams} effective (current: {current_connections}, already using: {channel_using_profile})")
-                            break
-                        else:
-                            logger.debug(f"Profile {profile.id} at max connections: {effective_connections}/{profile.max_streams} (current: {current_connections}, already using: {channel_using_profile})")
-                    else:
-                        # No Redis available, assume first active profile is okay
-                        selected_profile = profile
-                        break
-
-                if selected_profile:
-                    alternate_streams.append({
-                        'stream_id': stream.id,
-                        'profile_id': selected_profile.id,
-                        'name': stream.name
-                    })
-                else:
-                    logger.debug(f"No available profiles for stream ID {stream.id}")
-
-            except Exception as inner_e:
-                logger.error(f"Error finding profiles for stream {stream.id}: {inner_e}")
+        # Candidates are in the user-defined stream order; keep the first available profile of each stream
+        alternate_streams = []
+        seen = set()
+        for candidate in get_available_candidates(plan, candidates):
+            if candidate['stream_id'] in seen:
                 continue
+            seen.add(candidate['stream_id'])
+            alternate_streams.append({
+                'stream_id': candidate['stream_id'],
+                'profile_id': candidate['profile_id'],
+                'max_streams': candidate['max_streams'],
+                'name': candidate['stream_name'],
+                'url': candidate['url'],
+                'user_agent': candidate['user_agent'],
+            })
+
+        # Streams that failed their recent probes go last
+        alternate_streams = rank_by_health(alternate_streams)
 
         if alternate_streams:
             stream_ids = ', '.join([str(s['stream_id']) for s in alternate_streams])
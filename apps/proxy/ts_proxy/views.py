@@ -2,21 +2,19 @@ import json
 import threading
 import time
 import random
-import re
 import pathlib
 from django.http import StreamingHttpResponse, JsonResponse, HttpResponseRedirect
 from django.views.decorators.csrf import csrf_exempt
-from django.shortcuts import get_object_or_404
 from apps.proxy.config import TSConfig as Config
+from apps.proxy.upstream import get_upstream_stats
 from .server import ProxyServer
 from .channel_status import ChannelStatus
 from .stream_generator import create_stream_generator
 from .utils import get_client_ip
 from .redis_keys import RedisKeys
 import logging
-from apps.channels.models import Channel, Stream
 from apps.m3u.models import M3UAccount, M3UAccountProfile
-from apps.accounts.models import User
+from apps.accounts.xc import get_xc_user, get_xc_channel_uuid
 from core.models import UserAgent, CoreSettings, PROXY_PROFILE_NAME
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
@@ -29,12 +27,13 @@ from .constants import ChannelState, EventType, StreamType, ChannelMetadataField
 from .config_helper import ConfigHelper
 from .services.channel_service import ChannelService
 from .url_utils import (
-    generate_stream_url,
+    resolve_stream,
     transform_url,
     get_stream_info_for_switch,
     get_stream_object,
     get_alternate_streams,
 )
+from .stream_plan import get_stream_plan
 from .utils import get_logger
 from uuid import UUID
 import gevent
@@ -49,7 +48,9 @@ def stream_ts(request, channel_id):
         return JsonResponse({"error": "Forbidden"}, status=403)
 
     """Stream TS data to client with immediate response and keep-alive packets during initialization"""
-    channel = get_stream_object(channel_id)
+    # Channels are served from their cached stream plan; anything else must be a stream hash
+    if get_stream_plan(channel_id) is None:
+        get_stream_object(channel_id)
 
     client_user_agent = None
     proxy_server = ProxyServer.get_instance()
@@ -131,26 +132,22 @@ def stream_ts(request, channel_id):
             retry_timeout = ConfigHelper.connection_timeout()
             wait_start_time = time.time()
 
-            stream_url = None
-            stream_user_agent = None
-            transcode = False
-            profile_value = None
+            stream_info = {}
             error_reason = None
 
-            # Try to get a stream with configured retries
+            # Try to get a stream with configured retries; sharing a stream this
+            # worker already runs needs no slot, so it's looked for first
             for attempt in range(max_retries):
-                stream_url, stream_user_agent, transcode, profile_value = (
-                    generate_stream_url(channel_id)
-                )
+                stream_info = proxy_server.find_shared_source(channel_id) or resolve_stream(channel_id)
 
-                if stream_url is not None:
+                if "error" not in stream_info:
                     logger.info(
                         f"[{client_id}] Successfully obtained stream for channel {channel_id}"
                     )
                     break
 
                 # If we failed because there are no streams assigned, don't retry
-                _, _, error_reason = channel.get_stream()
+                error_reason = stream_info["error"]
                 if error_reason and "maximum connection limits" not in error_reason:
                     logger.warning(
                         f"[{client_id}] Can't retry - error not related to connection limits: {error_reason}"
@@ -173,8 +170,9 @@ def stream_ts(request, channel_id):
                     wait_time
                 )  # FIXED: Using gevent.sleep instead of time.sleep
 
-            if stream_url is None:
+            if not stream_info or "error" in stream_info:
                 # Make sure to release any stream locks that might have been acquired
+                channel = get_stream_object(channel_id)
                 if hasattr(channel, "streams") and channel.streams.exists():
                     for stream in channel.streams.all():
                         try:
@@ -196,21 +194,24 @@ def stream_ts(request, channel_id):
                     {"error": error_msg, "waited": wait_duration}, status=503
                 )  # 503 Service Unavailable is appropriate here
 
-            # Get the stream ID from the channel
-            stream_id, m3u_profile_id, _ = channel.get_stream()
+            stream_url = stream_info["url"]
+            stream_user_agent = stream_info["user_agent"]
+            transcode = stream_info["transcode"]
+            profile_value = stream_info["stream_profile"]
+            stream_id = stream_info["stream_id"]
+            m3u_profile_id = stream_info["m3u_profile_id"]
             logger.info(
                 f"Channel {channel_id} using stream ID {stream_id}, m3u account profile ID {m3u_profile_id}"
             )
 
             # Generate transcode command if needed
-            stream_profile = channel.get_stream_profile()
-            if stream_profile.is_redirect():
+            if stream_info["redirect"]:
                 # Validate the stream URL before redirecting
                 from .url_utils import (
                     validate_stream_url,
                     get_alternate_streams,
-                    get_stream_info_for_switch,
                 )
+                from .stream_health import probe_streams
 
                 # Try initial URL
                 logger.info(f"[{client_id}] Validating redirect URL: {stream_url}")
@@ -227,47 +228,28 @@ def stream_ts(request, channel_id):
                     # Track tried streams to avoid loops
                     tried_streams = {stream_id}
 
-                    # Get alternate streams
-                    alternates = get_alternate_streams(channel_id, stream_id)
-
-                    # Try each alternate until one works
-                    for alt in alternates:
-                        if alt["stream_id"] in tried_streams:
-                            continue
-
-                        tried_streams.add(alt["stream_id"])
-
-                        # Get stream info
-                        alt_info = get_stream_info_for_switch(
-                            channel_id, alt["stream_id"]
-                        )
-                        if "error" in alt_info:
-                            logger.warning(
-                                f"[{client_id}] Error getting alternate stream info: {alt_info['error']}"
-                            )
-                            continue
-
-                        # Validate the alternate URL
+                    # Probe the alternates concurrently, best responding stream first
+                    alternates = [
+                        alt
+                        for alt in get_alternate_streams(channel_id, stream_id)
+                        if alt["stream_id"] not in tried_streams
+                    ]
+                    logger.info(
+                        f"[{client_id}] Probing {len(alternates)} alternate stream(s)"
+                    )
+                    responsive = probe_streams(alternates)
+                    if responsive:
+                        alt, result = responsive[0]
+                        is_valid, final_url, message = True, result["final_url"], result["message"]
                         logger.info(
-                            f"[{client_id}] Trying alternate stream #{alt['stream_id']}: {alt_info['url']}"
+                            f"[{client_id}] Alternate stream #{alt['stream_id']} validated successfully"
                         )
-                        is_valid, final_url, status_code, message = validate_stream_url(
-                            alt_info["url"],
-                            user_agent=alt_info["user_agent"],
-                            timeout=(5, 5),
+                    else:
+                        logger.warning(
+                            f"[{client_id}] No alternate stream responded"
                         )
-
-                        if is_valid:
-                            logger.info(
-                                f"[{client_id}] Alternate stream #{alt['stream_id']} validated successfully"
-                            )
-                            break
-                        else:
-                            logger.warning(
-                                f"[{client_id}] Alternate stream #{alt['stream_id']} failed validation: {message}"
-                            )
                 # Release stream lock before redirecting
-                channel.release_stream()
+                get_stream_object(channel_id).release_stream()
                 # Final decision based on validation results
                 if is_valid:
                     logger.info(
@@ -291,6 +273,7 @@ def stream_ts(request, channel_id):
                 profile_value,
                 stream_id,
                 m3u_profile_id,
+                stream_info.get("shared_with"),
             )
 
             if not success:
@@ -462,41 +445,19 @@ def stream_ts(request, channel_id):
 
 @api_view(["GET"])
 def stream_xc(request, username, password, channel_id):
-    user = get_object_or_404(User, username=username)
+    user = get_xc_user(username, password)
+    if user is None:
+        return Response({"error": "Invalid credentials"}, status=401)
 
     extension = pathlib.Path(channel_id).suffix
     channel_id = pathlib.Path(channel_id).stem
 
-    custom_properties = (
-        json.loads(user.custom_properties) if user.custom_properties else {}
-    )
-
-    if "xc_password" not in custom_properties:
-        return Response({"error": "Invalid credentials"}, status=401)
-
-    if custom_properties["xc_password"] != password:
-        return Response({"error": "Invalid credentials"}, status=401)
-
-    print(f"Fetchin channel with ID: {channel_id}")
-    if user.user_level < 10:
-        filters = {
-            "id": int(channel_id),
-            "channelprofilemembership__enabled": True,
-            "user_level__lte": user.user_level,
-        }
-
-        if user.channel_profiles.count() > 0:
-            channel_profiles = user.channel_profiles.all()
-            filters["channelprofilemembership__channel_profile__in"] = channel_profiles
-
-        channel = Channel.objects.filter(**filters).distinct().first()
-        if not channel:
-            return JsonResponse({"error": "Not found"}, status=404)
-    else:
-        channel = get_object_or_404(Channel, id=channel_id)
+    channel_uuid = get_xc_channel_uuid(user, channel_id)
+    if not channel_uuid:
+        return JsonResponse({"error": "Not found"}, status=404)
 
     # @TODO: we've got the  file 'type' via extension, support this when we support multiple outputs
-    return stream_ts(request._request, channel.uuid)
+    return stream_ts(request._request, channel_uuid)
 
 
 @csrf_exempt
@@ -612,30 +573,14 @@ def channel_status(request, channel_id=None):
                     {"error": f"Channel {channel_id} not found"}, status=404
                 )
         else:
-            # Basic info for all channels
-            channel_pattern = "ts_proxy:channel:*:metadata"
-            all_channels = []
-
-            # Extract channel IDs from keys
-            cursor = 0
-            while True:
-                cursor, keys = proxy_server.redis_client.scan(
-                    cursor, match=channel_pattern
-                )
-                for key in keys:
-                    channel_id_match = re.search(
-                        r"ts_proxy:channel:(.*):metadata", key.decode("utf-8")
-                    )
-                    if channel_id_match:
-                        ch_id = channel_id_match.group(1)
-                        channel_info = ChannelStatus.get_basic_channel_info(ch_id)
-                        if channel_info:
-                            all_channels.append(channel_info)
-
-                if cursor == 0:
-                    break
-
-            return JsonResponse({"channels": all_channels, "count": len(all_channels)})
+            # Basic info for all channels in the channel registry
+            all_channels = ChannelStatus.get_all_basic_channel_info()
+
+            return JsonResponse({
+                "channels": all_channels,
+                "count": len(all_channels),
+                "upstream": get_upstream_stats(),
+            })
 
     except Exception as e:
         logger.error(f"Error in channel_status: {e}", exc_info=True)
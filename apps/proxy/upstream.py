@@ -0,0 +1,292 @@
+"""
+Shared upstream HTTP connections for the stream proxies.
+
+Every stream connection, reconnect, probe and HLS segment fetch in a process
+goes through one requests session. Its connection pools are keyed by provider
+host and bounded (UPSTREAM_MAX_HOSTS pools of UPSTREAM_POOL_SIZE connections),
+so keep-alive connections are reused across channels and reconnects. Host names
+are resolved through a small TTL'd cache instead of on every new connection.
+Each stream gets an UpstreamSession handle carrying its user agent and its own
+cookie jar; closing the handle leaves the pooled connections open.
+
+Request and new-connection counts are flushed to Redis periodically, giving the
+connection reuse rate across workers (see get_upstream_stats).
+"""
+
+import socket
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from urllib3.util import connection as urllib3_connection
+from urllib3.util.connection import allowed_gai_family
+
+from apps.proxy.config import BaseConfig as Config
+from core.utils import RedisClient
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_STATS_KEY = "proxy:upstream_stats"
+
+# (host, port) -> (expires_at, getaddrinfo results)
+_dns_cache = {}
+_dns_lock = threading.Lock()
+
+# Counters not flushed to Redis yet: field -> count
+_pending_stats = {}
+_stats_lock = threading.Lock()
+_last_stats_flush = 0
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _count(field, host=None):
+    global _last_stats_flush
+    with _stats_lock:
+        _pending_stats[field] = _pending_stats.get(field, 0) + 1
+        if host:
+            host_field = f"{host}:{field}"
+            _pending_stats[host_field] = _pending_stats.get(host_field, 0) + 1
+
+        now = time.monotonic()
+        if now - _last_stats_flush < Config.UPSTREAM_STATS_FLUSH_INTERVAL:
+            return
+        _last_stats_flush = now
+        pending = dict(_pending_stats)
+        _pending_stats.clear()
+
+    redis_client = RedisClient.get_client()
+    if not redis_client:
+        return
+    try:
+        pipe = redis_client.pipeline()
+        for name, count in pending.items():
+            pipe.hincrby(UPSTREAM_STATS_KEY, name, count)
+        pipe.execute()
+    except Exception as e:
+        logger.debug(f"Unable to flush upstream connection stats: {e}")
+
+
+def _is_ip_address(host):
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, host)
+            return True
+        except (OSError, ValueError):
+            pass
+    return False
+
+
+def resolve(host, port):
+    """
+    Addresses to connect to for host, in getaddrinfo order, from the DNS cache when fresh.
+
+    Like urllib3, only the address families allowed_gai_family() permits are
+    returned (no IPv6 where the system has none).
+
+    Returns:
+        list: IP address strings
+    """
+    if _is_ip_address(host):
+        return [host]
+
+    key = (host, port)
+    entry = _dns_cache.get(key)
+    if entry and entry[0] > time.monotonic():
+        _count("dns_hits")
+        return entry[1]
+
+    _count("dns_lookups")
+    addresses = []
+    for _, _, _, _, sockaddr in socket.getaddrinfo(host, port, allowed_gai_family(), socket.SOCK_STREAM):
+        if sockaddr[0] not in addresses:
+            addresses.append(sockaddr[0])
+    if not addresses:
+        raise socket.gaierror(f"getaddrinfo returned no addresses for {host}")
+
+    with _dns_lock:
+        if len(_dns_cache) >= Config.UPSTREAM_MAX_HOSTS * 4:
+            _dns_cache.clear()
+        _dns_cache[key] = (time.monotonic() + Config.UPSTREAM_DNS_TTL, addresses)
+    return addresses
+
+
+def forget_host(host):
+    """Drop the cached addresses of a host, e.g. after failing to connect to all of them."""
+    with _dns_lock:
+        for key in [key for key in _dns_cache if key[0] == host]:
+            del _dns_cache[key]
+
+
+class _CachedDNSConnectionMixin:
+    """
+    Opens sockets to the cached addresses, trying each in turn like urllib3's
+    create_connection; Host header, SNI and certificate checks still use the host name.
+    """
+
+    def _new_conn(self):
+        host = self.host
+        _count("connections", host)
+
+        extra_kw = {}
+        if self.source_address:
+            extra_kw["source_address"] = self.source_address
+        if self.socket_options:
+            extra_kw["socket_options"] = self.socket_options
+
+        try:
+            addresses = resolve(host, self.port)
+        except socket.gaierror as e:
+            raise NameResolutionError(host, self, e) from e
+
+        error = None
+        for address in addresses:
+            try:
+                return urllib3_connection.create_connection((address, self.port), self.timeout, **extra_kw)
+            except OSError as e:
+                error = e
+
+        # None of them answered: look the host up again next time
+        forget_host(host)
+        if isinstance(error, socket.timeout):
+            raise ConnectTimeoutError(self, f"Connection to {host} timed out. (connect timeout={self.timeout})") from error
+        raise NewConnectionError(self, f"Failed to establish a new connection: {error}") from error
+
+
+class _HTTPConnection(_CachedDNSConnectionMixin, HTTPConnection):
+    pass
+
+
+class _HTTPSConnection(_CachedDNSConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _HTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _HTTPConnection
+
+
+class _HTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _HTTPSConnection
+
+
+class UpstreamAdapter(HTTPAdapter):
+    """HTTPAdapter whose per-host pools connect through the DNS cache."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _HTTPConnectionPool,
+            "https": _HTTPSConnectionPool,
+        }
+
+
+def get_shared_session():
+    """The process-wide requests session for upstream connections."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.headers.update({"Connection": "keep-alive"})
+                # Streams share the session, so cookies live in each UpstreamSession's jar instead
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+                adapter = UpstreamAdapter(
+                    pool_connections=Config.UPSTREAM_MAX_HOSTS,  # Per-host pools kept
+                    pool_maxsize=Config.UPSTREAM_POOL_SIZE,      # Idle connections kept per host
+                    max_retries=3,                               # Auto-retry failed connections
+                    pool_block=False                             # Don't block when a pool is full
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def set_read_timeout(response, timeout):
+    """Change the read timeout of a streamed response once its headers (first byte) have arrived."""
+    raw = response.raw
+    connection = getattr(raw, "connection", None) or getattr(raw, "_connection", None)
+    sock = getattr(connection, "sock", None)
+    if sock is not None:
+        try:
+            sock.settimeout(timeout)
+        except OSError:
+            pass
+
+
+class UpstreamSession:
+    """A stream's handle on the shared upstream session."""
+
+    def __init__(self, user_agent=None):
+        self.headers = {"User-Agent": user_agent or Config.DEFAULT_USER_AGENT}
+        self.cookies = requests.cookies.RequestsCookieJar()
+
+    def get(self, url, timeout=None, **kwargs):
+        """
+        GET through the shared session with this handle's headers and cookies.
+
+        The default timeout is (UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_FIRST_BYTE_TIMEOUT);
+        see set_read_timeout for the timeout of a stream's later reads.
+        """
+        headers = {**self.headers, **kwargs.pop("headers", {})}
+        _count("requests", urlsplit(url).hostname)
+        response = get_shared_session().get(
+            url,
+            headers=headers,
+            cookies=self.cookies,
+            timeout=timeout or (Config.UPSTREAM_CONNECT_TIMEOUT, Config.UPSTREAM_FIRST_BYTE_TIMEOUT),
+            **kwargs
+        )
+
+        # Keep what the provider set (redirects included) for this stream's later requests
+        for hop in (*response.history, response):
+            self.cookies.update(hop.cookies)
+        return response
+
+    def close(self):
+        """Nothing to release: pooled connections stay open for reuse."""
+
+
+def get_upstream_stats():
+    """Upstream request / connection counters across workers, with the connection reuse rate."""
+    redis_client = RedisClient.get_client()
+    if not redis_client:
+        return {}
+
+    try:
+        raw = redis_client.hgetall(UPSTREAM_STATS_KEY)
+    except Exception as e:
+        logger.debug(f"Unable to read upstream connection stats: {e}")
+        return {}
+
+    totals = {}
+    hosts = {}
+    for field, count in raw.items():
+        field = field.decode("utf-8")
+        host, _, name = field.rpartition(":")
+        if host:
+            hosts.setdefault(host, {})[name] = int(count)
+        else:
+            totals[name] = int(count)
+
+    def reuse_rate(counts):
+        requests_made = counts.get("requests", 0)
+        if not requests_made:
+            return None
+        return round(max(0.0, 1 - counts.get("connections", 0) / requests_made), 3)
+
+    totals["reuse_rate"] = reuse_rate(totals)
+    for counts in hosts.values():
+        counts["reuse_rate"] = reuse_rate(counts)
+    totals["hosts"] = hosts
+    return totals
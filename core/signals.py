@@ -1,9 +1,35 @@
-from django.db.models.signals import pre_delete
+from django.db import transaction
+from django.db.models.signals import pre_delete, post_save, post_delete
 from django.dispatch import receiver
 from django.core.exceptions import ValidationError
-from .models import StreamProfile
+from .models import StreamProfile, CoreSettings, UserAgent, NETWORK_ACCESS
+from .utils import bump_cache_generation, NETWORK_ACCESS_CACHE, STREAM_PLANS_CACHE
 
 @receiver(pre_delete, sender=StreamProfile)
 def prevent_deletion_if_locked(sender, instance, **kwargs):
     if instance.locked:
         raise ValidationError("This profile is locked and cannot be deleted.")
+
+@receiver(post_save, sender=CoreSettings)
+@receiver(post_delete, sender=CoreSettings)
+def invalidate_network_access(sender, instance, **kwargs):
+    if instance.key != NETWORK_ACCESS:
+        return
+
+    def invalidate():
+        from dispatcharr.utils import invalidate_network_acl
+
+        bump_cache_generation(NETWORK_ACCESS_CACHE)
+        invalidate_network_acl()
+
+    transaction.on_commit(invalidate)
+
+@receiver(post_save, sender=StreamProfile)
+@receiver(post_delete, sender=StreamProfile)
+@receiver(post_save, sender=UserAgent)
+@receiver(post_delete, sender=UserAgent)
+@receiver(post_save, sender=CoreSettings)
+@receiver(post_delete, sender=CoreSettings)
+def invalidate_stream_plans(sender, **kwargs):
+    # Stream plans embed user agents, stream profiles and the defaults for both
+    transaction.on_commit(lambda: bump_cache_generation(STREAM_PLANS_CACHE))
@@ -2,13 +2,11 @@
 from celery import shared_task
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
-import json
 import logging
-import re
 import time
 import os
 from core.utils import RedisClient, send_websocket_update, acquire_task_lock, release_task_lock
-from apps.proxy.ts_proxy.channel_status import ChannelStatus
+from apps.proxy.stats_publisher import publish_channel_stats
 from apps.m3u.models import M3UAccount
 from apps.epg.models import EPGSource
 from apps.m3u.tasks import refresh_single_m3u_account
@@ -393,42 +391,8 @@ def scan_and_process_files():
     _first_scan_completed = True
 
 def fetch_channel_stats():
-    redis_client = RedisClient.get_client()
-
     try:
-        # Basic info for all channels
-        channel_pattern = "ts_proxy:channel:*:metadata"
-        all_channels = []
-
-        # Extract channel IDs from keys
-        cursor = 0
-        while True:
-            cursor, keys = redis_client.scan(cursor, match=channel_pattern)
-            for key in keys:
-                channel_id_match = re.search(r"ts_proxy:channel:(.*):metadata", key.decode('utf-8'))
-                if channel_id_match:
-                    ch_id = channel_id_match.group(1)
-                    channel_info = ChannelStatus.get_basic_channel_info(ch_id)
-                    if channel_info:
-                        all_channels.append(channel_info)
-
-            if cursor == 0:
-                break
-
-        send_websocket_update(
-            "updates",
-            "update",
-            {
-                "success": True,
-                "type": "channel_stats",
-                "stats": json.dumps({'channels': all_channels, 'count': len(all_channels)})
-            },
-            collect_garbage=True
-        )
-
-        # Explicitly clean up large data structures
-        all_channels = None
-
+        publish_channel_stats()
     except Exception as e:
         logger.error(f"Error in channel_status: {e}", exc_info=True)
         return
@@ -3,6 +3,7 @@ import logging
 import time
 import os
 import threading
+import uuid
 from django.conf import settings
 from redis.exceptions import ConnectionError, TimeoutError
 from django.core.cache import cache
@@ -188,6 +189,69 @@ def release_task_lock(task_name, id):
     # Remove the lock
     redis_client.delete(lock_id)
 
+# Cache namespaces. Channel-derived caches (playlists, guides, catalogs) key on
+# CHANNELS_CACHE, programme-derived ones additionally on EPG_CACHE. Proxy stream
+# plans additionally key on STREAM_PLANS_CACHE (M3U accounts and profiles, user
+# agents, stream profiles), as does anything else derived from M3U profiles.
+# XC_USERS_CACHE covers per-process copies of users (XC credentials and access).
+CHANNELS_CACHE = "channels"
+EPG_CACHE = "epg"
+NETWORK_ACCESS_CACHE = "network_access"
+STREAM_PLANS_CACHE = "stream_plans"
+HDHR_CACHE = "hdhr"
+XC_USERS_CACHE = "xc_users"
+
+def get_cache_generation(*namespaces):
+    """
+    Return the current generation token for one or more cache namespaces.
+
+    Generation tokens live in Redis so that an invalidation made in any process
+    (a Celery worker finishing an EPG import, a web worker saving a channel) is
+    seen by every other process. Cached values embed the token in their key, so
+    bumping any of the namespaces invalidates them without enumerating keys.
+
+    Returns None if Redis is unavailable, in which case callers should bypass caching.
+    """
+    redis_client = RedisClient.get_client()
+    if redis_client is None:
+        return None
+
+    keys = [f"cache_generation:{namespace}" for namespace in namespaces]
+    try:
+        tokens = redis_client.mget(keys)
+        if any(token is None for token in tokens):
+            # Random tokens (rather than counters) can't collide with stale
+            # entries cached before Redis was flushed
+            pipe = redis_client.pipeline()
+            for key, token in zip(keys, tokens):
+                if token is None:
+                    pipe.set(key, uuid.uuid4().hex, nx=True)
+            pipe.execute()
+            tokens = redis_client.mget(keys)
+        if any(token is None for token in tokens):
+            return None
+        return ":".join(
+            token.decode() if isinstance(token, bytes) else str(token)
+            for token in tokens
+        )
+    except Exception as e:
+        logger.debug(f"Unable to read cache generation for {namespaces}: {e}")
+        return None
+
+def bump_cache_generation(*namespaces):
+    """Invalidate everything cached under the given namespaces."""
+    redis_client = RedisClient.get_client()
+    if redis_client is None:
+        return
+
+    try:
+        pipe = redis_client.pipeline()
+        for namespace in namespaces:
+            pipe.set(f"cache_generation:{namespace}", uuid.uuid4().hex)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Unable to bump cache generation for {namespaces}: {e}")
+
 def send_websocket_update(group_name, event_type, data, collect_garbage=False):
     """
     Standardized function to send WebSocket updates with proper memory management.
@@ -3,7 +3,6 @@ import os
 import sys
 import subprocess
 import logging
-import re
 import redis
 
 from django.conf import settings
@@ -12,6 +11,7 @@ from django.shortcuts import render
 
 from apps.channels.models import Channel, Stream
 from apps.m3u.models import M3UAccountProfile
+from apps.proxy.ts_proxy.url_utils import transform_url
 from core.models import StreamProfile, CoreSettings
 
 # Import the persistent lock (the “real” lock)
@@ -120,10 +120,10 @@ def stream_view(request, channel_uuid):
         # Prepare the pattern replacement.
         logger.debug("Executing the following pattern replacement:")
         logger.debug(f"  search: {active_profile.search_pattern}")
-        safe_replace_pattern = re.sub(r'\$(\d+)', r'\\\1', active_profile.replace_pattern)
         logger.debug(f"  replace: {active_profile.replace_pattern}")
-        logger.debug(f"  safe replace: {safe_replace_pattern}")
-        stream_url = re.sub(active_profile.search_pattern, safe_replace_pattern, input_url)
+        stream_url = transform_url(
+            input_url, active_profile.search_pattern, active_profile.replace_pattern, active_profile.id
+        )
         logger.debug(f"Generated stream url: {stream_url}")
 
         # Get the stream profile set on the channel.
@@ -266,6 +266,37 @@ KillMode=mixed
 WantedBy=multi-user.target
 EOF
 
+##############################################################################
+# 10b) Create Systemd Service for the EPG matching Celery worker
+##############################################################################
+
+# Single process so the matching model is loaded once and kept warm
+cat <<EOF >/etc/systemd/system/dispatcharr-celery-epg.service
+[Unit]
+Description=Celery EPG Matching Worker for Dispatcharr
+After=network.target redis-server.service
+Requires=dispatcharr.service
+
+[Service]
+User=${DISPATCH_USER}
+Group=${DISPATCH_GROUP}
+WorkingDirectory=${APP_DIR}
+Environment="PATH=${APP_DIR}/env/bin"
+Environment="POSTGRES_DB=${POSTGRES_DB}"
+Environment="POSTGRES_USER=${POSTGRES_USER}"
+Environment="POSTGRES_PASSWORD=${POSTGRES_PASSWORD}"
+Environment="POSTGRES_HOST=localhost"
+Environment="CELERY_BROKER_URL=redis://localhost:6379/0"
+
+ExecStart=${APP_DIR}/env/bin/celery -A dispatcharr worker -l info -Q epg_match --pool=solo --hostname=epg_match@%%h
+
+Restart=always
+KillMode=mixed
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
 ##############################################################################
 # 11) Create Systemd Service for Celery Beat (Optional)
 ##############################################################################
@@ -390,12 +421,14 @@ echo ">>> Enabling systemd services..."
 systemctl daemon-reload
 systemctl enable dispatcharr
 systemctl enable dispatcharr-celery
+systemctl enable dispatcharr-celery-epg
 systemctl enable dispatcharr-celerybeat
 systemctl enable dispatcharr-daphne
 
 echo ">>> Restarting / Starting services..."
 systemctl restart dispatcharr
 systemctl restart dispatcharr-celery
+systemctl restart dispatcharr-celery-epg
 systemctl restart dispatcharr-celerybeat
 systemctl restart dispatcharr-daphne
 
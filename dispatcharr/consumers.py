@@ -1,6 +1,7 @@
 import json
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
-import re, logging
+import logging
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +25,8 @@ class MyWebSocketConsumer(AsyncWebsocketConsumer):
                     'message': 'WebSocket connection established successfully'
                 }
             }))
+            # Live channel stats arrive as deltas; start the client off with the full state
+            await self.send_stats_snapshot()
         except Exception as e:
             import logging
             logger = logging.getLogger(__name__)
@@ -42,19 +45,30 @@ class MyWebSocketConsumer(AsyncWebsocketConsumer):
             logger = logging.getLogger(__name__)
             logger.error(f"Error in WebSocket disconnect: {str(e)}")
 
+    async def send_stats_snapshot(self):
+        from apps.proxy.stats_publisher import get_stats_snapshot
+
+        snapshot = await sync_to_async(get_stats_snapshot)()
+        await self.send(text_data=json.dumps({'type': 'update', 'data': snapshot}))
+
     async def receive(self, text_data):
         data = json.loads(text_data)
 
-        if data["type"] == "m3u_profile_test":
-            from apps.proxy.ts_proxy.url_utils import transform_url
+        if data["type"] == "channel_stats_snapshot":
+            # Sent by clients that missed a stats delta
+            await self.send_stats_snapshot()
+
+        elif data["type"] == "m3u_profile_test":
+            from apps.proxy.ts_proxy.url_utils import get_url_rewriter, transform_url
 
             def replace_with_mark(match):
                 # Wrap the match in <mark> tags
                 return f"<mark>{match.group(0)}</mark>"
 
             # Apply the transformation using the replace_with_mark function
+            rewriter = get_url_rewriter(data["search"], data["replace"])
             try:
-                search_preview = re.sub(data["search"], replace_with_mark, data["url"])
+                search_preview = rewriter.regex.sub(replace_with_mark, data["url"])
             except Exception as e:
                 search_preview = data["search"]
                 logger.error(f"Failed to generate replace preview: {e}")
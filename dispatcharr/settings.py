@@ -195,6 +195,13 @@ CELERY_BROKER_TRANSPORT_OPTIONS = {
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 
+# EPG matching runs in its own single-process worker (-Q epg_match) that keeps
+# the sentence-transformers model and the EPG name embeddings loaded
+CELERY_TASK_ROUTES = {
+    "apps.channels.tasks.match_epg_channels": {"queue": "epg_match"},
+    "apps.channels.tasks.update_epg_embeddings": {"queue": "epg_match"},
+}
+
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers.DatabaseScheduler"
 CELERY_BEAT_SCHEDULE = {
     "fetch-channel-statuses": {
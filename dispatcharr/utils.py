@@ -1,9 +1,17 @@
 # dispatcharr/utils.py
 import json
 import ipaddress
+import threading
+import time
+from bisect import bisect_right
 from django.http import JsonResponse
 from django.core.exceptions import ValidationError
 from core.models import CoreSettings, NETWORK_ACCESS
+from core.utils import get_cache_generation, NETWORK_ACCESS_CACHE
+
+# How often a process checks whether another process changed the network access
+# setting. Saves made in the current process take effect immediately.
+NETWORK_ACCESS_CHECK_INTERVAL = 2
 
 
 def json_error_response(message, status=400):
@@ -38,21 +46,92 @@ def get_client_ip(request):
     return ip
 
 
-def network_access_allowed(request, settings_key):
-    network_access = json.loads(CoreSettings.objects.get(key=NETWORK_ACCESS).value)
+class NetworkACL:
+    """
+    Network access setting compiled for fast lookups: the networks allowed for
+    each settings key, merged into sorted integer ranges per address family.
+    """
 
-    cidrs = (
-        network_access[settings_key].split(",")
-        if settings_key in network_access
-        else ["0.0.0.0/0"]
-    )
+    DEFAULT_CIDRS = ["0.0.0.0/0"]
+
+    def __init__(self, value):
+        network_access = json.loads(value)
+        self.ranges = {
+            key: self._compile(cidrs.split(","))
+            for key, cidrs in network_access.items()
+        }
+        self.default_ranges = self._compile(self.DEFAULT_CIDRS)
+
+    @staticmethod
+    def _compile(cidrs):
+        by_version = {}
+        for cidr in cidrs:
+            network = ipaddress.ip_network(cidr)
+            by_version.setdefault(network.version, []).append(
+                (int(network.network_address), int(network.broadcast_address))
+            )
+
+        compiled = {}
+        for version, ranges in by_version.items():
+            ranges.sort()
+            starts, ends = [], []
+            for start, end in ranges:
+                if ends and start <= ends[-1] + 1:
+                    ends[-1] = max(ends[-1], end)
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            compiled[version] = (starts, ends)
+        return compiled
+
+    def allows(self, settings_key, client_ip):
+        ranges = self.ranges.get(settings_key, self.default_ranges).get(client_ip.version)
+        if not ranges:
+            return False
+
+        starts, ends = ranges
+        address = int(client_ip)
+        index = bisect_right(starts, address) - 1
+        return index >= 0 and address <= ends[index]
+
+
+_network_acl = None
+_network_acl_generation = None
+_network_acl_checked_at = 0
+_network_acl_lock = threading.Lock()
 
-    network_allowed = False
-    client_ip = ipaddress.ip_address(get_client_ip(request))
-    for cidr in cidrs:
-        network = ipaddress.ip_network(cidr)
-        if client_ip in network:
-            network_allowed = True
-            break
 
-    return network_allowed
+def get_network_acl():
+    """
+    Return the compiled network access setting, only going back to the database
+    when the setting was changed (see invalidate_network_acl).
+    """
+    global _network_acl, _network_acl_generation, _network_acl_checked_at
+
+    now = time.monotonic()
+    acl = _network_acl
+    if acl is not None and now - _network_acl_checked_at < NETWORK_ACCESS_CHECK_INTERVAL:
+        return acl
+
+    with _network_acl_lock:
+        if _network_acl is not None and now - _network_acl_checked_at < NETWORK_ACCESS_CHECK_INTERVAL:
+            return _network_acl
+
+        generation = get_cache_generation(NETWORK_ACCESS_CACHE)
+        if _network_acl is None or generation is None or generation != _network_acl_generation:
+            _network_acl = NetworkACL(CoreSettings.objects.get(key=NETWORK_ACCESS).value)
+            _network_acl_generation = generation
+        _network_acl_checked_at = now
+        return _network_acl
+
+
+def invalidate_network_acl():
+    """Drop this process's compiled ACL; other processes notice the bumped generation."""
+    global _network_acl
+    with _network_acl_lock:
+        _network_acl = None
+
+
+def network_access_allowed(request, settings_key):
+    client_ip = ipaddress.ip_address(get_client_ip(request))
+    return get_network_acl().allows(settings_key, client_ip)
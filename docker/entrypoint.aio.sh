@@ -71,6 +71,12 @@ if [ "$DISPATCHARR_ENV" = "dev" ] || [ "$DISPATCHARR_ENV" = "aio" ]; then
     celery_pid=$!
     echo "✅ Celery started with PID $celery_pid"
     pids+=("$celery_pid")
+
+    # Dedicated EPG matcher worker, keeps the matching model loaded
+    celery -A dispatcharr worker -l info -Q epg_match --pool=solo --hostname=epg_match@%h &
+    matcher_pid=$!
+    echo "✅ EPG matcher worker started with PID $matcher_pid"
+    pids+=("$matcher_pid")
 fi
 
 # Always start Gunicorn
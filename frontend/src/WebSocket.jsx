@@ -18,10 +18,55 @@ import useAuthStore from './store/auth';
 
 export const WebsocketContext = createContext([false, () => { }, null]);
 
+// Applies a channel_stats message (full snapshot or delta) to the stats state
+// and returns the stats in the store's format, or null if a delta doesn't
+// follow the last applied message and a new snapshot is needed.
+const applyChannelStatsMessage = (state, message) => {
+  if (message.full) {
+    state.channels = { ...message.channels };
+  } else {
+    if (state.seq === null || message.seq !== state.seq + 1) {
+      state.seq = null;
+      return null;
+    }
+
+    const channels = { ...state.channels };
+    for (const [channelId, fields] of Object.entries(message.channels)) {
+      const channel = { ...(channels[channelId] || {}) };
+      for (const [key, value] of Object.entries(fields)) {
+        if (value === null) {
+          delete channel[key];
+        } else {
+          channel[key] = value;
+        }
+      }
+      channels[channelId] = channel;
+    }
+    for (const channelId of message.removed) {
+      delete channels[channelId];
+    }
+    state.channels = channels;
+  }
+  state.seq = message.seq;
+
+  // Uptimes are sent as start times; derive them from the broadcast time
+  const channelList = Object.values(state.channels).map((channel) => ({
+    ...channel,
+    uptime: channel.started_at ? message.ts - channel.started_at : 0,
+    clients: (channel.clients || []).map((client) =>
+      client.connected_at
+        ? { ...client, connected_since: message.ts - client.connected_at }
+        : client
+    ),
+  }));
+  return { channels: channelList, count: channelList.length };
+};
+
 export const WebsocketProvider = ({ children }) => {
   const [isReady, setIsReady] = useState(false);
   const [val, setVal] = useState(null);
   const ws = useRef(null);
+  const channelStatsRef = useRef({ seq: null, channels: {}, snapshotRequested: false });
   const reconnectTimerRef = useRef(null);
   const [reconnectAttempts, setReconnectAttempts] = useState(0);
   const [connectionError, setConnectionError] = useState(null);
@@ -230,9 +275,19 @@ export const WebsocketProvider = ({ children }) => {
               }
               break;
 
-            case 'channel_stats':
-              setChannelStats(JSON.parse(parsedEvent.data.stats));
+            case 'channel_stats': {
+              const statsState = channelStatsRef.current;
+              const stats = applyChannelStatsMessage(statsState, parsedEvent.data);
+              if (stats) {
+                statsState.snapshotRequested = false;
+                setChannelStats(stats);
+              } else if (!statsState.snapshotRequested) {
+                // Missed a delta: ask for the full stats again
+                statsState.snapshotRequested = true;
+                socket.send(JSON.stringify({ type: 'channel_stats_snapshot' }));
+              }
               break;
+            }
 
             case 'epg_channels':
               notifications.show({